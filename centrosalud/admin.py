@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.core.exceptions import ValidationError
+from centrosalud.rut import normalizar_rut
 from .models import (
     CentroSalud,
     AreaCategory,
@@ -9,6 +11,7 @@ from .models import (
     AtencionMedica,
     ExamenMedico,
     AtencionExamen,
+    TransicionEstado,
 )
 
 @admin.register(CentroSalud)
@@ -33,6 +36,14 @@ class PacienteAdmin(admin.ModelAdmin):
     list_display = ("nombre", "apellido1", "rut")
     search_fields = ("nombre", "apellido1", "rut")
 
+    def get_search_results(self, request, queryset, search_term):
+        # Si el término es un RUT válido se busca por el índice numérico
+        try:
+            numero = normalizar_rut(search_term)
+        except ValidationError:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(rut_numero=numero), False
+
 @admin.register(FichaMedica)
 class FichaMedicaAdmin(admin.ModelAdmin):
     list_display = ("paciente", "estado")
@@ -60,3 +71,16 @@ class AtencionExamenAdmin(admin.ModelAdmin):
     list_display = ("atencion_medica", "examen_medico", "fecha_solicitud", "fecha_resultado")
     list_filter = ("fecha_solicitud",)
     search_fields = ("examen_medico__nombre_examen",)
+
+@admin.register(TransicionEstado)
+class TransicionEstadoAdmin(admin.ModelAdmin):
+    # Registro de solo inserción: se consulta, no se edita
+    list_display = ("ficha_medica", "estado_anterior", "estado_nuevo", "area", "usuario", "fecha")
+    list_filter = ("estado_nuevo", "fecha")
+    list_select_related = ("ficha_medica__paciente", "area", "usuario")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
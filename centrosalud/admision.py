@@ -0,0 +1,227 @@
+"""
+Registro de ingresos en una sola transacción.
+
+La ficha del paciente se lee con ``select_for_update``: dos funcionarios que
+ingresan al mismo paciente a la vez se serializan en esa fila y el segundo ve
+el estado que dejó el primero y rechaza el ingreso. (SQLite ignora FOR
+UPDATE, pero serializa las escrituras: la segunda transacción falla.)
+
+Los formularios envían una clave de idempotencia: reenviar el mismo
+formulario (doble clic, reintento tras un timeout) devuelve la atención ya
+creada en vez de rechazarlo o crear otra.
+
+``ingresar_lote`` registra muchos pacientes a la vez (eventos con víctimas
+múltiples) con bulk_create: no pasa por las señales y ajusta ocupación, censo
+e índice de búsqueda al final, con un número de consultas que no crece con el lote.
+"""
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from centrosalud import busqueda, censo, ocupacion
+from centrosalud.importacion import CAMPOS_PACIENTE, FilaRechazada, leer_fecha
+from centrosalud.models.models import Area, AtencionMedica, FichaMedica, Paciente, TransicionEstado
+from centrosalud.rut import formatear_rut, normalizar_rut
+
+MAX_FILAS_LOTE = 200
+
+
+class IngresoRechazado(Exception):
+    pass
+
+
+def rechazo_por_estado(paciente, estado):
+    return IngresoRechazado(
+        f'No se puede registrar un nuevo ingreso. El paciente {paciente.nombre} {paciente.apellido1} '
+        f'tiene un registro activo en estado: {dict(FichaMedica.ESTADOS_PACIENTE)[estado]}. '
+        f'Debe estar en "En Alta" para permitir un nuevo ingreso.'
+    )
+
+
+def ingreso_previo(clave, pacientes):
+    """Atención ya creada con ``clave`` para alguno de ``pacientes`` (con ficha y paciente), o None."""
+    if not clave:
+        return None
+    return (AtencionMedica.objects.select_related('ficha_medica__paciente')
+            .filter(clave_idempotencia=clave, ficha_medica__paciente__in=pacientes).first())
+
+
+def _abrir_atencion(ficha, area, medico, motivo, clave):
+    return AtencionMedica.objects.create(
+        ficha_medica=ficha, area=area, medico_responsable=medico, motivo_consulta=motivo,
+        clave_idempotencia=clave or None,
+    )
+
+
+def registrar_ingreso(paciente_id, area, medico, motivo, usuario=None, clave=None):
+    """
+    Abre una atención y deja al paciente EN_TRATAMIENTO; debe estar de alta o
+    sin ficha. Devuelve (atencion, repetido): ``repetido`` si la clave ya se usó.
+    Lanza Paciente.DoesNotExist o IngresoRechazado.
+    """
+    pacientes = Paciente.objects.filter(pk=paciente_id)
+    try:
+        with transaction.atomic():
+            ficha = (FichaMedica.objects.select_for_update(of=('self',)).select_related('paciente')
+                     .filter(paciente_id=paciente_id).first())
+            if ficha is None:
+                ficha = FichaMedica(paciente=pacientes.get(), estado='EN_TRATAMIENTO')
+                ficha._modificado_por = usuario
+                ficha.save()
+            elif ficha.estado != 'EN_ALTA':
+                previa = ingreso_previo(clave, pacientes)
+                if previa is not None:
+                    return previa, True
+                raise rechazo_por_estado(ficha.paciente, ficha.estado)
+            else:
+                ficha._estado_guardado = ficha.estado
+                ficha._modificado_por = usuario
+                ficha.estado = 'EN_TRATAMIENTO'
+                ficha.save(update_fields=['estado'])
+            atencion = _abrir_atencion(ficha, area, medico, motivo, clave)
+    except IntegrityError:
+        # Otra transacción ganó la carrera: el mismo envío, o un ingreso del mismo paciente
+        previa = ingreso_previo(clave, pacientes)
+        if previa is None:
+            raise IngresoRechazado("El paciente ya tiene un ingreso en curso.")
+        return previa, True
+    return atencion, False
+
+
+def crear_paciente_con_ingreso(datos_paciente, area, medico, motivo, usuario=None, clave=None):
+    """Crea paciente, ficha y primera atención juntos. Devuelve (atencion, repetido)."""
+    try:
+        with transaction.atomic():
+            paciente = Paciente.objects.create(**datos_paciente)
+            ficha = FichaMedica(paciente=paciente, estado='EN_TRATAMIENTO')
+            ficha._modificado_por = usuario
+            ficha.save()
+            atencion = _abrir_atencion(ficha, area, medico, motivo, clave)
+    except IntegrityError:
+        # El RUT se registró entre la búsqueda y el envío (quizás por este mismo formulario)
+        previa = ingreso_previo(clave, Paciente.objects.por_rut(datos_paciente['rut']))
+        if previa is None:
+            raise IngresoRechazado(f"El RUT {datos_paciente['rut']} ya está registrado.")
+        return previa, True
+    return atencion, False
+
+
+def _paciente_nuevo(numero, fila):
+    datos = {campo: str(fila.get(campo) or '').strip() for campo in CAMPOS_PACIENTE}
+    faltantes = [campo for campo in ('nombre', 'apellido1', 'fecha_nacimiento') if not datos[campo]]
+    if faltantes:
+        raise FilaRechazada(f"paciente nuevo, faltan campos: {', '.join(faltantes)}")
+    datos['fecha_nacimiento'] = leer_fecha(datos['fecha_nacimiento'])
+    datos['apellido2'] = datos['apellido2'] or None
+    # bulk_create no pasa por Paciente.save(): rut_numero se asigna aquí
+    return Paciente(rut=formatear_rut(numero), rut_numero=numero, **datos)
+
+
+def ingresar_lote(filas, area, medico, motivo, usuario=None, clave=None):
+    """
+    Ingresa a todos los pacientes de ``filas`` en la misma área, médico y motivo,
+    en una transacción. Cada fila es un dict con 'rut' y, si el paciente no
+    existe, nombre, apellido1 y fecha_nacimiento (el resto de CAMPOS_PACIENTE
+    es opcional). Devuelve un dict por fila con 'resultado': INGRESADO,
+    REPETIDO (ya ingresado con esta ``clave``) o RECHAZADO y su 'motivo'.
+    """
+    if len(filas) > MAX_FILAS_LOTE:
+        raise ValueError(f"Máximo {MAX_FILAS_LOTE} pacientes por lote.")
+    resultados = []
+    por_rut = {}
+    for numero_fila, fila in enumerate(filas, start=1):
+        resultado = {'fila': numero_fila, 'rut': str(fila.get('rut') or '').strip(), 'resultado': 'RECHAZADO',
+                     'motivo': '', 'paciente': None, 'atencion': None, 'nuevo': False}
+        resultados.append(resultado)
+        try:
+            numero = normalizar_rut(resultado['rut'])
+        except ValidationError as error:
+            resultado['motivo'] = error.messages[0]
+            continue
+        resultado['rut'] = formatear_rut(numero)
+        if numero in por_rut:
+            resultado['motivo'] = f"RUT repetido en la fila {por_rut[numero][0]['fila']}"
+            continue
+        por_rut[numero] = (resultado, fila)
+    if not por_rut:
+        return resultados
+
+    centro_id = Area.objects.filter(pk=area.pk).values_list('centro_salud_id', flat=True).first()
+    claves = {numero: f'{clave}:{numero}' if clave else None for numero in por_rut}
+    with transaction.atomic():
+        pacientes = {paciente.rut_numero: paciente for paciente in Paciente.objects.filter(rut_numero__in=por_rut)}
+        # Se bloquean las fichas como en registrar_ingreso: un ingreso individual simultáneo espera
+        fichas = {ficha.paciente_id: ficha for ficha in FichaMedica.objects.select_for_update()
+                  .filter(paciente_id__in=[paciente.pk for paciente in pacientes.values()])}
+        previas = {}
+        if clave and pacientes:
+            previas = dict(AtencionMedica.objects.filter(clave_idempotencia__in=claves.values())
+                           .values_list('clave_idempotencia', 'pk'))
+
+        nuevos, fichas_nuevas, altas, ingresos = [], [], [], []
+        for numero, (resultado, fila) in por_rut.items():
+            paciente = pacientes.get(numero)
+            ficha = fichas.get(paciente.pk) if paciente else None
+            if claves[numero] in previas:
+                resultado.update(resultado='REPETIDO', paciente=paciente.pk, atencion=previas[claves[numero]])
+                continue
+            if ficha is not None and ficha.estado != 'EN_ALTA':
+                resultado['motivo'] = (f"tiene un registro activo en estado: "
+                                       f"{dict(FichaMedica.ESTADOS_PACIENTE)[ficha.estado]}")
+                continue
+            if paciente is None:
+                try:
+                    paciente = _paciente_nuevo(numero, fila)
+                except FilaRechazada as error:
+                    resultado['motivo'] = str(error)
+                    continue
+                nuevos.append(paciente)
+                resultado['nuevo'] = True
+            if ficha is None:
+                ficha = FichaMedica(paciente=paciente, estado='EN_TRATAMIENTO')
+                fichas_nuevas.append(ficha)
+            else:
+                altas.append(ficha)
+            ingresos.append((resultado, ficha, claves[numero]))
+        if not ingresos:
+            return resultados
+
+        Paciente.objects.bulk_create(nuevos)
+        for ficha in fichas_nuevas:
+            ficha.paciente_id = ficha.paciente.pk
+        FichaMedica.objects.bulk_create(fichas_nuevas)
+        situacion_previa = censo.situaciones([ficha.pk for ficha in altas]) if altas else {}
+        if altas:
+            FichaMedica.objects.filter(pk__in=[ficha.pk for ficha in altas]).update(estado='EN_TRATAMIENTO')
+        atenciones = AtencionMedica.objects.bulk_create([
+            AtencionMedica(ficha_medica_id=ficha.pk, area_id=area.pk, medico_responsable_id=medico.pk,
+                           motivo_consulta=motivo, clave_idempotencia=clave_fila)
+            for _, ficha, clave_fila in ingresos
+        ])
+        for (resultado, ficha, _), atencion in zip(ingresos, atenciones):
+            resultado.update(resultado='INGRESADO', paciente=ficha.paciente_id, atencion=atencion.pk)
+
+        # Lo que harían las señales de cada save(), agregado
+        autor = usuario if usuario and usuario.is_authenticated else None
+        TransicionEstado.objects.bulk_create(
+            [TransicionEstado(ficha_medica_id=ficha.pk, estado_nuevo='EN_TRATAMIENTO', usuario=autor)
+             for ficha in fichas_nuevas]
+            + [TransicionEstado(ficha_medica_id=ficha.pk, estado_anterior='EN_ALTA', estado_nuevo='EN_TRATAMIENTO',
+                                centro_salud_id=situacion_previa[ficha.pk][0],
+                                area_id=situacion_previa[ficha.pk][1], usuario=autor)
+               for ficha in altas]
+        )
+        movimientos = {(centro_id, area.pk, 'EN_TRATAMIENTO'): len(atenciones)}
+        for ficha in altas:
+            previa = situacion_previa[ficha.pk]
+            movimientos[previa] = movimientos.get(previa, 0) - 1
+        censo.sumar(movimientos)
+        deltas = {
+            ('MEDICO', centro_id, None, medico.pk, None): len(atenciones),
+            ('AREA', centro_id, area.pk, None, None): len(atenciones),
+        }
+        for situacion, delta in movimientos.items():
+            for aporte in ocupacion.aportes_situacion(situacion):
+                deltas[aporte] = deltas.get(aporte, 0) + delta
+        ocupacion.sumar(deltas)
+        busqueda.indexar_nuevos(fichas_nuevas, atenciones)
+    return resultados
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class CentrosaludConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'centrosalud'
+
+    def ready(self):
+        from centrosalud import signals  # noqa: F401
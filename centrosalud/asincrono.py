@@ -0,0 +1,76 @@
+"""
+Apoyo para las vistas async (servidas por ev4/asgi.py).
+
+El ORM async de Django (``aget``, ``async for``) no bloquea el event loop,
+pero pasa todas las consultas por un mismo hilo y una misma conexión: dos
+``await`` seguidos, o en un ``asyncio.gather``, se ejecutan uno tras otro.
+``reunir`` ejecuta de verdad a la vez consultas independientes, cada una en
+un hilo propio con su propia conexión (conviene el pool de ev4/pool.py, para
+no abrir una conexión por consulta).
+"""
+import asyncio
+import contextvars
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import PermissionDenied
+from django.db import connections
+from django.views import View
+
+from ev4.routers import estado_lectura
+from login.perfil_cache import perfil_de
+
+
+def _en_transaccion():
+    return any(conexion.in_atomic_block for conexion in connections.all(initialized_only=True))
+
+
+def _con_conexiones_propias(consulta, estado):
+    def en_contexto_vacio():
+        # connections guarda las conexiones en contextvars: en un contexto vacío
+        # no ve las del request y abre las suyas, que se cierran (o vuelven al pool) al final
+        estado_lectura.set(estado)
+        try:
+            return consulta()
+        finally:
+            connections.close_all()
+
+    def ejecutar():
+        return contextvars.Context().run(en_contexto_vacio)
+    return ejecutar
+
+
+async def reunir(*consultas):
+    """
+    Ejecuta a la vez ``consultas`` (funciones sin argumentos que usan el ORM) y
+    devuelve sus resultados en el mismo orden.
+
+    Dentro de una transacción (ATOMIC_REQUESTS, tests) otra conexión no vería lo
+    escrito en ella: en ese caso se ejecutan en orden en la conexión del request.
+    """
+    if await sync_to_async(_en_transaccion)():
+        return [await sync_to_async(consulta)() for consulta in consultas]
+    estado = estado_lectura.get()
+    return await asyncio.gather(*(
+        sync_to_async(_con_conexiones_propias(consulta, estado), thread_sensitive=False)()
+        for consulta in consultas
+    ))
+
+
+class VistaAsincrona(View):
+    """
+    Base de las vistas async: reemplaza LoginRequiredMixin y los mixins de rol,
+    que leen ``request.user`` de forma síncrona. ``self.perfil`` queda resuelto.
+    """
+    rol = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        # Las plantillas usan request.user: que no vuelva a leer el usuario
+        request.user = user
+        self.perfil = await sync_to_async(perfil_de)(user)
+        if self.rol and (self.perfil is None or self.perfil.tipo != self.rol):
+            raise PermissionDenied
+        return await super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,298 @@
+"""
+Benchmark de rutas con presupuesto de consultas SQL y umbral de latencia.
+
+Cada ruta con nombre de ``login.urls.urls`` y ``centrosalud.urls.urls`` se
+declara en RUTAS (o en EXCLUIDAS, con el motivo). Se ejecuta con el Client de
+Django contra un dataset de ``generar_dataset``: el número de consultas no debe
+crecer con el tamaño de la página, así que un N+1 salta el presupuesto apenas
+la página tiene más filas que el presupuesto.
+"""
+import asyncio
+import math
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.db import connection, connections, transaction
+from django.db.models import Count
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from centrosalud.generador import RUT_BASE
+from centrosalud.models.models import Area, AtencionMedica, Paciente
+from centrosalud.rut import formatear_rut
+from login.models import PasswordResetToken
+
+URLCONFS = ('login.urls.urls', 'centrosalud.urls.urls')
+
+
+class Ruta:
+    def __init__(self, nombre, usuario=None, kwargs=None, metodo='get', datos=None, status=200,
+                 consultas=10, p95_ms=300, revertir=False):
+        self.nombre = nombre
+        self.usuario = usuario      # atributo del Escenario con el que se inicia sesión
+        self.kwargs = kwargs        # función(escenario) -> kwargs de reverse()
+        self.metodo = metodo
+        self.datos = datos          # función(escenario) -> datos del POST / querystring
+        self.status = status
+        self.consultas = consultas  # máximo de consultas SQL por request
+        self.p95_ms = p95_ms        # percentil 95 de latencia permitido
+        self.revertir = revertir    # cada request en una transacción que se revierte: el dataset no cambia
+
+    def url(self, escenario):
+        return reverse(self.nombre, kwargs=self.kwargs(escenario) if self.kwargs else None)
+
+
+RUTAS = [
+    # login
+    Ruta('login', consultas=0, p95_ms=100),
+    Ruta('home', usuario='medico', consultas=3, p95_ms=100),
+    Ruta('metricas_limites', usuario='administrador', consultas=2, p95_ms=100),
+    Ruta('password_reset', consultas=0, p95_ms=100),
+    Ruta('password_reset_done', consultas=0, p95_ms=100),
+    Ruta('password_reset_confirm', kwargs=lambda e: {'token': e.token.token}, consultas=1, p95_ms=100),
+    Ruta('password_reset_complete', consultas=0, p95_ms=100),
+    # Sin superusuario: incluye las consultas de permisos del usuario y de sus grupos
+    Ruta('lista_usuarios', usuario='administrador', consultas=6),
+    Ruta('editar_usuario', usuario='administrador', kwargs=lambda e: {'pk': e.medico.pk}, consultas=7),
+    Ruta('formulario_usuario', usuario='administrador', kwargs=lambda e: {'pk': e.medico.pk}, consultas=7),
+
+    # centrosalud
+    Ruta('dashboard', usuario='medico', status=302, consultas=2, p95_ms=100),
+    Ruta('metricas_pool', usuario='administrador', consultas=2, p95_ms=100),
+    Ruta('doctor_patient_list', usuario='medico', consultas=3),
+    Ruta('doctor_patient_list_async', usuario='medico', consultas=3),
+    Ruta('doctor_worklist', usuario='medico', consultas=3),
+    Ruta('doctor_worklist_json', usuario='medico', consultas=3),
+    Ruta('patient_detail', usuario='medico', kwargs=lambda e: {'pk': e.paciente.pk}, consultas=5),
+    Ruta('patient_detail_async', usuario='medico', kwargs=lambda e: {'pk': e.paciente.pk}, consultas=5),
+    Ruta('patient_timeline', usuario='medico', kwargs=lambda e: {'pk': e.paciente.pk}, consultas=4),
+    Ruta('update_atencion', usuario='medico', kwargs=lambda e: {'pk': e.atencion.pk}, consultas=7),
+    Ruta('update_patient_status', usuario='medico', kwargs=lambda e: {'pk': e.paciente.pk}, consultas=4),
+    Ruta('update_ficha', usuario='medico', kwargs=lambda e: {'pk': e.paciente.pk}, consultas=4),
+    Ruta('clinical_search', usuario='medico', datos=lambda e: {'q': 'dolor'}, consultas=4),
+    Ruta('director_dashboard', usuario='director', consultas=6),
+    Ruta('director_dashboard_async', usuario='director', consultas=6),
+    Ruta('director_censo_json', usuario='director', consultas=4),
+    Ruta('director_estadias', usuario='director', consultas=2),
+    Ruta('director_estadias_json', usuario='director', consultas=2),
+    Ruta('director_exportar_atenciones', usuario='director', consultas=3),
+    Ruta('admission_dashboard', usuario='ingreso', consultas=2, p95_ms=100),
+    Ruta('search_patient', usuario='ingreso', consultas=2, p95_ms=100),
+    Ruta('search_patient', usuario='ingreso', metodo='post', datos=lambda e: {'rut': e.paciente_alta.rut},
+         status=302, consultas=3, p95_ms=100),
+    Ruta('create_patient_with_rut', usuario='ingreso', kwargs=lambda e: {'rut': e.rut_libre}, consultas=3),
+    Ruta('register_admission', usuario='ingreso', kwargs=lambda e: {'pk': e.paciente_alta.pk}, consultas=3),
+    # Incluye lo que mantienen las señales (ocupación, censo, transición e índice) y sus savepoints
+    Ruta('register_admission', usuario='ingreso', metodo='post', kwargs=lambda e: {'pk': e.paciente_alta.pk},
+         datos=lambda e: {'area': e.area.pk, 'medico_responsable': e.medico.pk, 'motivo_consulta': 'Dolor abdominal',
+                          'clave_idempotencia': uuid.uuid4().hex},
+         status=302, consultas=39, revertir=True),
+    Ruta('batch_admission', usuario='ingreso', consultas=2, p95_ms=100),
+]
+
+# Rutas con nombre que no se miden, con el motivo
+EXCLUIDAS = {
+    'logout': "solo acepta POST y cierra la sesión del cliente de benchmark",
+    'batch_admission_json': "solo acepta POST y cada envío registra ingresos (ver test_admision)",
+}
+
+
+def rutas_con_nombre():
+    """Nombres de todas las rutas de URLCONFS."""
+    nombres = set()
+    pendientes = [get_resolver(urlconf) for urlconf in URLCONFS]
+    while pendientes:
+        for patron in pendientes.pop().url_patterns:
+            if isinstance(patron, URLResolver):
+                pendientes.append(patron)
+            elif isinstance(patron, URLPattern) and patron.name:
+                nombres.add(patron.name)
+    return nombres
+
+
+class Escenario:
+    """Objetos del dataset generado que usan las rutas."""
+
+    def __init__(self, prefijo='gen'):
+        self.director = User.objects.select_related('perfil').get(username=f'{prefijo}_director_1')
+        self.ingreso = User.objects.select_related('perfil').get(username=f'{prefijo}_ingreso_1')
+        self.administrador = User.objects.get(username=f'{prefijo}_admin_1')
+        # El médico con más pacientes activos es el peor caso de la lista y del detalle
+        abiertas = AtencionMedica.objects.filter(fecha_salida__isnull=True,
+                                                 medico_responsable__username__startswith=f'{prefijo}_medico_')
+        medico_id = (abiertas.values('medico_responsable').annotate(total=Count('pk'))
+                     .order_by('-total', 'medico_responsable').values_list('medico_responsable', flat=True).first())
+        if medico_id is None:
+            raise ValueError(f"El dataset '{prefijo}' no tiene atenciones abiertas.")
+        self.medico = User.objects.get(pk=medico_id)
+        self.atencion = (abiertas.filter(medico_responsable_id=medico_id)
+                         .select_related('ficha_medica__paciente').order_by('pk').first())
+        self.paciente = self.atencion.ficha_medica.paciente
+        self.paciente_alta = Paciente.objects.filter(rut_numero__gte=RUT_BASE,
+                                                     ficha_medica__estado='EN_ALTA').order_by('pk').first()
+        self.area = Area.objects.filter(centro_salud=self.ingreso.perfil.centro_salud).order_by('pk').first()
+        self.rut_libre = formatear_rut(RUT_BASE - 1)
+        self.token = PasswordResetToken.objects.create(user=self.director)
+
+
+class Medicion:
+    def __init__(self, ruta, latencias, consultas, status):
+        self.ruta = ruta
+        self.latencias = sorted(latencias)
+        self.consultas = consultas
+        self.status = status
+
+    @property
+    def p50(self):
+        return percentil(self.latencias, 50)
+
+    @property
+    def p95(self):
+        return percentil(self.latencias, 95)
+
+    def fallas(self, factor_latencia=1.0):
+        """Incumplimientos del presupuesto; con ``factor_latencia=None`` no se revisa el p95."""
+        fallas = []
+        if self.status != self.ruta.status:
+            fallas.append(f"status {self.status} (se esperaba {self.ruta.status})")
+        if self.consultas > self.ruta.consultas:
+            fallas.append(f"{self.consultas} consultas (presupuesto {self.ruta.consultas})")
+        if factor_latencia is not None and self.p95 > self.ruta.p95_ms * factor_latencia:
+            fallas.append(f"p95 {self.p95:.1f} ms (umbral {self.ruta.p95_ms * factor_latencia:.0f} ms)")
+        return fallas
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not valores:
+        return 0.0
+    indice = max(0, min(len(valores) - 1, math.ceil(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+def medir(ruta, escenario, repeticiones=20, calentamiento=2, clientes=None):
+    """
+    Ejecuta la ruta ``calentamiento + repeticiones`` veces. Las consultas son el
+    máximo observado entre las repeticiones medidas.
+    """
+    clientes = {} if clientes is None else clientes
+    cliente = clientes.get(ruta.usuario)
+    if cliente is None:
+        cliente = clientes[ruta.usuario] = Client()
+        if ruta.usuario:
+            cliente.force_login(getattr(escenario, ruta.usuario))
+    url = ruta.url(escenario)
+    datos = ruta.datos(escenario) if ruta.datos else None
+    metodo = getattr(cliente, ruta.metodo)
+
+    def peticion():
+        if not ruta.revertir:
+            return metodo(url, datos)
+        with transaction.atomic():
+            respuesta = metodo(url, datos)
+            transaction.set_rollback(True)
+        return respuesta
+
+    for _ in range(calentamiento):
+        peticion()
+    latencias, consultas, status = [], 0, None
+    for _ in range(repeticiones):
+        with CaptureQueriesContext(connection) as capturadas:
+            inicio = time.perf_counter()
+            respuesta = peticion()
+            if respuesta.streaming:
+                # El cuerpo (y sus consultas) se genera recién al consumirlo
+                b''.join(respuesta.streaming_content)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        consultas = max(consultas, len(capturadas))
+        status = respuesta.status_code
+    return Medicion(ruta, latencias, consultas, status)
+
+
+# Comparación WSGI / ASGI: la vista síncrona por el handler WSGI del Client y
+# su versión async por el handler ASGI del AsyncClient, con clientes concurrentes.
+# Se mide dentro del proceso: no incluye el servidor (gunicorn, uvicorn) ni la red.
+PARES_ASYNC = [
+    ('doctor_patient_list', 'doctor_patient_list_async'),
+    ('patient_detail', 'patient_detail_async'),
+    ('director_dashboard', 'director_dashboard_async'),
+]
+
+
+class Carga:
+    def __init__(self, latencias, duracion, errores):
+        self.latencias = sorted(latencias)
+        self.duracion = duracion
+        self.errores = errores
+
+    @property
+    def por_segundo(self):
+        return len(self.latencias) / self.duracion if self.duracion else 0.0
+
+    @property
+    def p50(self):
+        return percentil(self.latencias, 50)
+
+    @property
+    def p95(self):
+        return percentil(self.latencias, 95)
+
+
+def _reparto(peticiones, clientes):
+    return [peticiones // clientes + (1 if i < peticiones % clientes else 0) for i in range(clientes)]
+
+
+def _sesion(usuario):
+    cliente = Client()
+    cliente.force_login(usuario)
+    return cliente.cookies
+
+
+def carga_wsgi(url, usuario, clientes, peticiones):
+    """``peticiones`` GET a ``url`` repartidos entre ``clientes`` hilos, como un servidor WSGI con hilos."""
+    cookies = _sesion(usuario)
+
+    def trabajar(cantidad):
+        cliente = Client()
+        cliente.cookies = cookies
+        latencias, errores = [], 0
+        try:
+            for _ in range(cantidad):
+                inicio = time.perf_counter()
+                errores += cliente.get(url).status_code != 200
+                latencias.append((time.perf_counter() - inicio) * 1000)
+        finally:
+            connections.close_all()
+        return latencias, errores
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(clientes) as hilos:
+        resultados = list(hilos.map(trabajar, _reparto(peticiones, clientes)))
+    duracion = time.perf_counter() - inicio
+    return Carga([x for latencias, _ in resultados for x in latencias], duracion, sum(e for _, e in resultados))
+
+
+def carga_asgi(url, usuario, clientes, peticiones):
+    """Lo mismo que carga_wsgi, con ``clientes`` tareas en un solo event loop."""
+    cookies = _sesion(usuario)
+
+    async def trabajar(cantidad):
+        cliente = AsyncClient()
+        cliente.cookies = cookies
+        latencias, errores = [], 0
+        for _ in range(cantidad):
+            inicio = time.perf_counter()
+            errores += (await cliente.get(url)).status_code != 200
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        return latencias, errores
+
+    async def todos():
+        return await asyncio.gather(*(trabajar(cantidad) for cantidad in _reparto(peticiones, clientes)))
+
+    inicio = time.perf_counter()
+    resultados = asyncio.run(todos())
+    duracion = time.perf_counter() - inicio
+    return Carga([x for latencias, _ in resultados for x in latencias], duracion, sum(e for _, e in resultados))
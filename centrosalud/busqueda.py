@@ -0,0 +1,155 @@
+"""
+Búsqueda full-text sobre fichas y atenciones médicas.
+
+Cada ficha y cada atención tiene un DocumentoClinico con su texto libre
+concatenado. El índice depende del motor de base de datos:
+
+- PostgreSQL: columna generada ``vector tsvector`` (configuración 'spanish')
+  con índice GIN, consultada con websearch_to_tsquery y ordenada por ts_rank_cd.
+- SQLite: tabla virtual FTS5 de contenido externo, sincronizada por triggers
+  y ordenada por bm25.
+- Otros motores: icontains sin ranking.
+"""
+import re
+
+from django.db import connection, transaction
+
+from centrosalud.models.models import AtencionMedica, DocumentoClinico, FichaMedica
+
+CAMPOS_FICHA = ('antecedentes_personales', 'antecedentes_familiares', 'alergias',
+                'enfermedades_cronicas', 'medicamentos_actuales')
+CAMPOS_ATENCION = ('motivo_consulta', 'diagnostico', 'tratamiento')
+
+TABLA = DocumentoClinico._meta.db_table
+TABLA_FTS = f'{TABLA}_fts'
+
+_PALABRA = re.compile(r'\w+')
+
+
+def componer_texto(objeto, campos):
+    return '\n'.join(valor for valor in (getattr(objeto, campo) for campo in campos) if valor)
+
+
+def _requiere_indexar(campos, update_fields):
+    return update_fields is None or bool(set(campos).intersection(update_fields))
+
+
+def indexar_ficha(ficha, update_fields=None):
+    if not _requiere_indexar(CAMPOS_FICHA, update_fields):
+        return
+    DocumentoClinico.objects.update_or_create(
+        ficha_medica=ficha, atencion=None,
+        defaults={'contenido': componer_texto(ficha, CAMPOS_FICHA)},
+    )
+
+
+def indexar_atencion(atencion, update_fields=None):
+    if not _requiere_indexar(CAMPOS_ATENCION, update_fields):
+        return
+    DocumentoClinico.objects.update_or_create(
+        atencion=atencion,
+        defaults={'ficha_medica_id': atencion.ficha_medica_id,
+                  'contenido': componer_texto(atencion, CAMPOS_ATENCION)},
+    )
+
+
+def indexar_nuevos(fichas=(), atenciones=()):
+    """Documentos de fichas y atenciones recién creadas con bulk_create, en un solo INSERT."""
+    DocumentoClinico.objects.bulk_create(
+        [DocumentoClinico(ficha_medica_id=ficha.pk, contenido=componer_texto(ficha, CAMPOS_FICHA))
+         for ficha in fichas]
+        + [DocumentoClinico(ficha_medica_id=atencion.ficha_medica_id, atencion_id=atencion.pk,
+                            contenido=componer_texto(atencion, CAMPOS_ATENCION)) for atencion in atenciones]
+    )
+
+
+@transaction.atomic
+def reindexar(fichas=None, tamano_lote=2000):
+    """
+    Regenera los documentos de ``fichas`` (queryset o lista de ids; todas si es None).
+    Pensado para cargas masivas hechas con bulk_create, que no disparan señales.
+    """
+    documentos = DocumentoClinico.objects.all()
+    lista_fichas = FichaMedica.objects.all()
+    lista_atenciones = AtencionMedica.objects.all()
+    if fichas is not None:
+        documentos = documentos.filter(ficha_medica__in=fichas)
+        lista_fichas = lista_fichas.filter(pk__in=fichas)
+        lista_atenciones = lista_atenciones.filter(ficha_medica__in=fichas)
+    documentos.delete()
+
+    total = 0
+    lote = []
+    filas = [
+        (lista_fichas.only('id', *CAMPOS_FICHA), CAMPOS_FICHA, lambda f: {'ficha_medica_id': f.pk}),
+        (lista_atenciones.only('id', 'ficha_medica_id', *CAMPOS_ATENCION), CAMPOS_ATENCION,
+         lambda a: {'ficha_medica_id': a.ficha_medica_id, 'atencion_id': a.pk}),
+    ]
+    for queryset, campos, claves in filas:
+        for objeto in queryset.iterator(chunk_size=tamano_lote):
+            lote.append(DocumentoClinico(contenido=componer_texto(objeto, campos), **claves(objeto)))
+            if len(lote) >= tamano_lote:
+                DocumentoClinico.objects.bulk_create(lote)
+                total += len(lote)
+                lote = []
+    DocumentoClinico.objects.bulk_create(lote)
+    return total + len(lote)
+
+
+def _consulta_fts5(texto):
+    # Cada palabra se cita para que la sintaxis de FTS5 (AND, NEAR, "*"...) no se interprete
+    return ' '.join(f'"{palabra}"*' for palabra in _PALABRA.findall(texto))
+
+
+def _ids_rankeados(texto, limite):
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        sql = (f"SELECT d.id, ts_rank_cd(d.vector, q) AS rango "
+               f"FROM {TABLA} d, websearch_to_tsquery('spanish', %s) q "
+               f"WHERE d.vector @@ q ORDER BY rango DESC LIMIT %s")
+        parametros = [texto, limite]
+    elif vendor == 'sqlite':
+        consulta = _consulta_fts5(texto)
+        if not consulta:
+            return []
+        sql = (f"SELECT rowid, -bm25({TABLA_FTS}) AS rango FROM {TABLA_FTS} "
+               f"WHERE {TABLA_FTS} MATCH %s ORDER BY rango DESC LIMIT %s")
+        parametros = [consulta, limite]
+    else:
+        ids = (DocumentoClinico.objects.filter(contenido__icontains=texto)
+               .order_by('-actualizado').values_list('id', flat=True)[:limite])
+        return [(pk, 0.0) for pk in ids]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        return cursor.fetchall()
+
+
+def fragmento(contenido, texto, ancho=160):
+    """Extracto del contenido alrededor de la primera palabra buscada."""
+    minusculas = contenido.lower()
+    posiciones = [minusculas.find(p.lower()) for p in _PALABRA.findall(texto)]
+    posiciones = [p for p in posiciones if p >= 0]
+    inicio = max(min(posiciones) - ancho // 3, 0) if posiciones else 0
+    extracto = contenido[inicio:inicio + ancho]
+    return ('…' if inicio else '') + extracto + ('…' if inicio + ancho < len(contenido) else '')
+
+
+def buscar(texto, limite=50):
+    """Documentos que coinciden con ``texto``, del más al menos relevante."""
+    texto = (texto or '').strip()
+    if not texto:
+        return []
+    rankeados = _ids_rankeados(texto, limite)
+    documentos = (DocumentoClinico.objects
+                  .select_related('ficha_medica__paciente', 'atencion__medico_responsable')
+                  .in_bulk([pk for pk, _ in rankeados]))
+    resultados = []
+    for pk, rango in rankeados:
+        documento = documentos.get(pk)
+        if documento is None:
+            continue
+        documento.rango = rango
+        documento.fragmento = fragmento(documento.contenido, texto)
+        resultados.append(documento)
+    return resultados
@@ -0,0 +1,165 @@
+"""
+Historial de estados y censo diario de pacientes.
+
+Cada cambio de FichaMedica.estado agrega una TransicionEstado y ajusta el
+CensoDiario de hoy: pacientes por (centro, área, estado), donde centro y área
+son los de la atención abierta más reciente del paciente (vacíos si no tiene).
+Abrir, cerrar o cambiar de área una atención traslada al paciente entre filas.
+Todo se dispara desde centrosalud/signals.py.
+
+La fila de hoy de cada clave se crea con el primer cambio del día, partiendo
+del valor de su fila anterior. Los días sin cambios no tienen fila y serie()
+arrastra el último valor conocido, así que un mes de censo lee a lo más una
+fila por clave y por día con movimiento.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.utils import timezone
+
+from centrosalud.models.models import Area, AtencionMedica, CensoDiario, FichaMedica, TransicionEstado
+
+ESTADOS = [estado for estado, _ in FichaMedica.ESTADOS_PACIENTE]
+
+
+def _clave(centro_id, area_id, estado):
+    return f"{centro_id or ''}:{area_id or ''}:{estado}"
+
+
+def _ajustar(fecha, centro_id, area_id, estado, delta):
+    """Suma ``delta`` a la fila del día, creándola desde la fila anterior de la misma clave."""
+    clave = _clave(centro_id, area_id, estado)
+    filas = CensoDiario.objects.filter(clave=clave, fecha=fecha)
+    if filas.update(pacientes=F('pacientes') + delta):
+        return
+    anterior = (CensoDiario.objects.filter(clave=clave, fecha__lt=fecha).order_by('-fecha')
+                .values_list('pacientes', flat=True).first()) or 0
+    try:
+        with transaction.atomic():
+            CensoDiario.objects.create(fecha=fecha, clave=clave, centro_salud_id=centro_id, area_id=area_id,
+                                       estado=estado, pacientes=anterior + delta)
+    except IntegrityError:
+        # Otra transacción creó la fila del día entre el UPDATE y el INSERT
+        filas.update(pacientes=F('pacientes') + delta)
+
+
+def mover(antes, despues):
+    """Traslada un paciente de la fila ``antes`` a ``despues`` (tuplas centro, área, estado, o None)."""
+    if antes == despues:
+        return
+    hoy = timezone.localdate()
+    if antes:
+        _ajustar(hoy, *antes, -1)
+    if despues:
+        _ajustar(hoy, *despues, 1)
+
+
+def sumar(deltas):
+    """Aplica varios traslados de una vez: {(centro, área, estado): delta} (cargas con bulk_create)."""
+    hoy = timezone.localdate()
+    for (centro_id, area_id, estado), delta in deltas.items():
+        if delta:
+            _ajustar(hoy, centro_id, area_id, estado, delta)
+
+
+def _ultima_abierta():
+    return (AtencionMedica.objects.filter(ficha_medica=OuterRef('pk'), fecha_salida__isnull=True)
+            .order_by('-fecha_entrada', '-pk'))
+
+
+def situacion(ficha_id):
+    """(centro, área, estado) en que cuenta hoy la ficha, o None si ya no existe."""
+    abierta = _ultima_abierta()
+    return (FichaMedica.objects.filter(pk=ficha_id)
+            .annotate(censo_centro=Subquery(abierta.values('area__centro_salud_id')[:1]),
+                      censo_area=Subquery(abierta.values('area_id')[:1]))
+            .values_list('censo_centro', 'censo_area', 'estado').first())
+
+
+def situaciones(fichas):
+    """{ficha_id: (centro, área, estado)} de varias fichas, en una consulta."""
+    abierta = _ultima_abierta()
+    return {pk: (centro_id, area_id, estado) for pk, centro_id, area_id, estado in
+            FichaMedica.objects.filter(pk__in=fichas)
+            .annotate(censo_centro=Subquery(abierta.values('area__centro_salud_id')[:1]),
+                      censo_area=Subquery(abierta.values('area_id')[:1]))
+            .values_list('pk', 'censo_centro', 'censo_area', 'estado')}
+
+
+def registrar_cambio(ficha, estado_anterior, usuario=None):
+    """Agrega la TransicionEstado y mueve al paciente en el censo. Devuelve (antes, después)."""
+    # Una ficha nueva todavía no tiene atenciones
+    centro_id, area_id, _ = situacion(ficha.pk) if estado_anterior else (None, None, None)
+    TransicionEstado.objects.create(ficha_medica=ficha, estado_anterior=estado_anterior, estado_nuevo=ficha.estado,
+                                    centro_salud_id=centro_id, area_id=area_id,
+                                    usuario=usuario if usuario and usuario.is_authenticated else None)
+    antes = (centro_id, area_id, estado_anterior) if estado_anterior else None
+    despues = (centro_id, area_id, ficha.estado)
+    mover(antes, despues)
+    return antes, despues
+
+
+def _ultimas_filas(filas, antes_de):
+    """La fila más reciente de cada clave anterior a ``antes_de``."""
+    ultima = (CensoDiario.objects.filter(clave=OuterRef('clave'), fecha__lt=antes_de)
+              .order_by('-fecha').values('fecha')[:1])
+    return filas.filter(fecha__lt=antes_de, fecha=Subquery(ultima))
+
+
+def serie(desde, hasta, **filtros):
+    """
+    [(fecha, {estado: pacientes})] para cada día entre ``desde`` y ``hasta``,
+    sumando las filas que pasen ``filtros`` (p. ej. centro_salud_id, area_id, estado).
+    """
+    filas = CensoDiario.objects.filter(**filtros)
+    vigentes = {clave: (estado, pacientes) for clave, estado, pacientes
+                in _ultimas_filas(filas, desde).values_list('clave', 'estado', 'pacientes')}
+    cambios = defaultdict(list)
+    for fecha, clave, estado, pacientes in (filas.filter(fecha__range=(desde, hasta))
+                                            .values_list('fecha', 'clave', 'estado', 'pacientes')):
+        cambios[fecha].append((clave, estado, pacientes))
+
+    resultado = []
+    dia = desde
+    while dia <= hasta:
+        for clave, estado, pacientes in cambios.get(dia, ()):
+            vigentes[clave] = (estado, pacientes)
+        conteo = dict.fromkeys(ESTADOS, 0)
+        for estado, pacientes in vigentes.values():
+            conteo[estado] += pacientes
+        resultado.append((dia, conteo))
+        dia += timedelta(days=1)
+    return resultado
+
+
+@transaction.atomic
+def recalcular():
+    """
+    Reescribe el censo de hoy desde las fichas actuales con un GROUP BY (para
+    cargas con bulk_create, que no disparan señales). Los días anteriores no se tocan.
+    """
+    hoy = timezone.localdate()
+    centros = dict(Area.objects.values_list('pk', 'centro_salud_id'))
+    actuales = {}
+    for fila in (FichaMedica.objects.annotate(censo_area=Subquery(_ultima_abierta().values('area_id')[:1]))
+                 .values('censo_area', 'estado').annotate(total=Count('pk'))):
+        area_id = fila['censo_area']
+        centro_id = centros.get(area_id)
+        actuales[_clave(centro_id, area_id, fila['estado'])] = (centro_id, area_id, fila['estado'], fila['total'])
+
+    CensoDiario.objects.filter(fecha=hoy).delete()
+    anteriores = {fila.clave: fila for fila in _ultimas_filas(CensoDiario.objects.all(), hoy)}
+    # Las claves que quedaron vacías se cierran con una fila en cero
+    for clave, fila in anteriores.items():
+        if clave not in actuales and fila.pacientes:
+            actuales[clave] = (fila.centro_salud_id, fila.area_id, fila.estado, 0)
+
+    filas = [
+        CensoDiario(fecha=hoy, clave=clave, centro_salud_id=centro_id, area_id=area_id, estado=estado, pacientes=total)
+        for clave, (centro_id, area_id, estado, total) in actuales.items()
+        if clave not in anteriores or anteriores[clave].pacientes != total
+    ]
+    CensoDiario.objects.bulk_create(filas, batch_size=1000)
+    return len(filas)
@@ -0,0 +1,123 @@
+"""
+Tiempo de estadía (fecha_salida - fecha_entrada) de las atenciones cerradas.
+
+Las atenciones dadas de alta en el período se leen por lotes con
+values_list().iterator() a arreglos de NumPy (horas, área, centro, médico) y
+los promedios, percentiles e histogramas de todos los grupos se calculan de
+una vez sobre los arreglos, sin recorrer los resultados fila por fila.
+reporte() guarda el resultado en la caché por período y centro.
+"""
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import timezone
+
+from centrosalud.models.models import Area, AtencionMedica, CentroSalud
+
+PERCENTILES = (50, 90, 95)
+# Límites de los tramos del histograma, en horas
+LIMITES_TRAMOS = (4, 12, 24, 72, 168, 336)
+TRAMOS = ['< 4 h', '4-12 h', '12-24 h', '1-3 días', '3-7 días', '7-14 días', '> 14 días']
+TAMANO_LOTE = 20000
+SIN_GRUPO = -1
+
+DURACION = 24 * 60 * 60
+DURACION_PERIODO_ABIERTO = 5 * 60  # el período incluye hoy: todavía entran altas
+
+
+def _ids(valores, cantidad):
+    return np.fromiter((SIN_GRUPO if valor is None else valor for valor in valores), np.int64, cantidad)
+
+
+def cargar(desde, hasta, centro_id=None):
+    """
+    Arreglos (horas, área, centro, médico) de las atenciones dadas de alta entre
+    ``desde`` y ``hasta`` (fechas locales, inclusive). Área y centro vacíos valen SIN_GRUPO.
+    """
+    inicio = timezone.make_aware(datetime.combine(desde, time.min))
+    fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+    # Rango sobre fecha_salida: usa el índice parcial atencion_fecha_salida_idx
+    atenciones = AtencionMedica.objects.filter(fecha_salida__gte=inicio, fecha_salida__lt=fin)
+    if centro_id:
+        atenciones = atenciones.filter(area__centro_salud_id=centro_id)
+    filas = (atenciones.values_list('fecha_entrada', 'fecha_salida', 'area_id', 'area__centro_salud_id',
+                                    'medico_responsable_id').iterator(chunk_size=TAMANO_LOTE))
+
+    partes = []
+    while lote := list(islice(filas, TAMANO_LOTE)):
+        entradas, salidas, areas, centros, medicos = zip(*lote)
+        cantidad = len(lote)
+        segundos = (np.fromiter((salida.timestamp() for salida in salidas), np.float64, cantidad)
+                    - np.fromiter((entrada.timestamp() for entrada in entradas), np.float64, cantidad))
+        partes.append((segundos / 3600, _ids(areas, cantidad), _ids(centros, cantidad),
+                       np.fromiter(medicos, np.int64, cantidad)))
+    if not partes:
+        vacio = np.empty(0, np.int64)
+        return np.empty(0), vacio, vacio, vacio
+
+    horas, areas, centros, medicos = (np.concatenate(columna) for columna in zip(*partes))
+    validas = horas >= 0  # salida anterior a la entrada: dato mal ingresado
+    return horas[validas], areas[validas], centros[validas], medicos[validas]
+
+
+def por_grupo(horas, grupos):
+    """{id: {'n', 'promedio', 'p50', 'p90', 'p95', 'histograma'}} de cada valor distinto de ``grupos``."""
+    if not len(horas):
+        return {}
+    ids, inverso, conteos = np.unique(grupos, return_inverse=True, return_counts=True)
+    promedios = np.bincount(inverso, weights=horas) / conteos
+
+    # Ordenadas por grupo y dentro de cada grupo por duración: el percentil es un índice
+    ordenadas = horas[np.lexsort((horas, inverso))]
+    inicios = np.concatenate(([0], np.cumsum(conteos)[:-1]))
+    percentiles = {p: ordenadas[inicios + np.ceil(p / 100 * conteos).astype(np.int64) - 1] for p in PERCENTILES}
+
+    tramos = np.searchsorted(LIMITES_TRAMOS, horas, side='right')
+    histogramas = np.bincount(inverso * len(TRAMOS) + tramos, minlength=len(ids) * len(TRAMOS)).reshape(len(ids), -1)
+
+    return {
+        int(grupo): {
+            'n': int(conteos[i]),
+            'promedio': round(float(promedios[i]), 1),
+            **{f'p{p}': round(float(valores[i]), 1) for p, valores in percentiles.items()},
+            'histograma': histogramas[i].tolist(),
+        }
+        for i, grupo in enumerate(ids)
+    }
+
+
+def _con_nombres(resumen, nombres, sin_nombre):
+    filas = [{'id': None if grupo == SIN_GRUPO else grupo, 'nombre': nombres.get(grupo, sin_nombre), **datos}
+             for grupo, datos in resumen.items()]
+    return sorted(filas, key=lambda fila: -fila['n'])
+
+
+def calcular(desde, hasta, centro_id=None):
+    horas, areas, centros, medicos = cargar(desde, hasta, centro_id)
+    por_area, por_centro, por_medico = por_grupo(horas, areas), por_grupo(horas, centros), por_grupo(horas, medicos)
+    return {
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'tramos': TRAMOS,
+        'total': por_grupo(horas, np.zeros(len(horas), np.int64)).get(0),
+        'areas': _con_nombres(por_area, dict(Area.objects.filter(pk__in=list(por_area))
+                                             .values_list('pk', 'nombre')), 'Sin área'),
+        'centros': _con_nombres(por_centro, dict(CentroSalud.objects.filter(pk__in=list(por_centro))
+                                                 .values_list('pk', 'nombre')), 'Sin centro'),
+        'medicos': _con_nombres(por_medico, dict(User.objects.filter(pk__in=list(por_medico))
+                                                 .values_list('pk', 'username')), ''),
+    }
+
+
+def reporte(desde, hasta, centro_id=None):
+    """calcular() con caché: un día si el período ya terminó, unos minutos si incluye hoy."""
+    clave = f'estadias:{centro_id or "*"}:{desde.isoformat()}:{hasta.isoformat()}'
+    datos = cache.get(clave)
+    if datos is None:
+        datos = calcular(desde, hasta, centro_id)
+        abierto = hasta >= timezone.localdate()
+        cache.set(clave, datos, DURACION_PERIODO_ABIERTO if abierto else DURACION)
+    return datos
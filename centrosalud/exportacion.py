@@ -0,0 +1,70 @@
+"""
+Exportación de atenciones a CSV en streaming.
+
+Las filas salen de un cursor del lado del servidor (``.iterator(chunk_size)``)
+con una proyección ``values()``: nunca se arma la lista completa ni se crean
+instancias de modelo. Cada lote se escribe como un trozo de CSV (y se comprime
+con zlib si se pide gzip) y se entrega apenas está listo.
+"""
+import csv
+import io
+import zlib
+from itertools import islice
+
+from django.utils import timezone
+
+COLUMNAS = [
+    ('id', 'atencion'),
+    ('fecha_entrada', 'fecha_entrada'),
+    ('fecha_salida', 'fecha_salida'),
+    ('ficha_medica__paciente__rut', 'rut'),
+    ('ficha_medica__paciente__nombre', 'nombre'),
+    ('ficha_medica__paciente__apellido1', 'apellido1'),
+    ('ficha_medica__estado', 'estado'),
+    ('area__centro_salud__nombre', 'centro'),
+    ('area__nombre', 'area'),
+    ('medico_responsable__username', 'medico'),
+    ('motivo_consulta', 'motivo_consulta'),
+    ('diagnostico', 'diagnostico'),
+    ('tratamiento', 'tratamiento'),
+]
+TAMANO_LOTE = 2000
+# Una celda que empieza así se interpreta como fórmula al abrir el archivo en una planilla
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _celda(valor):
+    if valor is None:
+        return ''
+    if hasattr(valor, 'tzinfo'):
+        return timezone.localtime(valor).strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def lineas_csv(atenciones, tamano_lote=TAMANO_LOTE):
+    """Genera el CSV de ``atenciones`` en trozos de texto de un lote cada uno, con encabezado."""
+    campos = [campo for campo, _ in COLUMNAS]
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow([titulo for _, titulo in COLUMNAS])
+    filas = atenciones.values_list(*campos).iterator(chunk_size=tamano_lote)
+    while True:
+        lote = list(islice(filas, tamano_lote))
+        escritor.writerows([_celda(valor) for valor in fila] for fila in lote)
+        yield buffer.getvalue()
+        if len(lote) < tamano_lote:
+            return
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def comprimir(trozos):
+    """Comprime en formato gzip un generador de trozos de texto, sin juntarlos."""
+    compresor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for trozo in trozos:
+        datos = compresor.compress(trozo.encode('utf-8'))
+        if datos:
+            yield datos
+    yield compresor.flush()
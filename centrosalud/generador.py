@@ -0,0 +1,291 @@
+"""
+Generador determinista de datos sintéticos a escala de producción.
+
+Con la misma semilla y parámetros produce exactamente los mismos registros,
+para que benchmarks e índices se puedan comparar entre corridas. Todo se
+inserta con bulk_create por lotes de pacientes, así que la memoria no crece
+con el tamaño del dataset.
+"""
+import math
+import random
+from datetime import date, datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Permission, User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from centrosalud import busqueda, censo, ocupacion, opciones
+from centrosalud.models.models import (
+    Area, AreaCategory, AtencionExamen, AtencionMedica, CentroSalud, DocumentoClinico, ExamenMedico,
+    FichaMedica, Paciente, TransicionEstado,
+)
+from centrosalud.rut import formatear_rut
+from login import perfil_cache
+from login.models.models import PerfilUsuario
+
+RUT_BASE = 30_000_000  # los RUT generados parten aquí, lejos de RUT reales
+FECHA_BASE = date(2025, 1, 1)
+DOMINIO = 'dataset.invalid'  # correo de los usuarios generados: limpiar() borra solo esos
+
+AREAS = ["Urgencias", "UCI", "Hospitalizacion", "Pabellon", "Parto", "Pediatria",
+         "Traumatologia", "Medicina Interna", "Laboratorio", "Imagenologia", "Odontologia", "Sala de espera"]
+# Horas medianas de estadía por área (distribución lognormal alrededor de este valor)
+ESTADIA_MEDIANA = {"Urgencias": 6, "UCI": 120, "Hospitalizacion": 96, "Pabellon": 48, "Parto": 36,
+                   "Pediatria": 48, "Traumatologia": 72, "Medicina Interna": 96}
+ESTADOS = [('EN_ALTA', 70), ('EN_TRATAMIENTO', 18), ('PRE_OPERATORIO', 5), ('POST_OPERATORIO', 7)]
+EXAMENES = ["Hemograma", "Perfil bioquímico", "Glicemia", "Perfil lipídico", "Orina completa",
+            "Radiografía de tórax", "Electrocardiograma", "Ecografía abdominal", "TAC de cerebro",
+            "Resonancia magnética", "Gases arteriales", "PCR", "Troponina", "Coagulación", "Cultivo"]
+NOMBRES = ["Roberto", "Carolina", "Miguel", "Isabel", "José", "María", "Juan", "Camila", "Luis", "Fernanda",
+           "Pedro", "Valentina", "Diego", "Javiera", "Matías", "Constanza", "Felipe", "Catalina"]
+APELLIDOS = ["Silva", "Ramírez", "González", "Martínez", "Muñoz", "Rojas", "Díaz", "Pérez", "Soto",
+             "Contreras", "Sepúlveda", "Morales", "Rodríguez", "López", "Fuentes", "Hernández", "Torres"]
+COMUNAS = ["Talca", "Curicó", "Linares", "Cauquenes", "Constitución", "Molina", "San Javier", "Parral"]
+MOTIVOS = ["Dolor abdominal", "Dolor precordial", "Fiebre persistente", "Dificultad respiratoria",
+           "Control crónico", "Trauma por caída", "Cefalea intensa", "Control post-operatorio",
+           "Trabajo de parto", "Descompensación diabética", "Crisis hipertensiva", "Fractura de extremidad"]
+DIAGNOSTICOS = ["Apendicitis aguda", "Angina de pecho estable", "Neumonía adquirida en comunidad",
+                "Diabetes tipo 2 descompensada", "Hipertensión arterial", "Fractura de radio distal",
+                "Migraña", "Gastroenteritis aguda", "Infección urinaria", "Embarazo de término"]
+ALERGIAS = [None, None, None, "Penicilina", "Látex", "Sulfas", "AINEs", "Mariscos"]
+CRONICAS = [None, None, "Diabetes tipo 2", "Hipertensión", "Asma", "EPOC", "Hipotiroidismo"]
+
+
+class GeneradorDataset:
+    def __init__(self, semilla=42, centros=3, areas_por_centro=8, medicos=50, pacientes=1000,
+                 atenciones=3000, examenes_por_atencion=0.5, dias=365, tamano_lote=5000, prefijo='gen',
+                 indexar=True, salida=None):
+        self.rng = random.Random(semilla)
+        self.centros = centros
+        self.areas_por_centro = min(areas_por_centro, len(AREAS))
+        self.medicos = medicos
+        self.pacientes = pacientes
+        self.atenciones_por_paciente = atenciones / pacientes if pacientes else 0
+        self.examenes_por_atencion = examenes_por_atencion
+        self.dias = dias
+        self.tamano_lote = tamano_lote
+        self.prefijo = prefijo
+        self.indexar = indexar
+        self.salida = salida or (lambda mensaje: None)
+        self.fin = timezone.make_aware(datetime.combine(FECHA_BASE, datetime.min.time()))
+        self.totales = {'centros': 0, 'areas': 0, 'medicos': 0, 'pacientes': 0, 'atenciones': 0, 'examenes': 0}
+
+    def existe(self):
+        return self._usuarios().exists()
+
+    def _usuarios(self):
+        return User.objects.filter(username__startswith=f'{self.prefijo}_', email__endswith=f'@{DOMINIO}')
+
+    def _centros(self):
+        return CentroSalud.objects.filter(nombre__startswith=f'[{self.prefijo}]')
+
+    def limpiar(self, recalcular=True):
+        """
+        Borra el dataset de este prefijo. Un paciente cuenta como generado si su RUT
+        está en el rango del generador y tiene atenciones en los centros del prefijo:
+        un paciente real con un RUT alto no se toca. Se borra por lotes con DELETE
+        directos, sin la cascada fila a fila del ORM ni las señales, así que al final
+        se recalculan ocupación y censo (``recalcular=False`` si el llamador lo hará).
+        De los usuarios con el prefijo solo se borran los que creó el generador.
+        """
+        centros = list(self._centros().values_list('pk', flat=True))
+        generados = Paciente.objects.filter(
+            rut_numero__gte=RUT_BASE,
+            pk__in=AtencionMedica.objects.filter(area__centro_salud__in=centros).values('ficha_medica__paciente'),
+        )
+        while centros:
+            ids = list(generados.order_by('pk').values_list('pk', flat=True)[:self.tamano_lote])
+            if not ids:
+                break
+            with transaction.atomic(), connection.cursor() as cursor:
+                for sql in self._sql_borrado(len(ids)):
+                    cursor.execute(sql, ids)
+            self.salida(f"  {len(ids)} pacientes borrados")
+
+        # Pocas filas: la cascada del ORM alcanza
+        with transaction.atomic():
+            self._centros().delete()
+            self._usuarios().delete()
+        if recalcular:
+            ocupacion.recalcular()
+            censo.recalcular()
+
+    @staticmethod
+    def _sql_borrado(cantidad):
+        """DELETE de un lote de ``cantidad`` pacientes; cada sentencia recibe los ids una vez."""
+        nombre = connection.ops.quote_name
+
+        def tabla(modelo):
+            return nombre(modelo._meta.db_table)
+
+        def columna(modelo, campo):
+            return nombre(modelo._meta.get_field(campo).column)
+
+        pacientes = ', '.join(['%s'] * cantidad)
+        fichas = f"SELECT {columna(FichaMedica, 'id')} FROM {tabla(FichaMedica)} " \
+                 f"WHERE {columna(FichaMedica, 'paciente')} IN ({pacientes})"
+        atenciones = f"SELECT {columna(AtencionMedica, 'id')} FROM {tabla(AtencionMedica)} " \
+                     f"WHERE {columna(AtencionMedica, 'ficha_medica')} IN ({fichas})"
+        # Orden de borrado: primero lo que apunta a la ficha y a sus atenciones
+        return [
+            f"DELETE FROM {tabla(modelo)} WHERE {columna(modelo, campo)} IN ({subconsulta})"
+            for modelo, campo, subconsulta in (
+                (DocumentoClinico, 'ficha_medica', fichas),
+                (AtencionExamen, 'atencion_medica', atenciones),
+                (TransicionEstado, 'ficha_medica', fichas),
+                (AtencionMedica, 'ficha_medica', fichas),
+                (FichaMedica, 'paciente', pacientes),
+                (Paciente, 'id', pacientes),
+            )
+        ]
+
+    def generar(self):
+        self._crear_catalogos()
+        inicio = 0
+        while inicio < self.pacientes:
+            cantidad = min(self.tamano_lote, self.pacientes - inicio)
+            with transaction.atomic():
+                self._crear_lote_pacientes(inicio, cantidad)
+            inicio += cantidad
+            self.salida(f"  {inicio}/{self.pacientes} pacientes, {self.totales['atenciones']} atenciones")
+        return self.totales
+
+    # --- catálogos: centros, áreas, médicos y exámenes ---
+
+    @transaction.atomic
+    def _crear_catalogos(self):
+        categorias = {
+            tipo: AreaCategory.objects.get_or_create(nombre=nombre, tipo=tipo)[0]
+            for tipo, nombre in (('HOSPITAL', "Areas de Hospital"), ('CESFAM', "Areas de CESFAM"))
+        }
+        centros = CentroSalud.objects.bulk_create([
+            CentroSalud(nombre=f"[{self.prefijo}] Centro {i + 1}", direccion=f"Calle {i + 1}, {COMUNAS[i % len(COMUNAS)]}",
+                        telefono=f"71{2000000 + i}", tipo='CESFAM' if i % 3 == 2 else 'HOSPITAL')
+            for i in range(self.centros)
+        ])
+        areas = Area.objects.bulk_create([
+            Area(nombre=nombre, centro_salud=centro, categoria=categorias[centro.tipo])
+            for centro in centros for nombre in AREAS[:self.areas_por_centro]
+        ])
+        # Carga desigual entre áreas (tipo Zipf): urgencias recibe mucho más que imagenología
+        self.areas = areas
+        self.pesos_areas = [1 / (AREAS.index(a.nombre) + 1) ** 1.1 for a in areas]
+
+        clave = make_password('12345678')
+        usuarios = []
+        for i, centro in enumerate(centros, start=1):
+            usuarios.append((self._usuario(f"director_{i}", clave), 'DIRECTOR', centro))
+            usuarios.append((self._usuario(f"ingreso_{i}", clave), 'INGRESO', centro))
+        for i in range(self.medicos):
+            usuario = self._usuario(f"medico_{i}", clave, first_name=self.rng.choice(NOMBRES),
+                                    last_name=self.rng.choice(APELLIDOS))
+            usuarios.append((usuario, 'MEDICO', centros[i % len(centros)] if centros else None))
+        User.objects.bulk_create([u for u, _, _ in usuarios])
+        creados = {u.username: u.pk for u in self._usuarios()}
+        PerfilUsuario.objects.bulk_create([
+            PerfilUsuario(user_id=creados[u.username], tipo=tipo, centro_salud=centro,
+                          rut=formatear_rut(RUT_BASE - 1 - n))
+            for n, (u, tipo, centro) in enumerate(usuarios)
+        ])
+        # Personal sin perfil clínico para las rutas de gestión de usuarios y métricas
+        administrador = self._usuario("admin_1", clave, is_staff=True)
+        administrador.save()
+        administrador.user_permissions.add(
+            Permission.objects.get(content_type__app_label='login', codename='change_perfilusuario'))
+        # bulk_create no dispara señales; la caché podría tener a estos ids como "sin perfil"
+        perfil_cache.invalidar_todos()
+        opciones.invalidar()
+        self.medicos_por_centro = {}
+        for u, tipo, centro in usuarios:
+            if tipo == 'MEDICO':
+                self.medicos_por_centro.setdefault(centro.pk if centro else None, []).append(creados[u.username])
+        self.todos_los_medicos = sorted(m for ids in self.medicos_por_centro.values() for m in ids)
+
+        examenes = list(ExamenMedico.objects.filter(nombre_examen__in=EXAMENES))
+        faltantes = set(EXAMENES) - {e.nombre_examen for e in examenes}
+        examenes += ExamenMedico.objects.bulk_create([ExamenMedico(nombre_examen=n) for n in EXAMENES if n in faltantes])
+        self.examenes = sorted(examenes, key=lambda e: e.nombre_examen)
+
+        self.totales.update(centros=len(centros), areas=len(areas), medicos=self.medicos)
+
+    def _usuario(self, nombre, clave, **campos):
+        username = f"{self.prefijo}_{nombre}"
+        return User(username=username, password=clave, email=f"{username}@{DOMINIO}", **campos)
+
+    # --- pacientes, fichas, atenciones y exámenes ---
+
+    def _crear_lote_pacientes(self, inicio, cantidad):
+        rng = self.rng
+        pacientes = []
+        for n in range(inicio, inicio + cantidad):
+            numero = RUT_BASE + n
+            nacimiento = FECHA_BASE - timedelta(days=int(rng.triangular(0, 95, 40) * 365.25))
+            pacientes.append(Paciente(
+                nombre=rng.choice(NOMBRES), apellido1=rng.choice(APELLIDOS), apellido2=rng.choice(APELLIDOS),
+                rut=formatear_rut(numero), rut_numero=numero, fecha_nacimiento=nacimiento,
+                telefono=f"9{rng.randrange(10**7, 10**8)}", direccion=f"Pasaje {rng.randrange(1, 999)}, {rng.choice(COMUNAS)}",
+            ))
+        Paciente.objects.bulk_create(pacientes)
+
+        estados = [codigo for codigo, _ in ESTADOS]
+        pesos = [peso for _, peso in ESTADOS]
+        fichas = FichaMedica.objects.bulk_create([
+            FichaMedica(paciente=paciente, estado=rng.choices(estados, pesos)[0],
+                        alergias=rng.choice(ALERGIAS), enfermedades_cronicas=rng.choice(CRONICAS))
+            for paciente in pacientes
+        ])
+
+        atenciones = []
+        for ficha in fichas:
+            atenciones.extend(self._atenciones_de(ficha))
+        AtencionMedica.objects.bulk_create(atenciones, batch_size=self.tamano_lote)
+
+        examenes = []
+        for atencion in atenciones:
+            for _ in range(self._cantidad_examenes()):
+                solicitud = atencion.fecha_entrada + timedelta(hours=rng.uniform(0, 6))
+                examenes.append(AtencionExamen(
+                    atencion_medica=atencion, examen_medico=rng.choice(self.examenes), fecha_solicitud=solicitud,
+                    fecha_resultado=solicitud + timedelta(hours=rng.lognormvariate(1.5, 0.8)),
+                    resultados="Dentro de rangos normales" if rng.random() < 0.8 else "Alterado, requiere control",
+                ))
+        AtencionExamen.objects.bulk_create(examenes, batch_size=self.tamano_lote)
+        if self.indexar:
+            # Solo lo de este lote: el resto de la base no se reindexa
+            busqueda.indexar_nuevos(fichas, atenciones)
+
+        self.totales['pacientes'] += len(pacientes)
+        self.totales['atenciones'] += len(atenciones)
+        self.totales['examenes'] += len(examenes)
+
+    def _atenciones_de(self, ficha):
+        rng = self.rng
+        if not self.atenciones_por_paciente:
+            return []
+        # Pocos pacientes crónicos concentran muchas atenciones (distribución exponencial)
+        cantidad = max(1, round(rng.expovariate(1 / self.atenciones_por_paciente)))
+        entradas = sorted(self.fin - timedelta(minutes=rng.randrange(self.dias * 24 * 60)) for _ in range(cantidad))
+        atenciones = []
+        for i, entrada in enumerate(entradas):
+            area = rng.choices(self.areas, self.pesos_areas)[0]
+            medicos = self.medicos_por_centro.get(area.centro_salud_id) or self.todos_los_medicos
+            horas = rng.lognormvariate(0, 0.9) * ESTADIA_MEDIANA.get(area.nombre, 2)
+            salida = min(entrada + timedelta(hours=horas), self.fin)
+            # La última atención sigue abierta si el paciente no está de alta
+            if i == cantidad - 1 and ficha.estado != 'EN_ALTA':
+                salida = None
+            atenciones.append(AtencionMedica(
+                ficha_medica=ficha, medico_responsable_id=rng.choice(medicos), area=area,
+                fecha_entrada=entrada, fecha_salida=salida, motivo_consulta=rng.choice(MOTIVOS),
+                diagnostico=rng.choice(DIAGNOSTICOS), tratamiento="Manejo según protocolo",
+            ))
+        return atenciones
+
+    def _cantidad_examenes(self):
+        # Poisson por inversión, suficiente para medias pequeñas
+        limite, producto, cantidad = math.exp(-self.examenes_por_atencion), self.rng.random(), 0
+        while producto > limite:
+            producto *= self.rng.random()
+            cantidad += 1
+        return cantidad
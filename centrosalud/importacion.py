@@ -0,0 +1,239 @@
+"""
+Carga masiva de pacientes (Paciente + FichaMedica + AtencionMedica inicial).
+
+Lee CSV o JSONL fila a fila y escribe en lotes de tamaño fijo: nunca se
+mantiene el archivo completo en memoria. Las áreas y médicos se resuelven con
+diccionarios cargados una sola vez al inicio. Los rechazos se entregan a
+``al_rechazar`` a medida que ocurren y solo se guardan los primeros.
+"""
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from centrosalud import busqueda
+from centrosalud.models.models import Area, AtencionMedica, FichaMedica, Paciente
+from centrosalud.rut import cuerpo_rut, formatear_rut, normalizar_rut
+
+CAMPOS_PACIENTE = ('nombre', 'apellido1', 'apellido2', 'fecha_nacimiento', 'telefono', 'direccion')
+CAMPOS_FICHA = ('estado', 'antecedentes_personales', 'antecedentes_familiares', 'alergias',
+                'enfermedades_cronicas', 'medicamentos_actuales')
+ESTADOS = {codigo for codigo, _ in FichaMedica.ESTADOS_PACIENTE}
+MUESTRA_RECHAZOS = 20
+
+
+class FilaRechazada(Exception):
+    pass
+
+
+def leer_filas(archivo, formato):
+    """Genera (numero_de_linea, dict) sin cargar el archivo completo."""
+    if formato == 'jsonl':
+        for numero, linea in enumerate(archivo, start=1):
+            if not linea.strip():
+                continue
+            try:
+                fila = json.loads(linea)
+            except ValueError:
+                yield numero, None
+                continue
+            yield numero, fila if isinstance(fila, dict) else None
+    else:
+        lector = csv.DictReader(archivo)
+        for fila in lector:
+            yield lector.line_num, fila
+
+
+def _texto(fila, campo):
+    valor = fila.get(campo)
+    return str(valor).strip() if valor not in (None, '') else ''
+
+
+def leer_fecha(valor):
+    if not valor:
+        return None
+    fecha = parse_date(valor)
+    if fecha is None:
+        try:
+            fecha = datetime.strptime(valor, '%d/%m/%Y').date()
+        except ValueError:
+            raise FilaRechazada(f"fecha inválida: {valor!r}")
+    return fecha
+
+
+def _fecha_hora(valor):
+    if not valor:
+        return None
+    try:
+        fecha_hora = parse_datetime(valor)
+    except ValueError:
+        fecha_hora = None
+    if fecha_hora is None:
+        fecha = leer_fecha(valor)
+        fecha_hora = datetime(fecha.year, fecha.month, fecha.day)
+    if timezone.is_naive(fecha_hora):
+        fecha_hora = timezone.make_aware(fecha_hora)
+    return fecha_hora
+
+
+class ImportadorPacientes:
+    def __init__(self, centro_salud=None, tamano_lote=1000, usar_copy=False, al_rechazar=None):
+        self.tamano_lote = tamano_lote
+        self.usar_copy = usar_copy and connection.vendor == 'postgresql'
+        self.al_rechazar = al_rechazar  # función(linea, motivo), p. ej. para escribir el reporte
+        self.importados = 0
+        self.leidos = 0
+        self.total_rechazados = 0
+        self.rechazados = []  # (linea, motivo), solo los primeros MUESTRA_RECHAZOS
+
+        areas = Area.objects.all()
+        if centro_salud is not None:
+            areas = areas.filter(centro_salud=centro_salud)
+        # Sin centro, un nombre puede repetirse entre centros: se guardan todos los ids
+        self.areas = {}
+        for area_id, nombre in areas.values_list('id', 'nombre'):
+            self.areas[str(area_id)] = [area_id]
+            self.areas.setdefault(nombre.strip().lower(), []).append(area_id)
+
+        self.medicos = {}
+        for user_id, username, rut in (User.objects.filter(perfil__tipo='MEDICO')
+                                       .values_list('id', 'username', 'perfil__rut')):
+            self.medicos[username.lower()] = user_id
+            if cuerpo_rut(rut) is not None:
+                self.medicos[cuerpo_rut(rut)] = user_id
+
+    def _medico(self, valor):
+        valor = valor.strip()
+        medico_id = self.medicos.get(valor.lower())
+        if medico_id is None and cuerpo_rut(valor) is not None:
+            medico_id = self.medicos.get(cuerpo_rut(valor))
+        if medico_id is None:
+            raise FilaRechazada(f"médico desconocido: {valor!r}")
+        return medico_id
+
+    def _area(self, valor):
+        ids = self.areas.get(valor.lower())
+        if not ids:
+            raise FilaRechazada(f"área desconocida: {valor!r}")
+        if len(ids) > 1:
+            raise FilaRechazada(f"área {valor!r} existe en {len(ids)} centros: use el id del área o --centro")
+        return ids[0]
+
+    def _rechazar(self, linea, motivo):
+        self.total_rechazados += 1
+        if len(self.rechazados) < MUESTRA_RECHAZOS:
+            self.rechazados.append((linea, motivo))
+        if self.al_rechazar is not None:
+            self.al_rechazar(linea, motivo)
+
+    def preparar(self, fila):
+        """Valida una fila y la convierte a instancias sin guardar."""
+        if fila is None:
+            raise FilaRechazada("fila ilegible")
+        try:
+            numero = normalizar_rut(_texto(fila, 'rut'))
+        except ValidationError as error:
+            raise FilaRechazada(f"RUT {_texto(fila, 'rut')!r}: {error.messages[0]}")
+
+        datos = {campo: _texto(fila, campo) for campo in CAMPOS_PACIENTE}
+        faltantes = [c for c in ('nombre', 'apellido1', 'fecha_nacimiento', 'direccion') if not datos[c]]
+        if faltantes:
+            raise FilaRechazada(f"faltan campos: {', '.join(faltantes)}")
+        datos['fecha_nacimiento'] = leer_fecha(datos['fecha_nacimiento'])
+        datos['apellido2'] = datos['apellido2'] or None
+        paciente = Paciente(rut=formatear_rut(numero), rut_numero=numero, **datos)
+
+        ficha = FichaMedica(**{campo: _texto(fila, campo) or None for campo in CAMPOS_FICHA[1:]})
+        ficha.estado = _texto(fila, 'estado').upper() or 'EN_TRATAMIENTO'
+        if ficha.estado not in ESTADOS:
+            raise FilaRechazada(f"estado desconocido: {ficha.estado!r}")
+
+        atencion = None
+        if _texto(fila, 'area') or _texto(fila, 'medico'):
+            atencion = AtencionMedica(
+                area_id=self._area(_texto(fila, 'area')),
+                medico_responsable_id=self._medico(_texto(fila, 'medico')),
+                motivo_consulta=_texto(fila, 'motivo_consulta') or None,
+                diagnostico=_texto(fila, 'diagnostico') or None,
+                tratamiento=_texto(fila, 'tratamiento') or None,
+                fecha_entrada=_fecha_hora(_texto(fila, 'fecha_entrada')) or timezone.now(),
+                fecha_salida=_fecha_hora(_texto(fila, 'fecha_salida')),
+            )
+        return paciente, ficha, atencion
+
+    def importar(self, filas):
+        """Procesa el iterable de (linea, fila) en lotes; devuelve la cantidad importada."""
+        lote = []
+        for linea, fila in filas:
+            self.leidos += 1
+            try:
+                lote.append((linea, *self.preparar(fila)))
+            except FilaRechazada as error:
+                self._rechazar(linea, str(error))
+            if len(lote) >= self.tamano_lote:
+                self._guardar_lote(lote)
+                lote = []
+        if lote:
+            self._guardar_lote(lote)
+        return self.importados
+
+    def _guardar_lote(self, lote):
+        # Duplicados dentro del lote y contra la base, con una sola consulta
+        existentes = set(Paciente.objects.filter(rut_numero__in=[p.rut_numero for _, p, _, _ in lote])
+                         .values_list('rut_numero', flat=True))
+        validos = []
+        for linea, paciente, ficha, atencion in lote:
+            if paciente.rut_numero in existentes:
+                self._rechazar(linea, f"RUT {paciente.rut} ya registrado")
+                continue
+            existentes.add(paciente.rut_numero)
+            validos.append((paciente, ficha, atencion))
+        if not validos:
+            return
+
+        with transaction.atomic():
+            pacientes = [paciente for paciente, _, _ in validos]
+            self._insertar(Paciente, pacientes, 'rut_numero', [p.rut_numero for p in pacientes])
+            for paciente, ficha, _ in validos:
+                ficha.paciente_id = paciente.pk
+            fichas = [ficha for _, ficha, _ in validos]
+            self._insertar(FichaMedica, fichas, 'paciente_id', [f.paciente_id for f in fichas])
+            atenciones = []
+            for _, ficha, atencion in validos:
+                if atencion is not None:
+                    atencion.ficha_medica_id = ficha.pk
+                    atenciones.append(atencion)
+            self._insertar(AtencionMedica, atenciones)
+            busqueda.indexar_nuevos(fichas, atenciones)
+        self.importados += len(validos)
+
+    def _insertar(self, modelo, objetos, clave=None, valores=None):
+        """bulk_create, o COPY en PostgreSQL recuperando los ids por una clave única."""
+        if not objetos:
+            return
+        if not (self.usar_copy and clave):
+            modelo.objects.bulk_create(objetos, batch_size=self.tamano_lote)
+            return
+        campos = [f for f in modelo._meta.concrete_fields if not f.primary_key]
+        columnas = ', '.join(connection.ops.quote_name(f.column) for f in campos)
+        with connection.cursor() as cursor:
+            with cursor.cursor.copy(f"COPY {modelo._meta.db_table} ({columnas}) FROM STDIN") as copia:
+                for objeto in objetos:
+                    copia.write_row([f.get_db_prep_save(getattr(objeto, f.attname), connection) for f in campos])
+        ids = dict(modelo.objects.filter(**{f'{clave}__in': valores}).values_list(clave, 'pk'))
+        for objeto, valor in zip(objetos, valores):
+            objeto.pk = ids[valor]
+
+
+def abrir_texto(ruta):
+    """Abre el archivo como texto UTF-8 (acepta BOM), o stdin si la ruta es '-'."""
+    if ruta == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig')
+    return open(ruta, encoding='utf-8-sig', newline='')
@@ -0,0 +1,154 @@
+"""
+Asesor de índices.
+
+Ejecuta EXPLAIN sobre un catálogo de las consultas más frecuentes del
+proyecto (el get_queryset de cada vista, los filtros del admin y los reportes
+por rango de fechas) y reporta recorridos secuenciales sobre tablas grandes y
+ordenamientos en tablas temporales, junto al índice que la consulta necesita.
+
+Soporta PostgreSQL (EXPLAIN en JSON) y SQLite (EXPLAIN QUERY PLAN).
+"""
+import json
+import re
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from django.http import HttpRequest
+from django.utils import timezone
+
+from centrosalud.models.models import AtencionExamen, AtencionMedica, DocumentoClinico, FichaMedica, Paciente
+from centrosalud.views import director_views, doctor_views
+
+# Tablas que crecen con la operación; un recorrido completo en las demás (catálogos) es aceptable
+TABLAS_GRANDES = {m._meta.db_table for m in (Paciente, FichaMedica, AtencionMedica, AtencionExamen, DocumentoClinico)}
+
+_SCAN_SQLITE = re.compile(r'\bSCAN (\w+)(?: AS \w+)?(?! USING)(.*)$')
+
+MOTORES = ('postgresql', 'sqlite')
+
+
+class MotorNoSoportado(Exception):
+    pass
+
+
+class ConsultaCaliente:
+    def __init__(self, nombre, construir, indice, permitidos=()):
+        self.nombre = nombre
+        self.construir = construir      # función(muestra) -> queryset
+        self.indice = indice            # índice que la consulta necesita
+        self.permitidos = set(permitidos)  # tablas grandes que se recorren a propósito
+
+
+class Muestra:
+    """Valores reales de la base con los que se arman las consultas (médico, director, ficha)."""
+
+    def __init__(self):
+        abierta = (AtencionMedica.objects.filter(fecha_salida__isnull=True)
+                   .values_list('medico_responsable_id', flat=True).first())
+        self.medico = User.objects.filter(pk=abierta).first() or User.objects.filter(perfil__tipo='MEDICO').first()
+        self.director = User.objects.filter(perfil__tipo='DIRECTOR').first()
+        self.ficha_id = (AtencionMedica.objects.values('ficha_medica').annotate(total=Count('pk'))
+                         .order_by('-total').values_list('ficha_medica', flat=True).first())
+        self.desde = timezone.now() - timedelta(days=7)
+        if self.medico is None or self.director is None:
+            raise ValueError("La base necesita al menos un médico y un director (ver generar_dataset).")
+
+
+def _vista(clase, usuario, **kwargs):
+    request = HttpRequest()
+    request.method = 'GET'
+    request.user = usuario
+    vista = clase()
+    vista.setup(request, **kwargs)
+    return vista
+
+
+def _primera_pagina(vista):
+    # Igual que KeysetPaginationMixin: orden por la clave y LIMIT del tamaño de página
+    return vista.get_queryset().order_by(*vista.keyset_ordering)[:vista.paginate_by + 1]
+
+
+CONSULTAS = [
+    # El orden por pk con LIMIT corta el recorrido apenas llena la página
+    ConsultaCaliente('doctor_patient_list', lambda m: _primera_pagina(_vista(doctor_views.DoctorPatientListView, m.medico)),
+                     "PK de centrosalud_paciente + EXISTS por atencion(ficha_medica)",
+                     permitidos={Paciente._meta.db_table}),
+    ConsultaCaliente('doctor_worklist', lambda m: _primera_pagina(_vista(doctor_views.MisPacientesActivosView, m.medico)),
+                     "atencion_activa_medico_idx (medico_responsable, -fecha_entrada, -id) WHERE fecha_salida IS NULL"),
+    ConsultaCaliente('patient_detail', lambda m: AtencionMedica.objects.filter(ficha_medica_id=m.ficha_id)
+                     .order_by('-fecha_entrada', '-pk')[:21],
+                     "atencion_ficha_fecha_idx (ficha_medica, -fecha_entrada, -id)"),
+    ConsultaCaliente('director_dashboard', lambda m: _vista(director_views.DirectorDashboardView, m.director).get_queryset(),
+                     "atencion_abierta_fecha_idx (-fecha_entrada) WHERE fecha_salida IS NULL"),
+    ConsultaCaliente('admin_ficha_por_estado', lambda m: FichaMedica.objects.filter(estado='PRE_OPERATORIO')
+                     .select_related('paciente').order_by('-pk')[:100],
+                     "ficha_estado_idx (estado)"),
+    ConsultaCaliente('admin_atenciones_ultimos_7_dias', lambda m: AtencionMedica.objects
+                     .filter(fecha_entrada__gte=m.desde).order_by('-fecha_entrada')[:100],
+                     "atencion_fecha_entrada_idx (fecha_entrada)"),
+    ConsultaCaliente('altas_del_periodo', lambda m: AtencionMedica.objects
+                     .filter(fecha_salida__gte=m.desde).values_list('fecha_entrada', 'fecha_salida'),
+                     "atencion_fecha_salida_idx (fecha_salida)"),
+    ConsultaCaliente('buscar_paciente_por_rut', lambda m: Paciente.objects.por_rut('12345678-5'),
+                     "índice único de rut_numero"),
+]
+
+
+class Analisis:
+    def __init__(self, consulta, plan, recorridos, ordenamiento_temporal):
+        self.consulta = consulta
+        self.plan = plan
+        self.recorridos = recorridos  # tablas grandes recorridas completas
+        self.ordenamiento_temporal = ordenamiento_temporal
+
+    @property
+    def problemas(self):
+        problemas = [f"recorrido secuencial de {tabla}" for tabla in sorted(self.recorridos)]
+        if self.ordenamiento_temporal:
+            problemas.append("ordenamiento en tabla temporal")
+        return problemas
+
+
+def _plan_sqlite(queryset):
+    plan = queryset.explain()
+    recorridos, ordenamiento = set(), False
+    for linea in plan.splitlines():
+        coincidencia = _SCAN_SQLITE.search(linea)
+        if coincidencia and 'USING' not in coincidencia.group(2):
+            recorridos.add(coincidencia.group(1))
+        if 'USE TEMP B-TREE FOR ORDER BY' in linea:
+            ordenamiento = True
+    return plan, recorridos, ordenamiento
+
+
+def _plan_postgresql(queryset):
+    crudo = queryset.explain(format='json')
+    arbol = json.loads(crudo) if isinstance(crudo, str) else crudo
+    recorridos, ordenamiento = set(), False
+    pendientes = [(arbol[0]['Plan'], None)]
+    while pendientes:
+        nodo, padre = pendientes.pop()
+        if nodo['Node Type'] == 'Seq Scan':
+            recorridos.add(nodo['Relation Name'])
+        # Sin ANALYZE no hay 'Sort Method': se juzga por la forma del plan. Un Sort
+        # directamente bajo un Limit es top-N y guarda solo N filas; los demás
+        # ordenan el resultado completo porque ningún índice entrega ese orden
+        if nodo['Node Type'] == 'Sort' and (padre is None or padre['Node Type'] != 'Limit'):
+            ordenamiento = True
+        pendientes.extend((hijo, nodo) for hijo in nodo.get('Plans', []))
+    return json.dumps(arbol, indent=2), recorridos, ordenamiento
+
+
+def analizar(consulta, muestra):
+    """Lanza MotorNoSoportado si la base no es una de MOTORES."""
+    queryset = consulta.construir(muestra)
+    if connection.vendor == 'postgresql':
+        plan, recorridos, ordenamiento = _plan_postgresql(queryset)
+    elif connection.vendor == 'sqlite':
+        plan, recorridos, ordenamiento = _plan_sqlite(queryset)
+    else:
+        raise MotorNoSoportado(f"EXPLAIN no soportado para {connection.vendor} (solo {', '.join(MOTORES)}).")
+    recorridos = (recorridos & TABLAS_GRANDES) - consulta.permitidos
+    return Analisis(consulta, plan, recorridos, ordenamiento)
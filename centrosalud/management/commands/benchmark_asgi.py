@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from centrosalud import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el throughput de las vistas síncronas (handler WSGI) con sus versiones async (handler ASGI) "
+        "bajo clientes concurrentes, contra un dataset de generar_dataset."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefijo', default='gen', help="Prefijo del dataset generado")
+        parser.add_argument('--clientes', type=int, default=8, help="Clientes concurrentes")
+        parser.add_argument('--peticiones', type=int, default=200, help="Requests por ruta y modo")
+
+    def handle(self, *args, **options):
+        if options['clientes'] < 1 or options['peticiones'] < options['clientes']:
+            raise CommandError("Se necesita al menos un cliente y una petición por cliente.")
+        try:
+            escenario = benchmarks.Escenario(options['prefijo'])
+        except Exception as error:
+            raise CommandError(f"No se pudo preparar el escenario ({error}). Ejecute generar_dataset primero.")
+        rutas = {ruta.nombre: ruta for ruta in benchmarks.RUTAS if ruta.metodo == 'get'}
+
+        self.stdout.write(f"{options['clientes']} clientes, {options['peticiones']} requests por ruta")
+        self.stdout.write(f"{'ruta':<28}{'modo':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errores':>9}")
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for sincrona, asincrona in benchmarks.PARES_ASYNC:
+                    for modo, nombre, cargar in (('wsgi', sincrona, benchmarks.carga_wsgi),
+                                                 ('asgi', asincrona, benchmarks.carga_asgi)):
+                        ruta = rutas[nombre]
+                        usuario = getattr(escenario, ruta.usuario)
+                        url = ruta.url(escenario)
+                        # Calentamiento: plantillas compiladas y perfil en caché
+                        cliente = Client()
+                        cliente.force_login(usuario)
+                        cliente.get(url)
+                        carga = cargar(url, usuario, options['clientes'], options['peticiones'])
+                        fila = (f"{sincrona:<28}{modo:>6}{carga.por_segundo:>10.1f}{carga.p50:>10.1f}"
+                                f"{carga.p95:>10.1f}{carga.errores:>9}")
+                        self.stdout.write(self.style.ERROR(fila) if carga.errores else fila)
+        finally:
+            escenario.token.delete()
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from centrosalud import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide latencia (p50/p95) y consultas SQL de cada ruta con nombre contra un dataset de "
+        "generar_dataset. Falla si alguna ruta supera su presupuesto de consultas o su umbral de latencia."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefijo', default='gen', help="Prefijo del dataset generado")
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--calentamiento', type=int, default=2)
+        parser.add_argument('--factor-latencia', type=float, default=1.0,
+                            help="Multiplica los umbrales de latencia (p. ej. 3 en máquinas lentas)")
+        parser.add_argument('--ruta', action='append', help="Medir solo estas rutas (se puede repetir)")
+
+    def handle(self, *args, **options):
+        rutas = [r for r in benchmarks.RUTAS if not options['ruta'] or r.nombre in options['ruta']]
+        if not rutas:
+            raise CommandError("Ninguna ruta coincide con --ruta.")
+        try:
+            escenario = benchmarks.Escenario(options['prefijo'])
+        except Exception as error:
+            raise CommandError(f"No se pudo preparar el escenario ({error}). Ejecute generar_dataset primero.")
+
+        fallidas = 0
+        self.stdout.write(f"{'ruta':<32}{'status':>7}{'consultas':>14}{'p50 ms':>10}{'p95 ms':>10}")
+        clientes = {}
+        try:
+            # El Client usa el host 'testserver'
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for ruta in rutas:
+                    medicion = benchmarks.medir(ruta, escenario, options['repeticiones'],
+                                                options['calentamiento'], clientes)
+                    fallas = medicion.fallas(options['factor_latencia'])
+                    fila = (f"{ruta.nombre + (' POST' if ruta.metodo == 'post' else ''):<32}{medicion.status:>7}"
+                            f"{f'{medicion.consultas}/{ruta.consultas}':>14}{medicion.p50:>10.1f}{medicion.p95:>10.1f}")
+                    if fallas:
+                        fallidas += 1
+                        self.stdout.write(self.style.ERROR(f"{fila}  {'; '.join(fallas)}"))
+                    else:
+                        self.stdout.write(fila)
+        finally:
+            escenario.token.delete()
+
+        if fallidas:
+            raise CommandError(f"{fallidas} de {len(rutas)} rutas superan su presupuesto.")
+        self.stdout.write(self.style.SUCCESS(f"{len(rutas)} rutas dentro del presupuesto."))
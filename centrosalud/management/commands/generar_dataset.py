@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from centrosalud import censo, ocupacion
+from centrosalud.generador import GeneradorDataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un dataset sintético reproducible (misma semilla, mismos datos) para benchmarks. "
+        "Ej: generar_dataset --pacientes 1000000 --atenciones 5000000 --medicos 800 --centros 20"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--centros', type=int, default=3)
+        parser.add_argument('--areas-por-centro', type=int, default=8)
+        parser.add_argument('--medicos', type=int, default=50)
+        parser.add_argument('--pacientes', type=int, default=1000)
+        parser.add_argument('--atenciones', type=int, default=3000,
+                            help="Total aproximado; se reparte entre pacientes con una distribución sesgada")
+        parser.add_argument('--examenes-por-atencion', type=float, default=0.5)
+        parser.add_argument('--dias', type=int, default=365, help="Ventana de fechas de entrada hacia atrás")
+        parser.add_argument('--lote', type=int, default=5000, help="Pacientes por lote de inserción")
+        parser.add_argument('--prefijo', default='gen', help="Prefijo de usuarios y centros generados")
+        parser.add_argument('--limpiar', action='store_true', help="Borra un dataset previo con el mismo prefijo")
+        parser.add_argument('--sin-indice', action='store_true',
+                            help="No indexar los registros generados para la búsqueda clínica")
+
+    def handle(self, *args, **options):
+        if options['centros'] < 1 or options['medicos'] < 1:
+            raise CommandError("Se necesita al menos un centro y un médico.")
+        generador = GeneradorDataset(
+            semilla=options['semilla'], centros=options['centros'], areas_por_centro=options['areas_por_centro'],
+            medicos=options['medicos'], pacientes=options['pacientes'], atenciones=options['atenciones'],
+            examenes_por_atencion=options['examenes_por_atencion'], dias=options['dias'],
+            tamano_lote=options['lote'], prefijo=options['prefijo'], indexar=not options['sin_indice'],
+            salida=self.stdout.write,
+        )
+        if generador.existe():
+            if not options['limpiar']:
+                raise CommandError(f"Ya existe un dataset con prefijo '{options['prefijo']}'. Use --limpiar.")
+            self.stdout.write("Borrando dataset anterior...")
+            # Ocupación y censo se recalculan una sola vez, después de generar
+            generador.limpiar(recalcular=False)
+
+        inicio = time.monotonic()
+        totales = generador.generar()
+        self.stdout.write("Recalculando resumen de ocupación...")
+        ocupacion.recalcular()
+        censo.recalcular()
+
+        resumen = ", ".join(f"{valor} {nombre}" for nombre, valor in totales.items())
+        self.stdout.write(self.style.SUCCESS(f"Dataset generado en {time.monotonic() - inicio:.1f}s: {resumen}"))
@@ -0,0 +1,70 @@
+import csv
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+
+from centrosalud import censo, ocupacion
+from centrosalud.importacion import ImportadorPacientes, abrir_texto, leer_filas
+from centrosalud.models.models import CentroSalud
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa pacientes con su ficha médica y atención inicial desde CSV o JSONL, "
+        "en lotes con bulk_create (o COPY en PostgreSQL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del archivo, o '-' para leer desde stdin")
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help="Por defecto se deduce de la extensión")
+        parser.add_argument('--centro', type=int,
+                            help="Id del CentroSalud donde se buscan las áreas (sin él, un nombre de área "
+                                 "repetido entre centros se rechaza)")
+        parser.add_argument('--lote', type=int, default=1000, help="Filas por lote")
+        parser.add_argument('--copy', action='store_true', help="Usar COPY en PostgreSQL")
+        parser.add_argument('--rechazados', help="Archivo CSV donde escribir las filas rechazadas")
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or ('jsonl' if options['archivo'].endswith(('.jsonl', '.ndjson')) else 'csv')
+        centro = None
+        if options['centro']:
+            centro = CentroSalud.objects.filter(pk=options['centro']).first()
+            if centro is None:
+                raise CommandError(f"No existe el centro de salud {options['centro']}")
+
+        with ExitStack() as pila:
+            al_rechazar = None
+            if options['rechazados']:
+                # El reporte se escribe a medida que se rechaza: no se guardan todos en memoria
+                salida = pila.enter_context(open(options['rechazados'], 'w', encoding='utf-8', newline=''))
+                escritor = csv.writer(salida)
+                escritor.writerow(['linea', 'motivo'])
+                al_rechazar = lambda linea, motivo: escritor.writerow([linea, motivo])
+            importador = ImportadorPacientes(centro, options['lote'], options['copy'], al_rechazar)
+            inicio = time.monotonic()
+            archivo = pila.enter_context(abrir_texto(options['archivo']))
+            filas = leer_filas(archivo, formato)
+            importador.importar(self._con_progreso(filas, importador, options['lote'], inicio))
+        ocupacion.recalcular()
+        censo.recalcular()
+        duracion = time.monotonic() - inicio
+
+        for linea, motivo in importador.rechazados:
+            self.stderr.write(f"  línea {linea}: {motivo}")
+        if importador.total_rechazados > len(importador.rechazados):
+            self.stderr.write(f"  ... y {importador.total_rechazados - len(importador.rechazados)} rechazos más")
+
+        velocidad = importador.leidos / duracion if duracion else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Importados {importador.importados} de {importador.leidos} filas "
+            f"({importador.total_rechazados} rechazadas) en {duracion:.1f}s — {velocidad:,.0f} filas/s"
+        ))
+
+    def _con_progreso(self, filas, importador, cada, inicio):
+        for numero, fila in enumerate(filas, start=1):
+            yield fila
+            if numero % (cada * 10) == 0:
+                transcurrido = time.monotonic() - inicio
+                self.stdout.write(f"  {numero} filas leídas, {importador.importados} importadas "
+                                  f"({numero / transcurrido:,.0f} filas/s)")
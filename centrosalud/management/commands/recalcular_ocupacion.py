@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from centrosalud import ocupacion
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el resumen de ocupación del dashboard del director desde cero."
+
+    def handle(self, *args, **options):
+        total = ocupacion.recalcular()
+        self.stdout.write(self.style.SUCCESS(f"Resumen de ocupación recalculado: {total} filas."))
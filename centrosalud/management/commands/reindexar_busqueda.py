@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from centrosalud import busqueda
+
+
+class Command(BaseCommand):
+    help = "Regenera los documentos del índice de búsqueda clínica desde fichas y atenciones."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=2000, help="Filas por bulk_create")
+
+    def handle(self, *args, **options):
+        total = busqueda.reindexar(tamano_lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f"Índice de búsqueda regenerado: {total} documentos."))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from centrosalud import indices
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta EXPLAIN sobre las consultas más frecuentes (vistas, admin y reportes) y reporta "
+        "recorridos secuenciales de tablas grandes u ordenamientos temporales, con el índice sugerido."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consulta', action='append', help="Analizar solo estas consultas (se puede repetir)")
+        parser.add_argument('--plan', action='store_true', help="Mostrar el plan completo de cada consulta")
+        parser.add_argument('--estricto', action='store_true', help="Fallar si alguna consulta tiene problemas")
+
+    def handle(self, *args, **options):
+        consultas = [c for c in indices.CONSULTAS if not options['consulta'] or c.nombre in options['consulta']]
+        if not consultas:
+            raise CommandError("Ninguna consulta coincide con --consulta.")
+        try:
+            muestra = indices.Muestra()
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        con_problemas = 0
+        for consulta in consultas:
+            try:
+                analisis = indices.analizar(consulta, muestra)
+            except indices.MotorNoSoportado as error:
+                raise CommandError(str(error))
+            if analisis.problemas:
+                con_problemas += 1
+                self.stdout.write(self.style.WARNING(f"{consulta.nombre}: {', '.join(analisis.problemas)}"))
+                self.stdout.write(f"    índice sugerido: {consulta.indice}")
+            else:
+                self.stdout.write(f"{consulta.nombre}: ok ({consulta.indice})")
+            if options['plan']:
+                self.stdout.write(analisis.plan)
+
+        if con_problemas and options['estricto']:
+            raise CommandError(f"{con_problemas} de {len(consultas)} consultas necesitan un índice.")
+        self.stdout.write(self.style.SUCCESS(f"{len(consultas) - con_problemas} de {len(consultas)} consultas usan índices."))
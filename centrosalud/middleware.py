@@ -0,0 +1,112 @@
+"""
+Instrumentación SQL por request.
+
+Envuelve la ejecución de consultas de todas las conexiones con
+``connection.execute_wrapper`` y, por cada request muestreado, cuenta
+consultas, tiempo en base de datos y consultas repetidas (misma huella SQL:
+el patrón N+1). El resultado sale en el header ``Server-Timing`` y en una
+línea de log JSON del logger ``centrosalud.sql``.
+
+Se activa con el setting INSTRUMENTACION_SQL (ver DEFAULTS).
+"""
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('centrosalud.sql')
+
+DEFAULTS = {
+    'ACTIVA': False,
+    'MUESTREO': 1.0,           # fracción de requests instrumentados (0 a 1)
+    'UMBRAL_REPETIDAS': 5,     # desde cuántas repeticiones de una huella se loguea como WARNING
+    'SERVER_TIMING': True,
+}
+
+_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+
+
+def configuracion():
+    return {**DEFAULTS, **getattr(settings, 'INSTRUMENTACION_SQL', {})}
+
+
+def huella(sql):
+    """SQL sin literales y con las listas IN colapsadas: identifica la 'forma' de la consulta."""
+    sql = _LISTAS.sub('(...)', _LITERALES.sub('%s', sql))
+    return _ESPACIOS.sub(' ', sql).strip()
+
+
+class RegistroSQL:
+    """Se pasa a execute_wrapper; acumula lo ejecutado durante un request."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.duracion = 0.0
+        self.huellas = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duracion += time.perf_counter() - inicio
+            self.consultas += 1
+            self.huellas[huella(sql)] += 1
+
+    @property
+    def repetidas(self):
+        """Huellas ejecutadas más de una vez, de la más a la menos repetida."""
+        return [(sql, veces) for sql, veces in self.huellas.most_common() if veces > 1]
+
+
+class InstrumentacionSQLMiddleware:
+    def __init__(self, get_response):
+        config = configuracion()
+        if not config['ACTIVA']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.muestreo = config['MUESTREO']
+        self.umbral_repetidas = config['UMBRAL_REPETIDAS']
+        self.server_timing = config['SERVER_TIMING']
+
+    def __call__(self, request):
+        if self.muestreo < 1 and random.random() >= self.muestreo:
+            return self.get_response(request)
+
+        registro = RegistroSQL()
+        inicio = time.perf_counter()
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(registro))
+            response = self.get_response(request)
+        total = time.perf_counter() - inicio
+
+        repetidas = registro.repetidas
+        if self.server_timing:
+            response.headers['Server-Timing'] = (
+                f'db;dur={registro.duracion * 1000:.1f};desc="{registro.consultas} consultas, '
+                f'{len(repetidas)} repetidas", app;dur={total * 1000:.1f}'
+            )
+
+        peor = repetidas[0] if repetidas else None
+        nivel = logging.WARNING if peor and peor[1] >= self.umbral_repetidas else logging.INFO
+        logger.log(nivel, json.dumps({
+            'metodo': request.method,
+            'ruta': request.resolver_match.view_name if request.resolver_match else request.path,
+            'status': response.status_code,
+            'consultas': registro.consultas,
+            'db_ms': round(registro.duracion * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+            'huellas_repetidas': len(repetidas),
+            'peor_repetida': {'sql': peor[0][:300], 'veces': peor[1]} if peor else None,
+        }, ensure_ascii=False))
+        return response
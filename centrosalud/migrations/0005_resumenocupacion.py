@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def poblar_resumen(apps, schema_editor):
+    AtencionMedica = apps.get_model('centrosalud', 'AtencionMedica')
+    FichaMedica = apps.get_model('centrosalud', 'FichaMedica')
+    ResumenOcupacion = apps.get_model('centrosalud', 'ResumenOcupacion')
+    abiertas = AtencionMedica.objects.filter(fecha_salida__isnull=True)
+    filas = []
+    for fila in abiertas.filter(area__isnull=False).values('area_id', 'area__centro_salud_id').annotate(total=Count('id')):
+        centro_id = fila['area__centro_salud_id']
+        filas.append(ResumenOcupacion(
+            clave=f"AREA:{centro_id or ''}:{fila['area_id']}", dimension='AREA',
+            centro_salud_id=centro_id, area_id=fila['area_id'], activos=fila['total'],
+        ))
+    for fila in abiertas.values('medico_responsable_id', 'area__centro_salud_id').annotate(total=Count('id')):
+        centro_id = fila['area__centro_salud_id']
+        filas.append(ResumenOcupacion(
+            clave=f"MEDICO:{centro_id or ''}:{fila['medico_responsable_id']}", dimension='MEDICO',
+            centro_salud_id=centro_id, medico_id=fila['medico_responsable_id'], activos=fila['total'],
+        ))
+    for fila in FichaMedica.objects.values('estado').annotate(total=Count('id')):
+        filas.append(ResumenOcupacion(
+            clave=f"ESTADO::{fila['estado']}", dimension='ESTADO',
+            estado=fila['estado'], activos=fila['total'],
+        ))
+    ResumenOcupacion.objects.bulk_create(filas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('centrosalud', '0004_areacategory_area_categoria'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenOcupacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=60, unique=True)),
+                ('dimension', models.CharField(choices=[('AREA', 'Área'), ('MEDICO', 'Médico'), ('ESTADO', 'Estado')], max_length=10)),
+                ('estado', models.CharField(blank=True, choices=[('EN_ALTA', 'En Alta'), ('EN_TRATAMIENTO', 'En Tratamiento'), ('PRE_OPERATORIO', 'Pre Operatorio'), ('POST_OPERATORIO', 'Post Operatorio')], max_length=20, null=True)),
+                ('activos', models.IntegerField(default=0)),
+                ('area', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='centrosalud.area')),
+                ('centro_salud', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='centrosalud.centrosalud')),
+                ('medico', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(poblar_resumen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:13
+
+import logging
+
+from django.db import migrations, models
+
+from centrosalud.rut import cuerpo_valido
+
+logger = logging.getLogger('centrosalud.migraciones')
+
+
+def poblar_rut_numero(apps, schema_editor):
+    Paciente = apps.get_model('centrosalud', 'Paciente')
+    vistos = set()
+    sin_numero = []
+    lote = []
+    for paciente in Paciente.objects.only('id', 'rut').order_by('id').iterator(chunk_size=2000):
+        numero = cuerpo_valido(paciente.rut)
+        if numero is None or numero in vistos:
+            # RUT ilegible, con dígito verificador inválido o duplicado en otro formato:
+            # se deja sin índice para revisión manual
+            sin_numero.append(paciente.id)
+            continue
+        vistos.add(numero)
+        paciente.rut_numero = numero
+        lote.append(paciente)
+        if len(lote) >= 2000:
+            Paciente.objects.bulk_update(lote, ['rut_numero'])
+            lote = []
+    Paciente.objects.bulk_update(lote, ['rut_numero'])
+    if sin_numero:
+        logger.warning("%d pacientes quedan sin rut_numero (RUT inválido o duplicado), ids: %s",
+                       len(sin_numero), ', '.join(map(str, sin_numero)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('centrosalud', '0005_resumenocupacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paciente',
+            name='rut_numero',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.RunPython(poblar_rut_numero, migrations.RunPython.noop),
+    ]
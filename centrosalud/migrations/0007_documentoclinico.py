@@ -0,0 +1,102 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CAMPOS_FICHA = ('antecedentes_personales', 'antecedentes_familiares', 'alergias',
+                'enfermedades_cronicas', 'medicamentos_actuales')
+CAMPOS_ATENCION = ('motivo_consulta', 'diagnostico', 'tratamiento')
+TAMANO_LOTE = 2000
+
+SQL_POSTGRES = [
+    "ALTER TABLE centrosalud_documentoclinico ADD COLUMN vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('spanish', contenido)) STORED",
+    "CREATE INDEX documentoclinico_vector_gin ON centrosalud_documentoclinico USING GIN (vector)",
+]
+SQL_POSTGRES_REVERSO = [
+    "DROP INDEX IF EXISTS documentoclinico_vector_gin",
+    "ALTER TABLE centrosalud_documentoclinico DROP COLUMN IF EXISTS vector",
+]
+
+SQL_SQLITE = [
+    "CREATE VIRTUAL TABLE centrosalud_documentoclinico_fts USING fts5("
+    "contenido, content='centrosalud_documentoclinico', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER documentoclinico_fts_ai AFTER INSERT ON centrosalud_documentoclinico BEGIN "
+    "INSERT INTO centrosalud_documentoclinico_fts(rowid, contenido) VALUES (new.id, new.contenido); END",
+    "CREATE TRIGGER documentoclinico_fts_ad AFTER DELETE ON centrosalud_documentoclinico BEGIN "
+    "INSERT INTO centrosalud_documentoclinico_fts(centrosalud_documentoclinico_fts, rowid, contenido) "
+    "VALUES ('delete', old.id, old.contenido); END",
+    "CREATE TRIGGER documentoclinico_fts_au AFTER UPDATE ON centrosalud_documentoclinico BEGIN "
+    "INSERT INTO centrosalud_documentoclinico_fts(centrosalud_documentoclinico_fts, rowid, contenido) "
+    "VALUES ('delete', old.id, old.contenido); "
+    "INSERT INTO centrosalud_documentoclinico_fts(rowid, contenido) VALUES (new.id, new.contenido); END",
+]
+SQL_SQLITE_REVERSO = [
+    "DROP TRIGGER IF EXISTS documentoclinico_fts_ai",
+    "DROP TRIGGER IF EXISTS documentoclinico_fts_ad",
+    "DROP TRIGGER IF EXISTS documentoclinico_fts_au",
+    "DROP TABLE IF EXISTS centrosalud_documentoclinico_fts",
+]
+
+
+def _ejecutar(schema_editor, por_motor):
+    for sql in por_motor.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def crear_indice_fulltext(apps, schema_editor):
+    _ejecutar(schema_editor, {'postgresql': SQL_POSTGRES, 'sqlite': SQL_SQLITE})
+
+
+def borrar_indice_fulltext(apps, schema_editor):
+    _ejecutar(schema_editor, {'postgresql': SQL_POSTGRES_REVERSO, 'sqlite': SQL_SQLITE_REVERSO})
+
+
+def poblar_documentos(apps, schema_editor):
+    FichaMedica = apps.get_model('centrosalud', 'FichaMedica')
+    AtencionMedica = apps.get_model('centrosalud', 'AtencionMedica')
+    DocumentoClinico = apps.get_model('centrosalud', 'DocumentoClinico')
+
+    def texto(objeto, campos):
+        return '\n'.join(valor for valor in (getattr(objeto, campo) for campo in campos) if valor)
+
+    # Igual que busqueda.reindexar: se vacía el lote cada TAMANO_LOTE filas
+    filas = [
+        (FichaMedica.objects.only('id', *CAMPOS_FICHA), CAMPOS_FICHA, lambda f: {'ficha_medica_id': f.id}),
+        (AtencionMedica.objects.only('id', 'ficha_medica_id', *CAMPOS_ATENCION), CAMPOS_ATENCION,
+         lambda a: {'ficha_medica_id': a.ficha_medica_id, 'atencion_id': a.id}),
+    ]
+    lote = []
+    for queryset, campos, claves in filas:
+        for objeto in queryset.iterator(chunk_size=TAMANO_LOTE):
+            lote.append(DocumentoClinico(contenido=texto(objeto, campos), **claves(objeto)))
+            if len(lote) >= TAMANO_LOTE:
+                DocumentoClinico.objects.bulk_create(lote)
+                lote = []
+    DocumentoClinico.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('centrosalud', '0006_paciente_rut_numero'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoClinico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contenido', models.TextField()),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('atencion', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='documento', to='centrosalud.atencionmedica')),
+                ('ficha_medica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='documentos', to='centrosalud.fichamedica')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('atencion__isnull', True)), fields=('ficha_medica',), name='documento_ficha_unico')],
+            },
+        ),
+        migrations.RunPython(crear_indice_fulltext, borrar_indice_fulltext),
+        migrations.RunPython(poblar_documentos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('centrosalud', '0007_documentoclinico'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='atencionmedica',
+            index=models.Index(condition=models.Q(('fecha_salida__isnull', True)), fields=['medico_responsable', '-fecha_entrada', '-id'], name='atencion_activa_medico_idx'),
+        ),
+    ]
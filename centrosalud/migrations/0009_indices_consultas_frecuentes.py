@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('centrosalud', '0008_atencion_activa_medico_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='atencionmedica',
+            index=models.Index(fields=['ficha_medica', '-fecha_entrada', '-id'], name='atencion_ficha_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='atencionmedica',
+            index=models.Index(condition=models.Q(('fecha_salida__isnull', True)), fields=['-fecha_entrada'], name='atencion_abierta_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='atencionmedica',
+            index=models.Index(fields=['fecha_entrada'], name='atencion_fecha_entrada_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='atencionmedica',
+            index=models.Index(condition=models.Q(('fecha_salida__isnull', False)), fields=['fecha_salida'], name='atencion_fecha_salida_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fichamedica',
+            index=models.Index(fields=['estado'], name='ficha_estado_idx'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.utils import timezone
+
+
+def poblar_censo(apps, schema_editor):
+    # Punto de partida del censo: la situación actual de cada ficha queda como el día de hoy
+    Area = apps.get_model('centrosalud', 'Area')
+    AtencionMedica = apps.get_model('centrosalud', 'AtencionMedica')
+    CensoDiario = apps.get_model('centrosalud', 'CensoDiario')
+    FichaMedica = apps.get_model('centrosalud', 'FichaMedica')
+    abierta = (AtencionMedica.objects.filter(ficha_medica=OuterRef('pk'), fecha_salida__isnull=True)
+               .order_by('-fecha_entrada', '-pk'))
+    centros = dict(Area.objects.values_list('pk', 'centro_salud_id'))
+    hoy = timezone.localdate()
+    filas = []
+    for fila in (FichaMedica.objects.annotate(censo_area=Subquery(abierta.values('area_id')[:1]))
+                 .values('censo_area', 'estado').annotate(total=Count('pk'))):
+        area_id = fila['censo_area']
+        centro_id = centros.get(area_id)
+        filas.append(CensoDiario(
+            fecha=hoy, clave=f"{centro_id or ''}:{area_id or ''}:{fila['estado']}",
+            centro_salud_id=centro_id, area_id=area_id, estado=fila['estado'], pacientes=fila['total'],
+        ))
+    CensoDiario.objects.bulk_create(filas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('centrosalud', '0009_indices_consultas_frecuentes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CensoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('clave', models.CharField(max_length=60)),
+                ('estado', models.CharField(choices=[('EN_ALTA', 'En Alta'), ('EN_TRATAMIENTO', 'En Tratamiento'), ('PRE_OPERATORIO', 'Pre Operatorio'), ('POST_OPERATORIO', 'Post Operatorio')], max_length=20)),
+                ('pacientes', models.IntegerField(default=0)),
+                ('area', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='centrosalud.area')),
+                ('centro_salud', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='centrosalud.centrosalud')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha'], name='censo_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('clave', 'fecha'), name='censo_clave_fecha_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TransicionEstado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado_anterior', models.CharField(blank=True, choices=[('EN_ALTA', 'En Alta'), ('EN_TRATAMIENTO', 'En Tratamiento'), ('PRE_OPERATORIO', 'Pre Operatorio'), ('POST_OPERATORIO', 'Post Operatorio')], max_length=20, null=True)),
+                ('estado_nuevo', models.CharField(choices=[('EN_ALTA', 'En Alta'), ('EN_TRATAMIENTO', 'En Tratamiento'), ('PRE_OPERATORIO', 'Pre Operatorio'), ('POST_OPERATORIO', 'Post Operatorio')], max_length=20)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('area', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='centrosalud.area')),
+                ('centro_salud', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='centrosalud.centrosalud')),
+                ('ficha_medica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transiciones', to='centrosalud.fichamedica')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ficha_medica', 'fecha'], name='transicion_ficha_fecha_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_censo, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+
+
+def estados_por_centro(apps, schema_editor):
+    """Las filas ESTADO pasan a contar solo fichas con una atención abierta, por centro."""
+    AtencionMedica = apps.get_model('centrosalud', 'AtencionMedica')
+    FichaMedica = apps.get_model('centrosalud', 'FichaMedica')
+    ResumenOcupacion = apps.get_model('centrosalud', 'ResumenOcupacion')
+    ResumenOcupacion.objects.filter(dimension='ESTADO').delete()
+    ultima_abierta = (AtencionMedica.objects.filter(ficha_medica=OuterRef('pk'), fecha_salida__isnull=True)
+                      .order_by('-fecha_entrada', '-pk').values('area__centro_salud_id')[:1])
+    filas = [
+        ResumenOcupacion(clave=f"ESTADO:{fila['centro_actual']}:{fila['estado']}", dimension='ESTADO',
+                         centro_salud_id=fila['centro_actual'], estado=fila['estado'], activos=fila['total'])
+        for fila in (FichaMedica.objects.annotate(centro_actual=Subquery(ultima_abierta))
+                     .filter(centro_actual__isnull=False).values('centro_actual', 'estado')
+                     .annotate(total=Count('id')))
+    ]
+    ResumenOcupacion.objects.bulk_create(filas, batch_size=1000)
+
+
+def estados_globales(apps, schema_editor):
+    FichaMedica = apps.get_model('centrosalud', 'FichaMedica')
+    ResumenOcupacion = apps.get_model('centrosalud', 'ResumenOcupacion')
+    ResumenOcupacion.objects.filter(dimension='ESTADO').delete()
+    ResumenOcupacion.objects.bulk_create([
+        ResumenOcupacion(clave=f"ESTADO::{fila['estado']}", dimension='ESTADO', estado=fila['estado'],
+                         activos=fila['total'])
+        for fila in FichaMedica.objects.values('estado').annotate(total=Count('id'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('centrosalud', '0011_atencionmedica_clave_idempotencia'),
+    ]
+
+    operations = [
+        migrations.RunPython(estados_por_centro, estados_globales),
+    ]
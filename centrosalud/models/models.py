@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
+from centrosalud.rut import cuerpo_valido
 
 # centro de salud (Hospital, Cefam, etc)
 class CentroSalud(models.Model):
@@ -31,15 +32,32 @@ class Area(models.Model):
     def __str__(self):
         return self.nombre
 
+class PacienteQuerySet(models.QuerySet):
+    def por_rut(self, valor):
+        # Búsqueda por el cuerpo numérico del RUT (índice único), sin importar el formato
+        numero = cuerpo_valido(valor)
+        return self.filter(rut_numero=numero) if numero is not None else self.none()
+
 class Paciente(models.Model):
     nombre = models.CharField(max_length=100)
     apellido1 = models.CharField(max_length=100)
     apellido2 = models.CharField(max_length=100, null=True, blank=True)
     rut = models.CharField(max_length=12, unique=True)
+    rut_numero = models.PositiveIntegerField(unique=True, null=True, blank=True, editable=False)  # 12345678 para "12.345.678-5"
     fecha_nacimiento = models.DateField()
     telefono = models.CharField(max_length=20)
     direccion = models.TextField()
 
+    objects = PacienteQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        # Un RUT con dígito verificador inválido queda sin rut_numero: no aparece en por_rut
+        self.rut_numero = cuerpo_valido(self.rut)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'rut' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'rut_numero'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.nombre} {self.apellido1}"
 
@@ -60,6 +78,11 @@ class FichaMedica(models.Model):
     ]
     estado = models.CharField(max_length=20, choices=ESTADOS_PACIENTE, default='EN_TRATAMIENTO')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado'], name='ficha_estado_idx'),
+        ]
+
     def __str__(self):
         return f"Ficha Médica de {self.paciente.nombre} {self.paciente.apellido1} - Estado: {self.estado}"
 
@@ -70,6 +93,13 @@ class TratamientoMedico(models.Model):
     def __str__(self):
         return self.nombre
 
+class AtencionMedicaQuerySet(models.QuerySet):
+    def activas_de(self, medico):
+        # Atenciones abiertas del médico con paciente, estado y área en el mismo JOIN
+        # (usa el índice parcial atencion_activa_medico_idx)
+        return (self.filter(medico_responsable=medico, fecha_salida__isnull=True)
+                .select_related('ficha_medica__paciente', 'area'))
+
 class AtencionMedica(models.Model):
     ficha_medica = models.ForeignKey(FichaMedica, on_delete=models.CASCADE, related_name="atenciones")
     medico_responsable = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -80,6 +110,27 @@ class AtencionMedica(models.Model):
     motivo_consulta = models.TextField(null=True, blank=True)
     diagnostico = models.TextField(null=True, blank=True)
     tratamiento = models.TextField(null=True, blank=True)  # Texto libre
+    # La envía el formulario de ingreso: un reenvío (doble clic, reintento) no crea otra atención
+    clave_idempotencia = models.CharField(max_length=64, null=True, blank=True, unique=True, editable=False)
+
+    objects = AtencionMedicaQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Lista de trabajo del médico: solo atenciones abiertas, las más recientes primero
+            models.Index(fields=['medico_responsable', '-fecha_entrada', '-id'], name='atencion_activa_medico_idx',
+                         condition=models.Q(fecha_salida__isnull=True)),
+            # Historial del paciente (línea de tiempo del detalle)
+            models.Index(fields=['ficha_medica', '-fecha_entrada', '-id'], name='atencion_ficha_fecha_idx'),
+            # Atenciones abiertas más recientes (dashboard del director)
+            models.Index(fields=['-fecha_entrada'], name='atencion_abierta_fecha_idx',
+                         condition=models.Q(fecha_salida__isnull=True)),
+            # Rangos de fechas: filtros del admin, reportes y exportaciones
+            models.Index(fields=['fecha_entrada'], name='atencion_fecha_entrada_idx'),
+            # Solo altas: si incluyera las abiertas competiría con los índices parciales de arriba
+            models.Index(fields=['fecha_salida'], name='atencion_fecha_salida_idx',
+                         condition=models.Q(fecha_salida__isnull=False)),
+        ]
 
     def __str__(self):
         return f"Atención Médica de {self.ficha_medica.paciente.nombre} por {self.medico_responsable.username}"
@@ -101,4 +152,87 @@ class AtencionExamen(models.Model):
     resultados = models.TextField(null=True, blank=True)
 
     def __str__(self):
-        return f"Atención Examen {self.examen_medico.nombre_examen} para {self.atencion_medica.ficha_medica.paciente.nombre}"
\ No newline at end of file
+        return f"Atención Examen {self.examen_medico.nombre_examen} para {self.atencion_medica.ficha_medica.paciente.nombre}"
+
+class ResumenOcupacion(models.Model):
+    # Conteos pre-agregados para el dashboard del director. Se mantienen de
+    # forma incremental desde centrosalud/signals.py (ver centrosalud/ocupacion.py)
+    DIMENSIONES = [
+        ('AREA', 'Área'),
+        ('MEDICO', 'Médico'),
+        ('ESTADO', 'Estado'),
+    ]
+    clave = models.CharField(max_length=60, unique=True)  # AREA:<centro>:<area>, MEDICO:<centro>:<medico>, ESTADO:<centro>:<estado>
+    dimension = models.CharField(max_length=10, choices=DIMENSIONES)
+    centro_salud = models.ForeignKey(CentroSalud, on_delete=models.CASCADE, null=True, blank=True)
+    area = models.ForeignKey(Area, on_delete=models.CASCADE, null=True, blank=True)
+    medico = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    estado = models.CharField(max_length=20, choices=FichaMedica.ESTADOS_PACIENTE, null=True, blank=True)
+    activos = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.clave}: {self.activos}"
+
+
+class TransicionEstado(models.Model):
+    # Registro de solo inserción de cada cambio de FichaMedica.estado (ver centrosalud/censo.py).
+    # Centro y área son los de la atención abierta del paciente al momento del cambio.
+    ficha_medica = models.ForeignKey(FichaMedica, on_delete=models.CASCADE, related_name="transiciones")
+    estado_anterior = models.CharField(max_length=20, choices=FichaMedica.ESTADOS_PACIENTE, null=True, blank=True)  # vacío: ficha nueva
+    estado_nuevo = models.CharField(max_length=20, choices=FichaMedica.ESTADOS_PACIENTE)
+    fecha = models.DateTimeField(default=timezone.now)
+    centro_salud = models.ForeignKey(CentroSalud, on_delete=models.SET_NULL, null=True, blank=True)
+    area = models.ForeignKey(Area, on_delete=models.SET_NULL, null=True, blank=True)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ficha_medica', 'fecha'], name='transicion_ficha_fecha_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Las transiciones de estado no se modifican.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Ficha {self.ficha_medica_id}: {self.estado_anterior} -> {self.estado_nuevo}"
+
+
+class CensoDiario(models.Model):
+    # Pacientes por estado al cierre de cada día, por centro y área. Solo hay fila
+    # los días en que el conteo cambió: los demás días valen lo de la fila anterior.
+    fecha = models.DateField()
+    clave = models.CharField(max_length=60)  # <centro>:<area>:<estado>
+    centro_salud = models.ForeignKey(CentroSalud, on_delete=models.CASCADE, null=True, blank=True)
+    area = models.ForeignKey(Area, on_delete=models.CASCADE, null=True, blank=True)
+    estado = models.CharField(max_length=20, choices=FichaMedica.ESTADOS_PACIENTE)
+    pacientes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['clave', 'fecha'], name='censo_clave_fecha_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha'], name='censo_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.clave}: {self.pacientes}"
+
+
+class DocumentoClinico(models.Model):
+    # Texto clínico indexado para la búsqueda full-text (ver centrosalud/busqueda.py).
+    # La migración agrega el índice propio del motor: tsvector + GIN en PostgreSQL, FTS5 en SQLite.
+    ficha_medica = models.ForeignKey(FichaMedica, on_delete=models.CASCADE, related_name="documentos")
+    atencion = models.OneToOneField(AtencionMedica, on_delete=models.CASCADE, null=True, blank=True, related_name="documento")  # vacío: documento de la ficha
+    contenido = models.TextField()
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ficha_medica'], condition=models.Q(atencion__isnull=True), name='documento_ficha_unico'),
+        ]
+
+    def __str__(self):
+        return f"Documento clínico {self.pk} de la ficha {self.ficha_medica_id}"
@@ -0,0 +1,109 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+
+from centrosalud.models.models import AtencionMedica, FichaMedica, ResumenOcupacion
+
+
+def _clave(dimension, centro_id=None, area_id=None, medico_id=None, estado=None):
+    objetivo = area_id or medico_id or estado
+    return f"{dimension}:{centro_id or ''}:{objetivo}"
+
+
+def _ajustar(delta, dimension, centro_id=None, area_id=None, medico_id=None, estado=None):
+    """Suma ``delta`` a la fila del resumen, creándola si todavía no existe."""
+    clave = _clave(dimension, centro_id, area_id, medico_id, estado)
+    filas = ResumenOcupacion.objects.filter(clave=clave)
+    if filas.update(activos=F('activos') + delta) or delta < 0:
+        # Un descuento sin fila significa que ya fue borrada (cascada o recálculo)
+        return
+    try:
+        with transaction.atomic():
+            ResumenOcupacion.objects.create(
+                clave=clave, dimension=dimension, centro_salud_id=centro_id,
+                area_id=area_id, medico_id=medico_id, estado=estado, activos=delta,
+            )
+    except IntegrityError:
+        # Otra transacción creó la fila entre el UPDATE y el INSERT
+        filas.update(activos=F('activos') + delta)
+
+
+def aportes_atencion(activa, area_id, centro_id, medico_id):
+    """Filas del resumen a las que suma una atención (vacío si está cerrada)."""
+    if not activa:
+        return []
+    aportes = [('MEDICO', centro_id, None, medico_id, None)]
+    if area_id:
+        aportes.append(('AREA', centro_id, area_id, None, None))
+    return aportes
+
+
+def aplicar_diferencia(anteriores, nuevos):
+    """Descuenta los aportes anteriores y suma los nuevos, omitiendo los que no cambian."""
+    for aporte in anteriores:
+        if aporte not in nuevos:
+            _ajustar(-1, *aporte)
+    for aporte in nuevos:
+        if aporte not in anteriores:
+            _ajustar(1, *aporte)
+
+
+def sumar(deltas):
+    """Aplica varios aportes de una vez: {(dimension, centro, area, medico, estado): delta}."""
+    for aporte, delta in deltas.items():
+        if delta:
+            _ajustar(delta, *aporte)
+
+
+def aportes_situacion(situacion):
+    """
+    Fila ESTADO a la que suma una ficha según su situación del censo (centro, área,
+    estado): solo cuenta si tiene una atención abierta, en el centro de esa atención.
+    """
+    if not situacion or situacion[0] is None:
+        return []
+    centro_id, _, estado = situacion
+    return [('ESTADO', centro_id, None, None, estado)]
+
+
+def mover_situacion(antes, despues):
+    """Acompaña a censo.mover: traslada la ficha entre filas ESTADO."""
+    aplicar_diferencia(aportes_situacion(antes), aportes_situacion(despues))
+
+
+@transaction.atomic
+def recalcular():
+    """Reconstruye el resumen completo con GROUP BY (para cargas con bulk_create)."""
+    ResumenOcupacion.objects.all().delete()
+    abiertas = AtencionMedica.objects.filter(fecha_salida__isnull=True)
+    filas = []
+
+    for fila in (abiertas.filter(area__isnull=False)
+                 .values('area_id', 'area__centro_salud_id').annotate(total=Count('id'))):
+        centro_id = fila['area__centro_salud_id']
+        filas.append(ResumenOcupacion(
+            clave=_clave('AREA', centro_id, area_id=fila['area_id']), dimension='AREA',
+            centro_salud_id=centro_id, area_id=fila['area_id'], activos=fila['total'],
+        ))
+
+    for fila in (abiertas.values('medico_responsable_id', 'area__centro_salud_id')
+                 .annotate(total=Count('id'))):
+        centro_id = fila['area__centro_salud_id']
+        medico_id = fila['medico_responsable_id']
+        filas.append(ResumenOcupacion(
+            clave=_clave('MEDICO', centro_id, medico_id=medico_id), dimension='MEDICO',
+            centro_salud_id=centro_id, medico_id=medico_id, activos=fila['total'],
+        ))
+
+    # Como censo.situacion: el centro de la atención abierta más reciente de la ficha
+    ultima_abierta = (abiertas.filter(ficha_medica=OuterRef('pk')).order_by('-fecha_entrada', '-pk')
+                      .values('area__centro_salud_id')[:1])
+    for fila in (FichaMedica.objects.annotate(centro_actual=Subquery(ultima_abierta))
+                 .filter(centro_actual__isnull=False).values('centro_actual', 'estado').annotate(total=Count('id'))):
+        centro_id = fila['centro_actual']
+        filas.append(ResumenOcupacion(
+            clave=_clave('ESTADO', centro_id, estado=fila['estado']), dimension='ESTADO',
+            centro_salud_id=centro_id, estado=fila['estado'], activos=fila['total'],
+        ))
+
+    ResumenOcupacion.objects.bulk_create(filas, batch_size=1000)
+    return len(filas)
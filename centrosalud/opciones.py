@@ -0,0 +1,81 @@
+"""
+Listas de áreas y médicos de los formularios de ingreso, en caché.
+
+Por tipo de centro se guardan los ids válidos y el HTML de los <option> ya
+renderizado, bajo una versión global. Las señales sobre Area, AreaCategory y
+PerfilUsuario (centrosalud/signals.py) suben la versión, así que nunca se
+sirve una lista vieja después de un cambio.
+"""
+from django import forms
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.html import format_html_join
+
+from centrosalud.models.models import Area
+
+CLAVE_VERSION = 'opciones_admision:version'
+DURACION = 24 * 60 * 60
+
+
+def _opciones(filas):
+    filas = [(str(pk), str(etiqueta)) for pk, etiqueta in filas]
+    return {
+        'choices': filas,
+        'ids': frozenset(pk for pk, _ in filas),
+        'html': format_html_join('', '<option value="{}">{}</option>', filas),
+    }
+
+
+def opciones_admision(tipo_centro=None):
+    """
+    {'areas': ..., 'medicos': ...} para el tipo de centro (todas las áreas si es None).
+    Cada lista trae 'choices', 'ids' y 'html'.
+    """
+    version = cache.get_or_set(CLAVE_VERSION, 1, None)
+    clave = f'opciones_admision:{version}:{tipo_centro or "*"}'
+    datos = cache.get(clave)
+    if datos is None:
+        areas = Area.objects.all()
+        if tipo_centro:
+            areas = areas.filter(categoria__tipo=tipo_centro)
+        datos = {
+            'areas': _opciones(areas.order_by('pk').values_list('pk', 'nombre')),
+            'medicos': _opciones(User.objects.filter(perfil__tipo='MEDICO')
+                                 .order_by('pk').values_list('pk', 'username')),
+        }
+        cache.set(clave, datos, DURACION)
+    return datos
+
+
+def invalidar():
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, 2, None)
+
+
+class OpcionCacheadaField(forms.ChoiceField):
+    """
+    ChoiceField sobre una lista de opciones_admision(). Valida contra el set de
+    ids y devuelve ``model(pk=id)`` sin consultar la base.
+    """
+
+    def __init__(self, model, opciones=None, **kwargs):
+        self.model = model
+        self.ids = frozenset()
+        self.opciones_html = ''
+        super().__init__(**kwargs)
+        if opciones is not None:
+            self.usar(opciones)
+
+    def usar(self, opciones):
+        self.choices = [('', '---------'), *opciones['choices']]
+        self.ids = opciones['ids']
+        self.opciones_html = opciones['html']
+
+    def valid_value(self, value):
+        return str(value) in self.ids
+
+    def clean(self, value):
+        value = super().clean(value)
+        return self.model(pk=int(value)) if value else None
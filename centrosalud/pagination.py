@@ -0,0 +1,111 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    """Página de resultados obtenida por cursor (keyset) en vez de OFFSET."""
+
+    def __init__(self, object_list, next_cursor, cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.cursor is not None
+
+
+def _codificar_cursor(valores):
+    crudo = json.dumps([str(v) for v in valores]).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+
+def _decodificar_cursor(cursor, campos, model):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(valores, list) or len(valores) != len(campos):
+        return None
+    try:
+        return [
+            model._meta.get_field('id' if campo == 'pk' else campo).to_python(valor)
+            for campo, valor in zip(campos, valores)
+        ]
+    except ValidationError:
+        return None
+
+
+def _consulta_keyset(queryset, ordering, cursor, page_size):
+    descendente = ordering[0].startswith('-')
+    campos = [campo.lstrip('-') for campo in ordering]
+    valores = _decodificar_cursor(cursor, campos, queryset.model) if cursor else None
+
+    if valores is not None:
+        operador = 'lt' if descendente else 'gt'
+        filtro = Q()
+        for i, campo in enumerate(campos):
+            condicion = Q(**{f'{campo}__{operador}': valores[i]})
+            for previo, valor in zip(campos[:i], valores[:i]):
+                condicion &= Q(**{previo: valor})
+            filtro |= condicion
+        queryset = queryset.filter(filtro)
+    return queryset.order_by(*ordering)[:page_size + 1], campos, valores
+
+
+def _armar_pagina(filas, campos, valores, cursor, page_size):
+    siguiente = None
+    if len(filas) > page_size:
+        filas = filas[:page_size]
+        ultima = filas[-1]
+        siguiente = _codificar_cursor(getattr(ultima, campo) for campo in campos)
+    return KeysetPage(filas, siguiente, cursor if valores is not None else None)
+
+
+def keyset_paginate(queryset, ordering, cursor=None, page_size=50):
+    """
+    Devuelve una KeysetPage de ``queryset`` ordenada por ``ordering``.
+
+    ``ordering`` es una tupla de campos indexados que identifica cada fila de
+    forma única (el último suele ser ``pk``). Todos los campos deben tener la
+    misma dirección: ('pk',) o ('-fecha_entrada', '-pk'). La página se obtiene
+    con ``WHERE clave > cursor LIMIT n``, por lo que el costo no depende de lo
+    profundo que esté la página.
+    """
+    consulta, campos, valores = _consulta_keyset(queryset, ordering, cursor, page_size)
+    return _armar_pagina(list(consulta), campos, valores, cursor, page_size)
+
+
+async def akeyset_paginate(queryset, ordering, cursor=None, page_size=50):
+    """keyset_paginate para vistas async (ORM async)."""
+    consulta, campos, valores = _consulta_keyset(queryset, ordering, cursor, page_size)
+    return _armar_pagina([fila async for fila in consulta], campos, valores, cursor, page_size)
+
+
+class KeysetPaginationMixin:
+    """
+    Reemplaza la paginación por OFFSET de ListView por paginación keyset.
+
+    El cursor llega en el parámetro GET ``after``; ``page_obj.next_cursor``
+    entrega el cursor de la página siguiente.
+    """
+    keyset_ordering = ('pk',)
+    paginate_by = 50
+    cursor_kwarg = 'after'
+
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self.request.GET.get(self.cursor_kwarg)
+        page = keyset_paginate(queryset, self.keyset_ordering, cursor, page_size)
+        return (None, page, page.object_list, page.has_next() or page.has_previous())
@@ -0,0 +1,61 @@
+import re
+
+from django.core.exceptions import ValidationError
+
+_NO_RUT = re.compile(r'[^0-9kK]')
+
+
+def calcular_dv(cuerpo):
+    """Dígito verificador (módulo 11) del cuerpo numérico de un RUT."""
+    suma, factor = 0, 2
+    for digito in reversed(str(cuerpo)):
+        suma += int(digito) * factor
+        factor = 2 if factor == 7 else factor + 1
+    resto = 11 - suma % 11
+    return {11: '0', 10: 'K'}.get(resto, str(resto))
+
+
+def separar_rut(valor):
+    """
+    Separa un RUT escrito en cualquier formato en (cuerpo, dv).
+
+    "12.345.678-5", "12345678-5" y "123456785" entregan (12345678, '5').
+    Lanza ValueError si el texto no tiene forma de RUT.
+    """
+    limpio = _NO_RUT.sub('', str(valor or '')).upper()
+    cuerpo, dv = limpio[:-1], limpio[-1:]
+    if not cuerpo.isdigit() or not 1 <= len(cuerpo) <= 9:
+        raise ValueError(f"RUT inválido: {valor!r}")
+    return int(cuerpo), dv
+
+
+def cuerpo_rut(valor):
+    """Cuerpo numérico del RUT sin validar el dígito verificador, o None."""
+    try:
+        return separar_rut(valor)[0]
+    except ValueError:
+        return None
+
+
+def normalizar_rut(valor):
+    """Valida el dígito verificador y devuelve el cuerpo numérico del RUT."""
+    try:
+        cuerpo, dv = separar_rut(valor)
+    except ValueError:
+        raise ValidationError("Ingrese un RUT válido. Ej: 12345678-5")
+    if calcular_dv(cuerpo) != dv:
+        raise ValidationError("El dígito verificador del RUT no es válido.")
+    return cuerpo
+
+
+def cuerpo_valido(valor):
+    """Como normalizar_rut, pero devuelve None si el RUT o su dígito verificador no son válidos."""
+    try:
+        return normalizar_rut(valor)
+    except ValidationError:
+        return None
+
+
+def formatear_rut(cuerpo):
+    """Formato canónico almacenado en Paciente.rut: 12345678-5"""
+    return f"{cuerpo}-{calcular_dv(cuerpo)}"
@@ -0,0 +1,171 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from centrosalud import busqueda, censo, ocupacion, opciones
+from centrosalud.models.models import Area, AreaCategory, AtencionMedica, FichaMedica
+from login.models.models import PerfilUsuario
+
+
+def _centro_de_area(area_id):
+    if not area_id:
+        return None
+    return Area.objects.filter(pk=area_id).values_list('centro_salud_id', flat=True).first()
+
+
+def _aportes_guardados(atencion):
+    if not atencion.pk:
+        return []
+    previa = (AtencionMedica.objects.filter(pk=atencion.pk)
+              .values_list('fecha_salida', 'area_id', 'area__centro_salud_id', 'medico_responsable_id')
+              .first())
+    if previa is None:
+        return []
+    fecha_salida, area_id, centro_id, medico_id = previa
+    return ocupacion.aportes_atencion(fecha_salida is None, area_id, centro_id, medico_id)
+
+
+def _aportes_actuales(atencion):
+    if atencion.area_id and AtencionMedica.area.is_cached(atencion):
+        centro_id = atencion.area.centro_salud_id
+    else:
+        centro_id = _centro_de_area(atencion.area_id)
+    return ocupacion.aportes_atencion(
+        atencion.fecha_salida is None, atencion.area_id, centro_id, atencion.medico_responsable_id
+    )
+
+
+# --- Resumen de ocupación (dashboard del director) ---
+
+@receiver(pre_save, sender=AtencionMedica)
+def atencion_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    campos = {'fecha_salida', 'area', 'medico_responsable'}
+    if update_fields is not None and not campos.intersection(update_fields):
+        instance._ocupacion_previa = None
+        return
+    instance._ocupacion_previa = _aportes_guardados(instance)
+
+
+@receiver(post_save, sender=AtencionMedica)
+def atencion_post_save(sender, instance, raw=False, **kwargs):
+    previa = getattr(instance, '_ocupacion_previa', None)
+    if raw or previa is None:
+        return
+    ocupacion.aplicar_diferencia(previa, _aportes_actuales(instance))
+    instance._ocupacion_previa = None
+
+
+@receiver(post_delete, sender=AtencionMedica)
+def atencion_post_delete(sender, instance, **kwargs):
+    ocupacion.aplicar_diferencia(_aportes_actuales(instance), [])
+
+
+@receiver(pre_save, sender=FichaMedica)
+def ficha_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and 'estado' not in update_fields:
+        instance._estado_previo = instance.estado
+        return
+    if hasattr(instance, '_estado_guardado'):
+        # Quien ya leyó la fila bajo bloqueo (centrosalud/admision.py) evita releerla
+        instance._estado_previo = instance.__dict__.pop('_estado_guardado')
+        return
+    instance._estado_previo = (
+        FichaMedica.objects.filter(pk=instance.pk).values_list('estado', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=FichaMedica)
+def ficha_post_save(sender, instance, raw=False, **kwargs):
+    if raw or not hasattr(instance, '_estado_previo'):
+        return
+    if instance._estado_previo != instance.estado:
+        antes, despues = censo.registrar_cambio(instance, instance._estado_previo,
+                                                getattr(instance, '_modificado_por', None))
+        ocupacion.mover_situacion(antes, despues)
+    del instance._estado_previo
+
+
+@receiver(post_delete, sender=FichaMedica)
+def ficha_post_delete(sender, instance, **kwargs):
+    # Sus atenciones se borraron antes en la cascada: ya cuenta sin centro ni área
+    censo.mover((None, None, instance.estado), None)
+
+
+# --- Censo diario y fichas activas por estado: abrir, cerrar o mover una atención cambia la fila del paciente ---
+
+@receiver(pre_save, sender=AtencionMedica)
+def atencion_censo_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not {'fecha_salida', 'fecha_entrada', 'area'}.intersection(update_fields):
+        return
+    instance._censo_previo = censo.situacion(instance.ficha_medica_id)
+
+
+@receiver(post_save, sender=AtencionMedica)
+def atencion_censo_post_save(sender, instance, raw=False, **kwargs):
+    if raw or not hasattr(instance, '_censo_previo'):
+        return
+    actual = censo.situacion(instance.ficha_medica_id)
+    censo.mover(instance._censo_previo, actual)
+    ocupacion.mover_situacion(instance._censo_previo, actual)
+    del instance._censo_previo
+
+
+def _previas_del_borrado(origen):
+    if not hasattr(origen, '_censo_previas'):
+        origen._censo_previas = {}
+    return origen._censo_previas
+
+
+@receiver(pre_delete, sender=AtencionMedica)
+def atencion_censo_pre_delete(sender, instance, origin=None, **kwargs):
+    # Un mismo delete() puede borrar varias atenciones de la ficha en un solo lote:
+    # la situación previa se toma una vez y se aplica con la primera que se borre
+    previas = _previas_del_borrado(origin if origin is not None else instance)
+    if instance.ficha_medica_id not in previas:
+        previas[instance.ficha_medica_id] = censo.situacion(instance.ficha_medica_id)
+
+
+@receiver(post_delete, sender=AtencionMedica)
+def atencion_censo_post_delete(sender, instance, origin=None, **kwargs):
+    previas = _previas_del_borrado(origin if origin is not None else instance)
+    if instance.ficha_medica_id in previas:
+        previa, actual = previas.pop(instance.ficha_medica_id), censo.situacion(instance.ficha_medica_id)
+        censo.mover(previa, actual)
+        ocupacion.mover_situacion(previa, actual)
+
+
+# --- Índice de búsqueda clínica ---
+
+@receiver(post_save, sender=FichaMedica)
+def ficha_indexar(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        busqueda.indexar_ficha(instance, update_fields)
+
+
+@receiver(post_save, sender=AtencionMedica)
+def atencion_indexar(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        busqueda.indexar_atencion(instance, update_fields)
+
+
+# --- Listas de opciones de los formularios de ingreso ---
+
+@receiver([post_save, post_delete], sender=Area)
+@receiver([post_save, post_delete], sender=AreaCategory)
+@receiver([post_save, post_delete], sender=PerfilUsuario)
+def opciones_invalidar(sender, **kwargs):
+    opciones.invalidar()
+
+
+@receiver(post_save, sender=User)
+def opciones_usuario(sender, update_fields=None, **kwargs):
+    # El nombre de usuario es la etiqueta del médico; el login solo toca last_login
+    if update_fields is None or 'username' in update_fields:
+        opciones.invalidar()
@@ -0,0 +1,344 @@
+import json
+import re
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from centrosalud import admision, busqueda, censo, ocupacion
+from centrosalud.models.models import (
+    Area, AreaCategory, AtencionMedica, CensoDiario, CentroSalud, FichaMedica, Paciente, ResumenOcupacion, TransicionEstado,
+)
+from centrosalud.rut import formatear_rut
+from login.models.models import PerfilUsuario
+
+
+def crear_datos():
+    hospital = CentroSalud.objects.create(nombre="Hospital Regional", tipo="HOSPITAL")
+    categoria = AreaCategory.objects.create(nombre="Areas de Hospital", tipo="HOSPITAL")
+    area = Area.objects.create(nombre="Urgencias", centro_salud=hospital, categoria=categoria)
+    medico = User.objects.create(username='medico')
+    PerfilUsuario.objects.create(user=medico, tipo='MEDICO', centro_salud=hospital)
+    ingreso = User.objects.create(username='ingreso')
+    PerfilUsuario.objects.create(user=ingreso, tipo='INGRESO', centro_salud=hospital)
+    paciente = Paciente.objects.create(nombre='Ana', apellido1='Gomez', rut='11111111-1',
+                                       fecha_nacimiento='1980-01-01', telefono='1', direccion='x')
+    FichaMedica.objects.create(paciente=paciente, estado='EN_ALTA')
+    return area, medico, ingreso, paciente
+
+
+def activos(clave):
+    return ResumenOcupacion.objects.filter(clave=clave).values_list('activos', flat=True).first()
+
+
+class RegistrarIngresoTests(TestCase):
+    def setUp(self):
+        self.area, self.medico, self.ingreso, self.paciente = crear_datos()
+
+    def ingresar(self, clave=None, paciente=None):
+        return admision.registrar_ingreso((paciente or self.paciente).pk, self.area, self.medico, 'Dolor',
+                                          self.ingreso, clave)
+
+    def test_ingreso_de_paciente_en_alta(self):
+        atencion, repetido = self.ingresar('a' * 32)
+        self.assertFalse(repetido)
+        self.assertEqual(atencion.ficha_medica.estado, 'EN_TRATAMIENTO')
+        self.assertEqual(FichaMedica.objects.get(paciente=self.paciente).estado, 'EN_TRATAMIENTO')
+        self.assertEqual(atencion.clave_idempotencia, 'a' * 32)
+        # Ocupación y censo se mantienen como con cualquier save()
+        # Solo cuentan las fichas con una atención abierta, en el centro de esa atención
+        self.assertEqual(activos(f'ESTADO:{self.area.centro_salud_id}:EN_TRATAMIENTO'), 1)
+        self.assertEqual(ResumenOcupacion.objects.filter(dimension='ESTADO', activos__gt=0).count(), 1)
+        self.assertEqual(activos(f'AREA:{self.area.centro_salud_id}:{self.area.pk}'), 1)
+        transicion = TransicionEstado.objects.latest('pk')
+        self.assertEqual((transicion.estado_anterior, transicion.estado_nuevo, transicion.usuario),
+                         ('EN_ALTA', 'EN_TRATAMIENTO', self.ingreso))
+
+    def test_la_ficha_se_lee_una_sola_vez(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.ingresar()
+        # La señal de FichaMedica no vuelve a leer el estado anterior
+        lecturas = [q['sql'] for q in consultas.captured_queries
+                    if q['sql'].startswith('SELECT "centrosalud_fichamedica".')]
+        self.assertEqual(len(lecturas), 1)
+
+    def test_la_misma_clave_devuelve_la_misma_atencion(self):
+        primera, _ = self.ingresar('b' * 32)
+        segunda, repetido = self.ingresar('b' * 32)
+        self.assertTrue(repetido)
+        self.assertEqual(segunda, primera)
+        self.assertEqual(segunda.ficha_medica.paciente, self.paciente)
+        self.assertEqual(AtencionMedica.objects.count(), 1)
+
+    def test_rechazo_si_no_esta_en_alta(self):
+        self.ingresar('c' * 32)
+        with self.assertRaisesMessage(admision.IngresoRechazado, 'estado: En Tratamiento'):
+            self.ingresar('d' * 32)
+        with self.assertRaises(admision.IngresoRechazado):
+            self.ingresar()
+        self.assertEqual(AtencionMedica.objects.count(), 1)
+
+    def test_la_clave_de_otro_paciente_no_sirve(self):
+        self.ingresar('e' * 32)
+        otro = Paciente.objects.create(nombre='Luis', apellido1='Soto', rut='22222222-2',
+                                       fecha_nacimiento='1980-01-01', telefono='1', direccion='x')
+        FichaMedica.objects.create(paciente=otro, estado='EN_TRATAMIENTO')
+        with self.assertRaises(admision.IngresoRechazado):
+            self.ingresar('e' * 32, paciente=otro)
+
+    def test_paciente_sin_ficha(self):
+        paciente = Paciente.objects.create(nombre='Luis', apellido1='Soto', rut='22222222-2',
+                                           fecha_nacimiento='1980-01-01', telefono='1', direccion='x')
+        atencion, _ = self.ingresar(paciente=paciente)
+        self.assertEqual(paciente.ficha_medica.estado, 'EN_TRATAMIENTO')
+        self.assertEqual(atencion.ficha_medica, paciente.ficha_medica)
+        with self.assertRaises(Paciente.DoesNotExist):
+            admision.registrar_ingreso(9999, self.area, self.medico, 'Dolor')
+
+    def test_todo_o_nada(self):
+        with mock.patch('centrosalud.admision._abrir_atencion', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.ingresar()
+        self.assertEqual(FichaMedica.objects.get(paciente=self.paciente).estado, 'EN_ALTA')
+        self.assertFalse(ResumenOcupacion.objects.filter(dimension='ESTADO', activos__gt=0).exists())
+
+    def test_crear_paciente_con_ingreso(self):
+        datos = {'nombre': 'Luis', 'apellido1': 'Soto', 'rut': '22222222-2', 'fecha_nacimiento': '1980-01-01',
+                 'telefono': '1', 'direccion': 'x'}
+        atencion, repetido = admision.crear_paciente_con_ingreso(datos, self.area, self.medico, 'Dolor',
+                                                                  self.ingreso, 'f' * 32)
+        self.assertFalse(repetido)
+        self.assertEqual(atencion.ficha_medica.paciente.rut_numero, 22222222)
+        self.assertEqual(admision.crear_paciente_con_ingreso(datos, self.area, self.medico, 'Dolor',
+                                                             self.ingreso, 'f' * 32), (atencion, True))
+        with self.assertRaisesMessage(admision.IngresoRechazado, 'ya está registrado'):
+            admision.crear_paciente_con_ingreso(datos, self.area, self.medico, 'Dolor', self.ingreso, '0' * 32)
+        self.assertEqual(Paciente.objects.filter(rut='22222222-2').count(), 1)
+        self.assertEqual(AtencionMedica.objects.count(), 1)
+
+
+class VistasIngresoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.area, self.medico, self.ingreso, self.paciente = crear_datos()
+        self.client.force_login(self.ingreso)
+        self.datos = {'area': self.area.pk, 'medico_responsable': self.medico.pk, 'motivo_consulta': 'Control'}
+
+    def clave_del_formulario(self, response):
+        return re.search(r'name="clave_idempotencia" value="(\w+)"', response.content.decode()).group(1)
+
+    def test_doble_envio_registra_un_ingreso(self):
+        url = reverse('register_admission', kwargs={'pk': self.paciente.pk})
+        clave = self.clave_del_formulario(self.client.get(url))
+        for _ in range(2):
+            response = self.client.post(url, {**self.datos, 'clave_idempotencia': clave}, follow=True)
+            self.assertRedirects(response, reverse('admission_dashboard'))
+            self.assertContains(response, 'Ingreso registrado para Ana Gomez.')
+        self.assertEqual(AtencionMedica.objects.get().clave_idempotencia, clave)
+
+        # Otro formulario para el mismo paciente sí se rechaza
+        response = self.client.post(url, {**self.datos, 'clave_idempotencia': '0' * 32}, follow=True)
+        self.assertContains(response, 'No se puede registrar un nuevo ingreso.')
+        self.assertEqual(AtencionMedica.objects.count(), 1)
+
+    def test_la_clave_se_conserva_al_corregir_el_formulario(self):
+        url = reverse('register_admission', kwargs={'pk': self.paciente.pk})
+        response = self.client.post(url, {'motivo_consulta': 'Control', 'clave_idempotencia': '1' * 32})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.clave_del_formulario(response), '1' * 32)
+        self.assertNotEqual(self.clave_del_formulario(self.client.get(url)), '1' * 32)
+
+    def test_un_solo_select_del_paciente(self):
+        url = reverse('register_admission', kwargs={'pk': self.paciente.pk})
+        self.client.get(url)
+        # Sesión, usuario y paciente con su ficha
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+    def test_doble_envio_al_crear_paciente(self):
+        url = reverse('create_patient_with_rut', kwargs={'rut': '12345678-5'})
+        clave = self.clave_del_formulario(self.client.get(url))
+        datos = {**self.datos, 'nombre': 'Juan', 'apellido1': 'Perez', 'fecha_nacimiento': '1990-01-01',
+                 'telefono': '1234', 'direccion': 'Calle 1', 'clave_idempotencia': clave}
+        for _ in range(2):
+            response = self.client.post(url, datos, follow=True)
+            self.assertRedirects(response, reverse('admission_dashboard'))
+            self.assertContains(response, 'Paciente Juan Perez ingresado exitosamente.')
+        atencion = AtencionMedica.objects.get(ficha_medica__paciente__rut='12345678-5')
+        self.assertEqual(atencion.clave_idempotencia, clave)
+
+        # Sin la clave de ese envío, el RUT ya registrado lleva a registrar un ingreso
+        response = self.client.post(url, {**datos, 'clave_idempotencia': '0' * 32})
+        self.assertRedirects(response, reverse('register_admission', kwargs={'pk': atencion.ficha_medica.paciente_id}),
+                             fetch_redirect_response=False)
+
+
+class IngresoLoteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.area, self.medico, self.ingreso, self.paciente = crear_datos()
+        self.tratamiento = Paciente.objects.create(nombre='Luis', apellido1='Soto', rut='22222222-2',
+                                                   fecha_nacimiento='1980-01-01', telefono='1', direccion='x')
+        FichaMedica.objects.create(paciente=self.tratamiento, estado='EN_TRATAMIENTO')
+
+    def nuevos(self, cantidad, desde=30000000):
+        return [{'rut': formatear_rut(numero), 'nombre': 'NN', 'apellido1': f'Victima {numero}',
+                 'fecha_nacimiento': '01/01/1980'} for numero in range(desde, desde + cantidad)]
+
+    def ingresar(self, filas, clave=None):
+        return admision.ingresar_lote(filas, self.area, self.medico, 'Politraumatismo', self.ingreso, clave)
+
+    def agregados(self):
+        hoy = timezone.localdate()
+        return (
+            dict(ResumenOcupacion.objects.exclude(activos=0).values_list('clave', 'activos')),
+            censo.serie(hoy, hoy), censo.serie(hoy, hoy, area_id=self.area.pk),
+        )
+
+    def test_resultado_por_fila(self):
+        resultados = self.ingresar([
+            {'rut': '11.111.111-1'},
+            {'rut': '22222222-2'},
+            {'rut': '12.345.678-5', 'nombre': 'Juan', 'apellido1': 'Perez', 'fecha_nacimiento': '1990-02-01'},
+            {'rut': '9.876.543-3'},
+            {'rut': '1-2'},
+            {'rut': '11111111-1'},
+        ])
+        self.assertEqual([(r['resultado'], r['nuevo']) for r in resultados], [
+            ('INGRESADO', False), ('RECHAZADO', False), ('INGRESADO', True),
+            ('RECHAZADO', False), ('RECHAZADO', False), ('RECHAZADO', False),
+        ])
+        self.assertIn('En Tratamiento', resultados[1]['motivo'])
+        self.assertIn('faltan campos: nombre, apellido1, fecha_nacimiento', resultados[3]['motivo'])
+        self.assertEqual(resultados[5]['motivo'], 'RUT repetido en la fila 1')
+
+        juan = Paciente.objects.get(rut='12345678-5')
+        self.assertEqual(juan.rut_numero, 12345678)
+        self.assertEqual(resultados[2]['paciente'], juan.pk)
+        for resultado in (resultados[0], resultados[2]):
+            atencion = AtencionMedica.objects.select_related('ficha_medica').get(pk=resultado['atencion'])
+            self.assertEqual(atencion.ficha_medica.paciente_id, resultado['paciente'])
+            self.assertEqual(atencion.ficha_medica.estado, 'EN_TRATAMIENTO')
+            self.assertEqual((atencion.area, atencion.medico_responsable), (self.area, self.medico))
+        self.assertEqual(list(TransicionEstado.objects.filter(usuario=self.ingreso).order_by('estado_anterior')
+                              .values_list('estado_anterior', 'estado_nuevo')),
+                         [(None, 'EN_TRATAMIENTO'), ('EN_ALTA', 'EN_TRATAMIENTO')])
+        self.assertEqual(len(busqueda.buscar('Politraumatismo')), 2)
+
+    def test_agregados_como_si_se_recalcularan(self):
+        self.ingresar([{'rut': '11111111-1'}, *self.nuevos(3)])
+        incrementales = self.agregados()
+        ocupacion.recalcular()
+        CensoDiario.objects.all().delete()
+        censo.recalcular()
+        self.assertEqual(self.agregados(), incrementales)
+
+    def test_consultas_constantes(self):
+        altas = []
+        for rut in ('33333333-3', '44444444-4'):
+            paciente = Paciente.objects.create(nombre='Eva', apellido1='Rios', rut=rut,
+                                               fecha_nacimiento='1980-01-01', telefono='1', direccion='x')
+            altas.append(FichaMedica.objects.create(paciente=paciente, estado='EN_ALTA').paciente)
+        # El primer lote crea las filas de ocupación y censo; los siguientes solo las actualizan
+        self.ingresar([{'rut': '11111111-1'}, *self.nuevos(1, desde=50000000)])
+        with CaptureQueriesContext(connection) as pocos:
+            self.ingresar([{'rut': altas[0].rut}, *self.nuevos(2)])
+        with CaptureQueriesContext(connection) as muchos:
+            self.ingresar([{'rut': altas[1].rut}, *self.nuevos(20, desde=40000000)])
+        self.assertEqual(len(muchos), len(pocos))
+
+    def test_reenvio_con_la_misma_clave(self):
+        filas = [{'rut': '11111111-1'}, *self.nuevos(2)]
+        primera = self.ingresar(filas, clave='lote-1')
+        segunda = self.ingresar(filas, clave='lote-1')
+        self.assertEqual([r['resultado'] for r in segunda], ['REPETIDO'] * 3)
+        self.assertEqual([r['atencion'] for r in segunda], [r['atencion'] for r in primera])
+        self.assertEqual(AtencionMedica.objects.count(), 3)
+        # Otro lote con los mismos pacientes se rechaza
+        self.assertEqual([r['resultado'] for r in self.ingresar(filas, clave='lote-2')], ['RECHAZADO'] * 3)
+
+    def test_maximo_de_filas(self):
+        with self.assertRaises(ValueError):
+            self.ingresar(self.nuevos(admision.MAX_FILAS_LOTE + 1))
+
+    def test_api(self):
+        self.client.force_login(self.ingreso)
+        url = reverse('batch_admission_json')
+        cuerpo = {'area': self.area.pk, 'medico_responsable': self.medico.pk, 'motivo_consulta': 'Choque',
+                  'pacientes': [{'rut': '11111111-1'}, {'rut': '22222222-2'}, *self.nuevos(2)],
+                  'clave_idempotencia': 'accidente-ruta-5'}
+        response = self.client.post(url, cuerpo, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        datos = response.json()
+        self.assertEqual((datos['ingresados'], datos['repetidos'], datos['rechazados']), (3, 0, 1))
+        self.assertEqual([fila['fila'] for fila in datos['resultados']], [1, 2, 3, 4])
+        response = self.client.post(url, cuerpo, content_type='application/json')
+        self.assertEqual(response.json()['repetidos'], 3)
+
+        for invalido in ('{', json.dumps({**cuerpo, 'pacientes': []}), json.dumps({**cuerpo, 'area': 9999}),
+                         json.dumps({**cuerpo, 'clave_idempotencia': 'x' * 41})):
+            with self.subTest(invalido=invalido[:40]):
+                self.assertEqual(self.client.post(url, invalido, content_type='application/json').status_code, 400)
+
+    def test_formulario(self):
+        self.client.force_login(self.ingreso)
+        url = reverse('batch_admission')
+        response = self.client.get(url)
+        clave = re.search(r'name="clave_idempotencia" value="(\w+)"', response.content.decode()).group(1)
+        datos = {'area': self.area.pk, 'medico_responsable': self.medico.pk, 'motivo_consulta': 'Choque',
+                 'pacientes': '11.111.111-1\n\n30000000-2; NN; Victima 1; 01/01/1980\n22222222-2',
+                 'clave_idempotencia': clave}
+        response = self.client.post(url, datos)
+        self.assertEqual([fila['resultado'] for fila in response.context['resultados']],
+                         ['INGRESADO', 'INGRESADO', 'RECHAZADO'])
+        self.assertContains(response, '2 de 3 pacientes ingresados.')
+        self.assertNotEqual(response.context['clave_idempotencia'], clave)
+        # Recargar la página reenvía la clave anterior
+        response = self.client.post(url, datos)
+        self.assertEqual([fila['resultado'] for fila in response.context['resultados']],
+                         ['REPETIDO', 'REPETIDO', 'RECHAZADO'])
+        self.assertEqual(AtencionMedica.objects.count(), 2)
+
+
+class IngresosConcurrentesTests(TransactionTestCase):
+    def test_un_solo_ingreso_abierto(self):
+        area, medico, ingreso, paciente = crear_datos()
+        funcionarios = 4
+        barrera = threading.Barrier(funcionarios)
+        resultados = []
+
+        def funcionario(n):
+            clave = f'{n:032x}'
+            barrera.wait()
+            try:
+                # Como un navegador que reintenta el mismo envío si la base estaba ocupada
+                for _ in range(20):
+                    try:
+                        resultados.append(admision.registrar_ingreso(paciente.pk, area, medico, 'Dolor',
+                                                                     ingreso, clave)[1])
+                        return
+                    except OperationalError:
+                        time.sleep(0.01)
+                    except admision.IngresoRechazado:
+                        resultados.append('rechazado')
+                        return
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=funcionario, args=(n,)) for n in range(funcionarios)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(AtencionMedica.objects.filter(fecha_salida__isnull=True).count(), 1)
+        self.assertEqual(resultados.count(False), 1)
+        self.assertEqual(resultados.count('rechazado'), funcionarios - 1)
+        self.assertEqual(activos(f'ESTADO:{area.centro_salud_id}:EN_TRATAMIENTO'), 1)
@@ -0,0 +1,120 @@
+import re
+import threading
+from datetime import timedelta
+from io import StringIO
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from centrosalud import asincrono
+from centrosalud.models.models import (
+    Area, AtencionExamen, AtencionMedica, CentroSalud, ExamenMedico, FichaMedica, Paciente,
+)
+from login.models.models import PerfilUsuario
+
+
+def sin_csrf(response):
+    # El token CSRF enmascarado cambia en cada respuesta
+    return re.sub(r'name="csrfmiddlewaretoken" value="\w+"', '', response.content.decode())
+
+
+def crear_datos():
+    hospital = CentroSalud.objects.create(nombre="Hospital Regional", tipo="HOSPITAL")
+    area = Area.objects.create(nombre="Urgencias", centro_salud=hospital)
+    examen = ExamenMedico.objects.create(nombre_examen="Hemograma")
+    medico = User.objects.create(username='medico')
+    PerfilUsuario.objects.create(user=medico, tipo='MEDICO', rut='11111112-1', centro_salud=hospital)
+    director = User.objects.create(username='director')
+    PerfilUsuario.objects.create(user=director, tipo='DIRECTOR', centro_salud=hospital)
+    paciente = Paciente.objects.create(nombre='Ana', apellido1='Gomez', rut='98765432-1',
+                                       fecha_nacimiento='1985-05-05', telefono='111', direccion='Avenida 1')
+    ficha = FichaMedica.objects.create(paciente=paciente, estado='EN_TRATAMIENTO')
+    base = timezone.now() - timedelta(days=30)
+    for i in range(25):
+        atencion = AtencionMedica.objects.create(
+            ficha_medica=ficha, medico_responsable=medico, area=area, fecha_entrada=base + timedelta(days=i),
+            fecha_salida=None if i == 24 else base + timedelta(days=i, hours=2), diagnostico=f'Diagnostico {i}')
+        AtencionExamen.objects.create(atencion_medica=atencion, examen_medico=examen)
+    return medico, director, paciente
+
+
+class VistasAsincronasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.medico, self.director, self.paciente = crear_datos()
+
+    def test_mismo_contenido_que_la_vista_sincrona(self):
+        pares = [
+            (self.medico, 'doctor_patient_list', 'doctor_patient_list_async', {}),
+            (self.medico, 'patient_detail', 'patient_detail_async', {'pk': self.paciente.pk}),
+            (self.director, 'director_dashboard', 'director_dashboard_async', {}),
+        ]
+        for usuario, sincrona, asincrona, kwargs in pares:
+            with self.subTest(vista=asincrona):
+                self.client.force_login(usuario)
+                esperado = self.client.get(reverse(sincrona, kwargs=kwargs or None))
+                response = self.client.get(reverse(asincrona, kwargs=kwargs or None))
+                self.assertEqual(response.status_code, 200)
+                self.assertHTMLEqual(sin_csrf(response), sin_csrf(esperado))
+
+    def test_detalle_con_examenes_de_la_pagina(self):
+        self.client.force_login(self.medico)
+        response = self.client.get(reverse('patient_detail_async', kwargs={'pk': self.paciente.pk}))
+        atenciones = response.context['atenciones']
+        self.assertEqual(len(atenciones), 20)
+        self.assertEqual(atenciones[0].diagnostico, 'Diagnostico 24')
+        self.assertTrue(all(len(atencion.examenes) == 1 for atencion in atenciones))
+        self.assertContains(response, 'Cargar atenciones anteriores')
+
+    def test_paciente_inexistente(self):
+        self.client.force_login(self.medico)
+        self.assertEqual(self.client.get(reverse('patient_detail_async', kwargs={'pk': 9999})).status_code, 404)
+
+    def test_login_y_rol(self):
+        url = reverse('director_dashboard_async')
+        self.assertRedirects(self.client.get(url), f"{reverse('login')}?next={url}", fetch_redirect_response=False)
+        self.client.force_login(self.medico)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class ReunirTests(TransactionTestCase):
+    # Fuera de una transacción cada consulta va en su hilo y con su propia conexión
+    def test_consultas_a_la_vez(self):
+        crear_datos()
+        hilos = set()
+
+        def contar(modelo):
+            def consulta():
+                hilos.add(threading.get_ident())
+                return modelo.objects.count()
+            return consulta
+
+        resultados = async_to_sync(asincrono.reunir)(contar(Paciente), contar(AtencionMedica), contar(AtencionExamen))
+        self.assertEqual(resultados, [1, 25, 25])
+        self.assertNotIn(threading.get_ident(), hilos)
+
+    def test_vista_fuera_de_una_transaccion(self):
+        medico, _, paciente = crear_datos()
+        self.client.force_login(medico)
+        response = self.client.get(reverse('patient_detail_async', kwargs={'pk': paciente.pk}))
+        self.assertContains(response, 'Hemograma', count=20)
+
+
+class BenchmarkAsgiTests(TransactionTestCase):
+    def test_comando(self):
+        call_command('generar_dataset', '--pacientes', '30', '--atenciones', '60', '--medicos', '2',
+                     '--centros', '1', stdout=StringIO())
+        salida = StringIO()
+        call_command('benchmark_asgi', '--clientes', '2', '--peticiones', '4', stdout=salida)
+        filas = [linea.split() for linea in salida.getvalue().splitlines()[2:]]
+        self.assertEqual([(fila[0], fila[1]) for fila in filas], [
+            ('doctor_patient_list', 'wsgi'), ('doctor_patient_list', 'asgi'),
+            ('patient_detail', 'wsgi'), ('patient_detail', 'asgi'),
+            ('director_dashboard', 'wsgi'), ('director_dashboard', 'asgi'),
+        ])
+        self.assertTrue(all(fila[-1] == '0' for fila in filas))
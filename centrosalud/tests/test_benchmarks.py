@@ -0,0 +1,63 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from centrosalud import benchmarks
+from centrosalud.models.models import AtencionMedica
+
+
+class BenchmarkRutasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Un solo centro con pocos médicos: la lista del médico llena una página completa
+        call_command('generar_dataset', '--pacientes', '150', '--atenciones', '450', '--medicos', '4',
+                     '--centros', '1', stdout=StringIO())
+        cls.escenario = benchmarks.Escenario()
+
+    def test_todas_las_rutas_tienen_presupuesto(self):
+        declaradas = {ruta.nombre for ruta in benchmarks.RUTAS} | set(benchmarks.EXCLUIDAS)
+        self.assertEqual(benchmarks.rutas_con_nombre() - declaradas, set())
+
+    def test_rutas_dentro_del_presupuesto(self):
+        # Solo status y consultas: la latencia depende de la máquina y la controla benchmark_rutas
+        clientes = {}
+        for ruta in benchmarks.RUTAS:
+            with self.subTest(ruta=ruta.nombre, metodo=ruta.metodo):
+                medicion = benchmarks.medir(ruta, self.escenario, repeticiones=3, calentamiento=1, clientes=clientes)
+                self.assertEqual(medicion.fallas(factor_latencia=None), [])
+
+    def test_presupuesto_excedido_se_reporta(self):
+        ruta = benchmarks.Ruta('doctor_patient_list', usuario='medico', consultas=2, p95_ms=0)
+        medicion = benchmarks.medir(ruta, self.escenario, repeticiones=1, calentamiento=0)
+        fallas = medicion.fallas()
+        self.assertEqual(len(fallas), 2)
+        self.assertIn("presupuesto 2", fallas[0])
+        self.assertEqual(medicion.fallas(factor_latencia=None), fallas[:1])
+
+    def test_percentil(self):
+        valores = list(range(1, 101))
+        self.assertEqual(benchmarks.percentil(valores, 50), 50)
+        self.assertEqual(benchmarks.percentil(valores, 95), 95)
+        self.assertEqual(benchmarks.percentil([7], 95), 7)
+
+    def test_comando(self):
+        salida = StringIO()
+        call_command('benchmark_rutas', '--repeticiones', '1', '--calentamiento', '1', '--factor-latencia', '10',
+                     '--ruta', 'director_dashboard', stdout=salida)
+        self.assertIn('1 rutas dentro del presupuesto', salida.getvalue())
+
+    def test_post_de_admision_no_cambia_el_dataset(self):
+        ruta = next(r for r in benchmarks.RUTAS if r.nombre == 'register_admission' and r.metodo == 'post')
+        atenciones = AtencionMedica.objects.count()
+        medicion = benchmarks.medir(ruta, self.escenario, repeticiones=2, calentamiento=1)
+        self.assertEqual(medicion.status, 302)
+        self.assertEqual(AtencionMedica.objects.count(), atenciones)
+        self.escenario.paciente_alta.ficha_medica.refresh_from_db()
+        self.assertEqual(self.escenario.paciente_alta.ficha_medica.estado, 'EN_ALTA')
+
+    def test_no_deja_usuarios_propios(self):
+        usuarios = set(User.objects.values_list('username', flat=True))
+        benchmarks.Escenario()
+        self.assertEqual(set(User.objects.values_list('username', flat=True)), usuarios)
@@ -0,0 +1,57 @@
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from centrosalud import busqueda
+from centrosalud.models.models import (
+    CentroSalud, Area, Paciente, FichaMedica, AtencionMedica, DocumentoClinico,
+)
+from login.models.models import PerfilUsuario
+
+
+class BusquedaClinicaTests(TestCase):
+    def setUp(self):
+        hospital = CentroSalud.objects.create(nombre="Hospital Regional", tipo="HOSPITAL")
+        self.area = Area.objects.create(nombre="Urgencias", centro_salud=hospital)
+        self.doctor = User.objects.create_user(username='doctor', password='password')
+        PerfilUsuario.objects.create(user=self.doctor, tipo='MEDICO', centro_salud=hospital)
+
+        self.roberto = self.crear_ficha('Roberto', '15234567-8', alergias='Penicilina',
+                                        enfermedades_cronicas='Diabetes tipo 2, Hipertensión')
+        self.miguel = self.crear_ficha('Miguel', '12987654-3', antecedentes_personales='Apendicectomía hace 3 días')
+        AtencionMedica.objects.create(ficha_medica=self.miguel, medico_responsable=self.doctor, area=self.area,
+                                      motivo_consulta='Control post-operatorio',
+                                      diagnostico='Evolución favorable, diabetes controlada')
+
+    def crear_ficha(self, nombre, rut, **textos):
+        paciente = Paciente.objects.create(nombre=nombre, apellido1='Prueba', rut=rut,
+                                           fecha_nacimiento='1970-01-01', telefono='1', direccion='Talca')
+        return FichaMedica.objects.create(paciente=paciente, **textos)
+
+    def test_documentos_se_mantienen_al_guardar(self):
+        self.assertEqual(DocumentoClinico.objects.count(), 3)
+        self.roberto.medicamentos_actuales = 'Metformina 850mg'
+        self.roberto.save()
+        self.assertEqual(DocumentoClinico.objects.count(), 3)
+        self.assertEqual([d.ficha_medica_id for d in busqueda.buscar('metformina')], [self.roberto.pk])
+
+    def test_busqueda_sin_acentos_y_por_prefijo(self):
+        self.assertEqual([d.ficha_medica_id for d in busqueda.buscar('apendicectomia')], [self.miguel.pk])
+        self.assertEqual([d.ficha_medica_id for d in busqueda.buscar('hipert')], [self.roberto.pk])
+
+    def test_busqueda_en_atenciones(self):
+        fichas = {d.ficha_medica_id for d in busqueda.buscar('diabetes')}
+        self.assertEqual(fichas, {self.roberto.pk, self.miguel.pk})
+        self.assertEqual(busqueda.buscar('"NEAR(*'), [])
+
+    def test_reindexar(self):
+        DocumentoClinico.objects.all().delete()
+        self.assertEqual(busqueda.reindexar(), 3)
+        self.assertEqual(len(busqueda.buscar('penicilina')), 1)
+
+    def test_vista_de_busqueda(self):
+        client = Client()
+        client.login(username='doctor', password='password')
+        response = client.get(reverse('clinical_search'), {'q': 'penicilina'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Roberto Prueba')
+        self.assertNotContains(response, 'Miguel Prueba')
@@ -0,0 +1,152 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from centrosalud import censo
+from centrosalud.models.models import (
+    Area, AtencionMedica, CensoDiario, CentroSalud, FichaMedica, Paciente, TransicionEstado,
+)
+from login.models.models import PerfilUsuario
+
+
+class CensoDiarioTests(TestCase):
+    def setUp(self):
+        self.hospital = CentroSalud.objects.create(nombre="Hospital Regional", tipo="HOSPITAL")
+        self.cesfam = CentroSalud.objects.create(nombre="Cesfam Norte", tipo="CESFAM")
+        self.uci = Area.objects.create(nombre="UCI", centro_salud=self.hospital)
+        self.pabellon = Area.objects.create(nombre="Pabellón", centro_salud=self.hospital)
+        self.box = Area.objects.create(nombre="Box 1", centro_salud=self.cesfam)
+        self.doctor = User.objects.create_user(username='doctor', password='password')
+        PerfilUsuario.objects.create(user=self.doctor, tipo='MEDICO', centro_salud=self.hospital)
+        self.director = User.objects.create_user(username='director', password='password')
+        PerfilUsuario.objects.create(user=self.director, tipo='DIRECTOR', centro_salud=self.hospital)
+        self.hoy = timezone.localdate()
+
+    def crear_ficha(self, rut, estado='EN_TRATAMIENTO'):
+        paciente = Paciente.objects.create(nombre='Ana', apellido1='Rojas', rut=rut,
+                                           fecha_nacimiento='1990-01-01', telefono='222', direccion='Calle 1')
+        return FichaMedica.objects.create(paciente=paciente, estado=estado)
+
+    def pacientes(self, area, estado):
+        return censo.serie(self.hoy, self.hoy, area_id=area.pk if area else None, estado=estado)[0][1][estado]
+
+    def vigentes(self):
+        # Último valor de cada clave, omitiendo las que quedaron en cero
+        valores = {fila.clave: fila.pacientes for fila in CensoDiario.objects.order_by('fecha')}
+        return {clave: total for clave, total in valores.items() if total}
+
+    def test_cambio_de_estado_queda_registrado(self):
+        ficha = self.crear_ficha('11111111-1')
+        AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=self.doctor, area=self.uci)
+        self.client.login(username='doctor', password='password')
+        self.client.post(reverse('update_patient_status', kwargs={'pk': ficha.paciente.pk}),
+                         {'estado': 'PRE_OPERATORIO'})
+
+        transicion = TransicionEstado.objects.latest('pk')
+        self.assertEqual((transicion.estado_anterior, transicion.estado_nuevo), ('EN_TRATAMIENTO', 'PRE_OPERATORIO'))
+        self.assertEqual((transicion.area, transicion.centro_salud, transicion.usuario),
+                         (self.uci, self.hospital, self.doctor))
+        self.assertEqual(self.pacientes(self.uci, 'PRE_OPERATORIO'), 1)
+        self.assertEqual(self.pacientes(self.uci, 'EN_TRATAMIENTO'), 0)
+
+    def test_la_ficha_nueva_se_registra_sin_area(self):
+        ficha = self.crear_ficha('22222222-2')
+        self.assertEqual(list(ficha.transiciones.values_list('estado_anterior', 'estado_nuevo')),
+                         [(None, 'EN_TRATAMIENTO')])
+        self.assertEqual(self.pacientes(None, 'EN_TRATAMIENTO'), 1)
+
+    def test_atenciones_mueven_al_paciente_entre_areas(self):
+        ficha = self.crear_ficha('33333333-3')
+        atencion = AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=self.doctor, area=self.uci)
+        self.assertEqual(self.pacientes(self.uci, 'EN_TRATAMIENTO'), 1)
+        self.assertEqual(self.pacientes(None, 'EN_TRATAMIENTO'), 0)
+
+        atencion.area = self.pabellon
+        atencion.save()
+        self.assertEqual(self.pacientes(self.uci, 'EN_TRATAMIENTO'), 0)
+        self.assertEqual(self.pacientes(self.pabellon, 'EN_TRATAMIENTO'), 1)
+
+        atencion.fecha_salida = timezone.now()
+        atencion.save(update_fields=['fecha_salida'])
+        self.assertEqual(self.pacientes(self.pabellon, 'EN_TRATAMIENTO'), 0)
+        self.assertEqual(self.pacientes(None, 'EN_TRATAMIENTO'), 1)
+        # Editar el diagnóstico no toca el censo
+        with CaptureQueriesContext(connection) as consultas:
+            atencion.diagnostico = 'Control'
+            atencion.save(update_fields=['diagnostico'])
+        self.assertFalse([q for q in consultas.captured_queries if 'censo' in q['sql'] or 'fichamedica' in q['sql']])
+
+    def test_borrar_una_atencion_vuelve_a_la_anterior(self):
+        ficha = self.crear_ficha('10101010-1')
+        AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=self.doctor, area=self.uci,
+                                      fecha_entrada=timezone.now() - timedelta(hours=2))
+        reciente = AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=self.doctor, area=self.box)
+        reciente.delete()
+        self.assertEqual(self.vigentes(), {censo._clave(self.hospital.pk, self.uci.pk, 'EN_TRATAMIENTO'): 1})
+
+    def test_borrar_paciente_con_varias_atenciones(self):
+        ficha = self.crear_ficha('44444444-4', estado='POST_OPERATORIO')
+        AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=self.doctor, area=self.uci,
+                                      fecha_entrada=timezone.now() - timedelta(hours=2))
+        AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=self.doctor, area=self.pabellon)
+        self.assertEqual(self.pacientes(self.pabellon, 'POST_OPERATORIO'), 1)
+        ficha.paciente.delete()
+        self.assertEqual(self.vigentes(), {})
+
+    def test_serie_arrastra_el_ultimo_valor(self):
+        clave = censo._clave(self.hospital.pk, self.uci.pk, 'PRE_OPERATORIO')
+        for dias_atras, pacientes in [(10, 4), (5, 6), (2, 3)]:
+            CensoDiario.objects.create(fecha=self.hoy - timedelta(days=dias_atras), clave=clave, estado='PRE_OPERATORIO',
+                                       centro_salud=self.hospital, area=self.uci, pacientes=pacientes)
+
+        serie = censo.serie(self.hoy - timedelta(days=7), self.hoy - timedelta(days=1), centro_salud_id=self.hospital.pk)
+        self.assertEqual([conteo['PRE_OPERATORIO'] for _, conteo in serie], [4, 4, 6, 6, 6, 3, 3])
+        self.assertEqual(serie[0][0], self.hoy - timedelta(days=7))
+        self.assertEqual(censo.serie(self.hoy - timedelta(days=7), self.hoy, centro_salud_id=self.cesfam.pk)[-1][1],
+                         dict.fromkeys(censo.ESTADOS, 0))
+
+    def test_primer_cambio_del_dia_parte_del_dia_anterior(self):
+        clave = censo._clave(self.hospital.pk, self.uci.pk, 'EN_TRATAMIENTO')
+        CensoDiario.objects.create(fecha=self.hoy - timedelta(days=3), clave=clave, estado='EN_TRATAMIENTO',
+                                   centro_salud=self.hospital, area=self.uci, pacientes=7)
+        ficha = self.crear_ficha('55555555-5')
+        AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=self.doctor, area=self.uci)
+        self.assertEqual(CensoDiario.objects.get(clave=clave, fecha=self.hoy).pacientes, 8)
+
+    def test_recalcular_coincide_con_incremental(self):
+        for i, area in enumerate([self.uci, self.uci, self.pabellon, self.box, None]):
+            ficha = self.crear_ficha(f'6666666{i}-6', estado='PRE_OPERATORIO' if i % 2 else 'EN_TRATAMIENTO')
+            if area:
+                AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=self.doctor, area=area)
+        incremental = self.vigentes()
+        censo.recalcular()
+        self.assertEqual(self.vigentes(), incremental)
+
+    def test_transiciones_no_se_modifican(self):
+        transicion = self.crear_ficha('77777777-7').transiciones.get()
+        transicion.estado_nuevo = 'EN_ALTA'
+        with self.assertRaises(ValueError):
+            transicion.save()
+
+    def test_json_del_director(self):
+        ficha = self.crear_ficha('88888888-8', estado='PRE_OPERATORIO')
+        AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=self.doctor, area=self.uci)
+        otra = self.crear_ficha('99999999-9', estado='PRE_OPERATORIO')
+        AtencionMedica.objects.create(ficha_medica=otra, medico_responsable=self.doctor, area=self.box)
+
+        self.client.login(username='director', password='password')
+        response = self.client.get(reverse('director_censo_json'), {'desde': str(self.hoy - timedelta(days=2))})
+        self.assertEqual(response.status_code, 200)
+        dias = response.json()['dias']
+        self.assertEqual(len(dias), 3)
+        # Solo el centro del director
+        self.assertEqual(dias[-1]['PRE_OPERATORIO'], 1)
+        self.assertEqual(dias[0]['PRE_OPERATORIO'], 0)
+
+        response = self.client.get(reverse('director_censo_json'), {'desde': '2020-01-01', 'hasta': '2024-01-01'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from centrosalud import estadias
+from centrosalud.models.models import Area, AtencionMedica, CentroSalud, FichaMedica, Paciente
+from login.models.models import PerfilUsuario
+
+
+class PorGrupoTests(TestCase):
+    def test_estadisticas_por_grupo(self):
+        horas = np.array([1.0, 30.0, 2.0, 10.0, 500.0, 5.0])
+        grupos = np.array([1, 2, 1, 1, 2, estadias.SIN_GRUPO])
+        resumen = estadias.por_grupo(horas, grupos)
+
+        self.assertEqual(set(resumen), {estadias.SIN_GRUPO, 1, 2})
+        self.assertEqual(resumen[1]['n'], 3)
+        self.assertEqual(resumen[1]['promedio'], round(13 / 3, 1))
+        self.assertEqual((resumen[1]['p50'], resumen[1]['p95']), (2.0, 10.0))
+        self.assertEqual(resumen[2]['p50'], 30.0)
+        # < 4 h, 4-12 h, 12-24 h, 1-3 días, 3-7 días, 7-14 días, > 14 días
+        self.assertEqual(resumen[1]['histograma'], [2, 1, 0, 0, 0, 0, 0])
+        self.assertEqual(resumen[2]['histograma'], [0, 0, 0, 1, 0, 0, 1])
+
+    def test_sin_datos(self):
+        self.assertEqual(estadias.por_grupo(np.empty(0), np.empty(0, np.int64)), {})
+
+
+class ReporteEstadiasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.hospital = CentroSalud.objects.create(nombre="Hospital Regional", tipo="HOSPITAL")
+        self.cesfam = CentroSalud.objects.create(nombre="Cesfam Norte", tipo="CESFAM")
+        self.uci = Area.objects.create(nombre="UCI", centro_salud=self.hospital)
+        self.urgencia = Area.objects.create(nombre="Urgencias", centro_salud=self.hospital)
+        self.box = Area.objects.create(nombre="Box 1", centro_salud=self.cesfam)
+        self.doctor = User.objects.create_user(username='doctor', password='password')
+        PerfilUsuario.objects.create(user=self.doctor, tipo='MEDICO', centro_salud=self.hospital)
+        self.director = User.objects.create_user(username='director', password='password')
+        PerfilUsuario.objects.create(user=self.director, tipo='DIRECTOR', centro_salud=self.hospital)
+
+        self.ahora = timezone.now()
+        self.hoy = timezone.localdate()
+        paciente = Paciente.objects.create(nombre='Ana', apellido1='Rojas', rut='11111111-1',
+                                           fecha_nacimiento='1990-01-01', telefono='222', direccion='Calle 1')
+        ficha = FichaMedica.objects.create(paciente=paciente)
+        for area, horas in [(self.uci, 48), (self.uci, 72), (self.uci, 96), (self.urgencia, 3), (self.box, 10)]:
+            self.atender(ficha, area, horas)
+        self.atender(ficha, self.uci, 5, hace_dias=60)  # alta fuera del período
+        self.atender(ficha, self.uci, None)  # sigue abierta
+
+    def atender(self, ficha, area, horas, hace_dias=1):
+        salida = self.ahora - timedelta(days=hace_dias)
+        AtencionMedica.objects.create(
+            ficha_medica=ficha, medico_responsable=self.doctor, area=area,
+            fecha_entrada=salida - timedelta(hours=horas or 1), fecha_salida=salida if horas else None,
+        )
+
+    def test_calcular(self):
+        reporte = estadias.calcular(self.hoy - timedelta(days=29), self.hoy)
+        self.assertEqual(reporte['total']['n'], 5)
+        areas = {fila['nombre']: fila for fila in reporte['areas']}
+        self.assertEqual(areas['UCI']['n'], 3)
+        self.assertEqual((areas['UCI']['promedio'], areas['UCI']['p50']), (72.0, 72.0))
+        self.assertEqual(areas['Urgencias']['histograma'][0], 1)
+        self.assertEqual(reporte['areas'][0]['nombre'], 'UCI')  # más altas primero
+        self.assertEqual(reporte['medicos'][0]['nombre'], 'doctor')
+        self.assertEqual({fila['nombre'] for fila in reporte['centros']}, {'Hospital Regional', 'Cesfam Norte'})
+
+    def test_filtra_por_centro(self):
+        reporte = estadias.calcular(self.hoy - timedelta(days=29), self.hoy, centro_id=self.cesfam.pk)
+        self.assertEqual([fila['nombre'] for fila in reporte['areas']], ['Box 1'])
+
+    def test_periodo_sin_altas(self):
+        reporte = estadias.calcular(self.hoy - timedelta(days=200), self.hoy - timedelta(days=100))
+        self.assertIsNone(reporte['total'])
+        self.assertEqual(reporte['areas'], [])
+
+    def test_reporte_en_cache(self):
+        desde = self.hoy - timedelta(days=29)
+        estadias.reporte(desde, self.hoy)
+        with self.assertNumQueries(0):
+            self.assertEqual(estadias.reporte(desde, self.hoy)['total']['n'], 5)
+
+    def test_vistas_del_director(self):
+        self.client.login(username='director', password='password')
+        response = self.client.get(reverse('director_estadias'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Urgencias')
+        self.assertNotContains(response, 'Box 1')
+
+        datos = self.client.get(reverse('director_estadias_json')).json()
+        self.assertEqual(datos['total']['n'], 4)
+        response = self.client.get(reverse('director_estadias_json'), {'desde': '2024-02-01', 'hasta': '2024-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_solo_director(self):
+        self.client.login(username='doctor', password='password')
+        self.assertEqual(self.client.get(reverse('director_estadias_json')).status_code, 403)
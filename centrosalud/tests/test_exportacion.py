@@ -0,0 +1,81 @@
+import csv
+import gzip
+import io
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from centrosalud import exportacion
+from centrosalud.models.models import Area, AtencionMedica, CentroSalud, FichaMedica, Paciente
+from login.models.models import PerfilUsuario
+
+
+class ExportarAtencionesTests(TestCase):
+    def setUp(self):
+        self.hospital = CentroSalud.objects.create(nombre="Hospital Regional", tipo="HOSPITAL")
+        self.cesfam = CentroSalud.objects.create(nombre="Cesfam Norte", tipo="CESFAM")
+        self.uci = Area.objects.create(nombre="UCI", centro_salud=self.hospital)
+        self.urgencia = Area.objects.create(nombre="Urgencias", centro_salud=self.hospital)
+        self.box = Area.objects.create(nombre="Box 1", centro_salud=self.cesfam)
+        self.doctor = User.objects.create_user(username='doctor', password='password')
+        PerfilUsuario.objects.create(user=self.doctor, tipo='MEDICO', centro_salud=self.hospital)
+        self.director = User.objects.create_user(username='director', password='password')
+        PerfilUsuario.objects.create(user=self.director, tipo='DIRECTOR', centro_salud=self.hospital)
+
+        paciente = Paciente.objects.create(nombre='Ana', apellido1='Rojas', rut='11.111.111-1',
+                                           fecha_nacimiento='1990-01-01', telefono='222', direccion='Calle 1')
+        ficha = FichaMedica.objects.create(paciente=paciente)
+        ahora = timezone.now()
+        for dias, area, motivo in [(1, self.uci, 'Dolor'), (2, self.urgencia, '=HYPERLINK("x")'),
+                                   (3, self.box, 'Control'), (90, self.uci, 'Antigua')]:
+            AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=self.doctor, area=area,
+                                          motivo_consulta=motivo, fecha_entrada=ahora - timedelta(days=dias))
+        self.client.login(username='director', password='password')
+
+    def descargar(self, **params):
+        response = self.client.get(reverse('director_exportar_atenciones'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def filas(self, contenido):
+        return list(csv.DictReader(io.StringIO(contenido.decode('utf-8'))))
+
+    def test_exporta_el_periodo_del_centro(self):
+        response, contenido = self.descargar()
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="atenciones_', response['Content-Disposition'])
+        filas = self.filas(contenido)
+        # Últimos 30 días, solo el centro del director, de la más antigua a la más reciente
+        self.assertEqual([fila['area'] for fila in filas], ['Urgencias', 'UCI'])
+        self.assertEqual(filas[1]['rut'], '11.111.111-1')
+        self.assertEqual(filas[1]['centro'], 'Hospital Regional')
+        self.assertEqual(filas[1]['fecha_salida'], '')
+
+    def test_neutraliza_formulas(self):
+        _, contenido = self.descargar()
+        self.assertEqual(self.filas(contenido)[0]['motivo_consulta'], '\'=HYPERLINK("x")')
+
+    def test_filtros(self):
+        _, contenido = self.descargar(area=self.uci.pk, desde=str(timezone.localdate() - timedelta(days=120)))
+        self.assertEqual([fila['motivo_consulta'] for fila in self.filas(contenido)], ['Antigua', 'Dolor'])
+
+    def test_gzip(self):
+        _, plano = self.descargar()
+        response, comprimido = self.descargar(gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.csv.gz"'))
+        self.assertEqual(gzip.decompress(comprimido), plano)
+
+    def test_lotes(self):
+        trozos = list(exportacion.lineas_csv(AtencionMedica.objects.order_by('pk'), tamano_lote=3))
+        self.assertEqual(len(trozos), 2)
+        self.assertEqual(len(self.filas(''.join(trozos).encode())), 4)
+
+    def test_solo_director(self):
+        self.client.login(username='doctor', password='password')
+        response = self.client.get(reverse('director_exportar_atenciones'))
+        self.assertEqual(response.status_code, 403)
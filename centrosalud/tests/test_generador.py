@@ -0,0 +1,70 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.core.management import call_command
+from centrosalud.generador import RUT_BASE, GeneradorDataset
+from centrosalud.models.models import AtencionMedica, DocumentoClinico, FichaMedica, Paciente, ResumenOcupacion
+from centrosalud.rut import formatear_rut
+
+
+class GenerarDatasetTests(TestCase):
+    def generar(self, *args):
+        call_command('generar_dataset', '--pacientes', '60', '--atenciones', '150', '--medicos', '5',
+                     '--lote', '25', '--sin-indice', *args, stdout=StringIO())
+
+    def huella(self):
+        return (
+            list(Paciente.objects.order_by('rut_numero').values_list('rut', 'nombre', 'fecha_nacimiento')),
+            list(FichaMedica.objects.order_by('paciente__rut_numero').values_list('estado', 'alergias')),
+            list(AtencionMedica.objects.order_by('ficha_medica__paciente__rut_numero', 'fecha_entrada')
+                 .values_list('area__nombre', 'medico_responsable__username', 'fecha_entrada', 'fecha_salida')),
+        )
+
+    def test_misma_semilla_mismos_datos(self):
+        self.generar()
+        primera = self.huella()
+        self.generar('--limpiar')
+        self.assertEqual(self.huella(), primera)
+        self.assertEqual(Paciente.objects.count(), 60)
+
+    def test_atenciones_abiertas_coinciden_con_estado(self):
+        self.generar()
+        abiertas = AtencionMedica.objects.filter(fecha_salida__isnull=True)
+        self.assertFalse(abiertas.filter(ficha_medica__estado='EN_ALTA').exists())
+        self.assertEqual(abiertas.count(),
+                         FichaMedica.objects.exclude(estado='EN_ALTA').filter(atenciones__isnull=False).distinct().count())
+        total_areas = sum(ResumenOcupacion.objects.filter(dimension='AREA').values_list('activos', flat=True))
+        self.assertEqual(total_areas, abiertas.count())
+
+    def test_limpiar_solo_borra_lo_generado(self):
+        call_command('generar_dataset', '--pacientes', '30', '--atenciones', '60', '--medicos', '2', '--lote', '10',
+                     stdout=StringIO())
+        # Un paciente real importado con un RUT dentro del rango del generador
+        real = Paciente.objects.create(nombre='Ana', apellido1='Rojas', rut=formatear_rut(RUT_BASE + 500),
+                                       fecha_nacimiento='1990-01-01', telefono='1', direccion='x')
+        FichaMedica.objects.create(paciente=real, estado='EN_TRATAMIENTO')
+        # Un usuario real cuyo nombre empieza con el prefijo
+        colega = User.objects.create_user('gen_colega', email='colega@example.com')
+
+        GeneradorDataset(tamano_lote=7).limpiar()
+        self.assertEqual(list(Paciente.objects.all()), [real])
+        self.assertEqual(list(User.objects.all()), [colega])
+        self.assertFalse(AtencionMedica.objects.exists())
+        self.assertEqual(set(DocumentoClinico.objects.values_list('ficha_medica__paciente', flat=True)), {real.pk})
+        # El paciente real no tiene atenciones abiertas: no cuenta en el resumen
+        self.assertFalse(ResumenOcupacion.objects.exclude(activos=0).exists())
+
+    def test_indexa_solo_lo_generado(self):
+        real = Paciente.objects.create(nombre='Ana', apellido1='Rojas', rut=formatear_rut(12345678),
+                                       fecha_nacimiento='1990-01-01', telefono='1', direccion='x')
+        FichaMedica.objects.create(paciente=real, estado='EN_TRATAMIENTO')
+        DocumentoClinico.objects.all().delete()
+
+        call_command('generar_dataset', '--pacientes', '30', '--atenciones', '60', '--medicos', '2', '--lote', '10',
+                     stdout=StringIO())
+        generados = Paciente.objects.exclude(pk=real.pk)
+        self.assertEqual(DocumentoClinico.objects.filter(atencion__isnull=True).count(), generados.count())
+        self.assertEqual(DocumentoClinico.objects.filter(atencion__isnull=False).count(), AtencionMedica.objects.count())
+        # La ficha existente no se reindexa
+        self.assertFalse(DocumentoClinico.objects.filter(ficha_medica__paciente=real).exists())
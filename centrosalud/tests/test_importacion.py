@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from centrosalud import busqueda
+from centrosalud.importacion import MUESTRA_RECHAZOS, ImportadorPacientes
+from centrosalud.models.models import (
+    CentroSalud, Area, Paciente, FichaMedica, AtencionMedica, ResumenOcupacion,
+)
+from login.models.models import PerfilUsuario
+
+CSV = """rut,nombre,apellido1,apellido2,fecha_nacimiento,telefono,direccion,estado,alergias,area,medico,motivo_consulta
+11.111.111-1,Ana,Rojas,,1980-02-01,911,Talca,EN_TRATAMIENTO,Penicilina,Urgencias,doctor,Fiebre
+22222222-2,Luis,Soto,Vera,15/03/1975,922,Curicó,,,UCI,doctor,Control
+123456785,Eva,Mora,,1990-01-01,933,Linares,EN_ALTA,,,,
+12345678-9,Mal,Rut,,1990-01-01,944,Talca,,,,,
+33333333-3,Sin,Area,,1990-01-01,955,Talca,,,Pabellon,doctor,Dolor
+11111111-1,Ana,Duplicada,,1980-02-01,911,Talca,,,,,
+"""
+
+
+class ImportarPacientesTests(TestCase):
+    def setUp(self):
+        self.hospital = CentroSalud.objects.create(nombre="Hospital Regional", tipo="HOSPITAL")
+        self.urgencia = Area.objects.create(nombre="Urgencias", centro_salud=self.hospital)
+        Area.objects.create(nombre="UCI", centro_salud=self.hospital)
+        self.doctor = User.objects.create_user(username='doctor', password='password')
+        PerfilUsuario.objects.create(user=self.doctor, tipo='MEDICO', centro_salud=self.hospital)
+
+    def importar(self, contenido, sufijo, *args, centro=True):
+        with tempfile.NamedTemporaryFile('w', suffix=sufijo, delete=False, encoding='utf-8') as archivo:
+            archivo.write(contenido)
+        self.addCleanup(os.remove, archivo.name)
+        salida, errores = StringIO(), StringIO()
+        if centro:
+            args = ('--centro', str(self.hospital.pk), *args)
+        call_command('importar_pacientes', archivo.name, '--lote', '2', *args, stdout=salida, stderr=errores)
+        return salida.getvalue(), errores.getvalue()
+
+    def test_importa_csv_en_lotes(self):
+        salida, errores = self.importar(CSV, '.csv')
+        self.assertIn('Importados 3 de 6 filas (3 rechazadas)', salida)
+        self.assertIn('línea 5', errores)   # dígito verificador
+        self.assertIn('Pabellon', errores)   # área desconocida
+        self.assertIn('ya registrado', errores)
+
+        self.assertEqual(Paciente.objects.count(), 3)
+        self.assertEqual(FichaMedica.objects.count(), 3)
+        self.assertEqual(AtencionMedica.objects.count(), 2)
+        self.assertEqual(Paciente.objects.por_rut('12.345.678-5').get().nombre, 'Eva')
+        self.assertEqual(FichaMedica.objects.get(paciente__nombre='Luis').estado, 'EN_TRATAMIENTO')
+        self.assertEqual(ResumenOcupacion.objects.get(dimension='AREA', area=self.urgencia).activos, 1)
+        self.assertEqual(len(busqueda.buscar('penicilina')), 1)
+
+    def test_importa_jsonl_y_reporta_rechazos(self):
+        filas = [
+            {'rut': '11111111-1', 'nombre': 'Ana', 'apellido1': 'Rojas', 'fecha_nacimiento': '1980-02-01',
+             'telefono': '911', 'direccion': 'Talca', 'area': str(self.urgencia.pk), 'medico': 'doctor'},
+            {'rut': '22222222-2', 'nombre': 'Luis', 'apellido1': 'Soto', 'fecha_nacimiento': '1975-03-15',
+             'direccion': 'Curicó', 'medico': 'desconocido', 'area': 'UCI'},
+        ]
+        contenido = '\n'.join(json.dumps(f) for f in filas) + '\n{no es json}\n'
+        rechazos = tempfile.NamedTemporaryFile(suffix='.csv', delete=False)
+        rechazos.close()
+        self.addCleanup(os.remove, rechazos.name)
+
+        salida, _ = self.importar(contenido, '.jsonl', '--rechazados', rechazos.name)
+        self.assertIn('Importados 1 de 3 filas', salida)
+        with open(rechazos.name, encoding='utf-8') as archivo:
+            reporte = archivo.read()
+        self.assertIn('médico desconocido', reporte)
+        self.assertIn('fila ilegible', reporte)
+
+    def test_area_repetida_entre_centros(self):
+        cesfam = CentroSalud.objects.create(nombre="CESFAM Norte", tipo="CESFAM")
+        urgencia_cesfam = Area.objects.create(nombre="Urgencias", centro_salud=cesfam)
+        contenido = (
+            "rut,nombre,apellido1,fecha_nacimiento,direccion,area,medico\n"
+            "11111111-1,Ana,Rojas,1980-02-01,Talca,Urgencias,doctor\n"
+            f"22222222-2,Luis,Soto,1975-03-15,Curicó,{urgencia_cesfam.pk},doctor\n"
+            "33333333-3,Eva,Mora,1990-01-01,Linares,UCI,doctor\n"
+        )
+        # Sin --centro el nombre es ambiguo: se rechaza en vez de elegir un centro cualquiera
+        salida, errores = self.importar(contenido, '.csv', centro=False)
+        self.assertIn('Importados 2 de 3 filas (1 rechazadas)', salida)
+        self.assertIn("área 'Urgencias' existe en 2 centros", errores)
+        self.assertEqual(AtencionMedica.objects.get(ficha_medica__paciente__nombre='Luis').area, urgencia_cesfam)
+
+        # Con --centro el mismo nombre se resuelve en ese centro
+        Paciente.objects.all().delete()
+        salida, _ = self.importar(contenido, '.csv')
+        self.assertIn('Importados 2 de 3 filas', salida)
+        self.assertEqual(AtencionMedica.objects.get(ficha_medica__paciente__nombre='Ana').area, self.urgencia)
+
+    def test_rechazos_acotados(self):
+        reportados = []
+        importador = ImportadorPacientes(self.hospital, al_rechazar=lambda *rechazo: reportados.append(rechazo))
+        importador.importar((linea, None) for linea in range(MUESTRA_RECHAZOS + 5))
+        self.assertEqual(importador.total_rechazados, MUESTRA_RECHAZOS + 5)
+        self.assertEqual(len(importador.rechazados), MUESTRA_RECHAZOS)
+        self.assertEqual(len(reportados), MUESTRA_RECHAZOS + 5)
@@ -0,0 +1,82 @@
+import json
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from centrosalud import indices
+from centrosalud.models.models import Paciente
+
+
+class SugerirIndicesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('generar_dataset', '--pacientes', '200', '--atenciones', '600', '--medicos', '4',
+                     '--centros', '1', stdout=StringIO())
+        # Estadísticas para que el planificador de SQLite elija como lo haría con datos reales
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_consultas_frecuentes_usan_indices(self):
+        muestra = indices.Muestra()
+        for consulta in indices.CONSULTAS:
+            with self.subTest(consulta=consulta.nombre):
+                analisis = indices.analizar(consulta, muestra)
+                self.assertEqual(analisis.problemas, [], analisis.plan)
+
+    def test_consulta_sin_indice_se_reporta(self):
+        consulta = indices.ConsultaCaliente(
+            'por_nombre', lambda m: Paciente.objects.filter(nombre__startswith='Ana'), 'índice sobre nombre')
+        analisis = indices.analizar(consulta, indices.Muestra())
+        self.assertEqual(analisis.recorridos, {Paciente._meta.db_table})
+        self.assertIn('recorrido secuencial de centrosalud_paciente', analisis.problemas)
+
+    def test_comando(self):
+        salida = StringIO()
+        call_command('sugerir_indices', '--estricto', stdout=salida)
+        self.assertIn(f"{len(indices.CONSULTAS)} de {len(indices.CONSULTAS)} consultas usan índices",
+                      salida.getvalue())
+
+    def test_motor_no_soportado(self):
+        with mock.patch('centrosalud.indices.connection', SimpleNamespace(vendor='oracle')):
+            with self.assertRaises(indices.MotorNoSoportado):
+                indices.analizar(indices.CONSULTAS[0], indices.Muestra())
+            with self.assertRaisesMessage(CommandError, 'oracle'):
+                call_command('sugerir_indices', stdout=StringIO())
+
+    def test_comando_consulta_desconocida(self):
+        with self.assertRaises(CommandError):
+            call_command('sugerir_indices', '--consulta', 'no_existe', stdout=StringIO())
+
+
+class PlanPostgresqlTests(SimpleTestCase):
+    """El plan JSON de EXPLAIN (sin ANALYZE) no trae 'Sort Method': se mira el nodo padre."""
+
+    def _plan(self, raiz):
+        queryset = mock.Mock()
+        queryset.explain.return_value = json.dumps([{'Plan': raiz}])
+        return indices._plan_postgresql(queryset)
+
+    def test_sort_bajo_limit_es_top_n(self):
+        _, recorridos, ordenamiento = self._plan({'Node Type': 'Limit', 'Plans': [
+            {'Node Type': 'Sort', 'Plans': [
+                {'Node Type': 'Index Scan', 'Relation Name': 'centrosalud_atencionmedica'}]}]})
+        self.assertEqual(recorridos, set())
+        self.assertFalse(ordenamiento)
+
+    def test_sort_sin_limit_se_reporta(self):
+        _, recorridos, ordenamiento = self._plan({'Node Type': 'Sort', 'Plans': [
+            {'Node Type': 'Seq Scan', 'Relation Name': 'centrosalud_paciente'}]})
+        self.assertEqual(recorridos, {'centrosalud_paciente'})
+        self.assertTrue(ordenamiento)
+
+    def test_sort_anidado_bajo_otro_nodo(self):
+        _, _, ordenamiento = self._plan({'Node Type': 'Limit', 'Plans': [
+            {'Node Type': 'Nested Loop', 'Plans': [
+                {'Node Type': 'Sort', 'Plans': [{'Node Type': 'Seq Scan', 'Relation Name': 'centrosalud_area'}]},
+                {'Node Type': 'Index Scan', 'Relation Name': 'centrosalud_fichamedica'}]}]})
+        self.assertTrue(ordenamiento)
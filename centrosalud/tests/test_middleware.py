@@ -0,0 +1,70 @@
+import json
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from centrosalud.middleware import InstrumentacionSQLMiddleware, huella
+
+
+class HuellaTests(TestCase):
+    def test_literales_y_listas(self):
+        self.assertEqual(
+            huella('SELECT * FROM t WHERE id = 15 AND nombre = \'Ana\'  AND x IN (%s, %s, %s)'),
+            'SELECT * FROM t WHERE id = %s AND nombre = %s AND x IN (...)',
+        )
+        self.assertEqual(huella('SELECT "T3"."id" FROM t'), 'SELECT "T3"."id" FROM t')
+
+
+class InstrumentacionSQLTests(TestCase):
+    def setUp(self):
+        for i in range(6):
+            User.objects.create(username=f'usuario{i}')
+
+    @override_settings(INSTRUMENTACION_SQL={'ACTIVA': True, 'UMBRAL_REPETIDAS': 5})
+    def test_header_y_log_con_repetidas(self):
+        def vista_n_mas_1(request):
+            # Una consulta por usuario: el patrón que se quiere detectar
+            for pk in User.objects.values_list('pk', flat=True):
+                User.objects.get(pk=pk)
+            return HttpResponse('ok')
+
+        middleware = InstrumentacionSQLMiddleware(vista_n_mas_1)
+        with self.assertLogs('centrosalud.sql', 'INFO') as logs:
+            response = middleware(RequestFactory().get('/usuarios/'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('1 repetidas', response['Server-Timing'])
+        self.assertIn('app;dur=', response['Server-Timing'])
+
+        self.assertEqual(logs.records[0].levelname, 'WARNING')
+        linea = json.loads(logs.records[0].getMessage())
+        self.assertEqual(linea['ruta'], '/usuarios/')
+        self.assertEqual(linea['status'], 200)
+        self.assertEqual(linea['consultas'], 7)
+        self.assertEqual(linea['huellas_repetidas'], 1)
+        self.assertEqual(linea['peor_repetida']['veces'], 6)
+
+    @override_settings(INSTRUMENTACION_SQL={'ACTIVA': True})
+    def test_request_real(self):
+        with self.assertLogs('centrosalud.sql', 'INFO') as logs:
+            response = self.client.get(reverse('lista_usuarios'))
+        self.assertIn('Server-Timing', response)
+        self.assertEqual(json.loads(logs.records[0].getMessage())['ruta'], 'lista_usuarios')
+
+    @override_settings(INSTRUMENTACION_SQL={'ACTIVA': True})
+    def test_sin_repetidas_es_info(self):
+        with self.assertLogs('centrosalud.sql', 'INFO') as logs:
+            self.client.get(reverse('login'))
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        self.assertIsNone(json.loads(logs.records[0].getMessage())['peor_repetida'])
+
+    @override_settings(INSTRUMENTACION_SQL={'ACTIVA': True, 'MUESTREO': 0})
+    def test_fuera_de_muestra(self):
+        response = self.client.get(reverse('lista_usuarios'))
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(INSTRUMENTACION_SQL={'ACTIVA': False})
+    def test_desactivada(self):
+        response = self.client.get(reverse('lista_usuarios'))
+        self.assertNotIn('Server-Timing', response)
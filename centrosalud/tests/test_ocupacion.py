@@ -0,0 +1,122 @@
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from centrosalud import ocupacion
+from centrosalud.models.models import (
+    CentroSalud, Area, Paciente, FichaMedica, AtencionMedica, ResumenOcupacion,
+)
+from login.models.models import PerfilUsuario
+
+
+class ResumenOcupacionTests(TestCase):
+    def setUp(self):
+        self.hospital = CentroSalud.objects.create(nombre="Hospital Regional", tipo="HOSPITAL")
+        self.urgencia = Area.objects.create(nombre="Urgencias", centro_salud=self.hospital)
+        self.uci = Area.objects.create(nombre="UCI", centro_salud=self.hospital)
+        self.doctor = User.objects.create_user(username='doctor', password='password')
+        PerfilUsuario.objects.create(user=self.doctor, tipo='MEDICO', centro_salud=self.hospital)
+        self.director = User.objects.create_user(username='director', password='password')
+        PerfilUsuario.objects.create(user=self.director, tipo='DIRECTOR', centro_salud=self.hospital)
+
+    def crear_ficha(self, rut, estado='EN_TRATAMIENTO'):
+        paciente = Paciente.objects.create(nombre='Luis', apellido1='Diaz', rut=rut,
+                                           fecha_nacimiento='2000-01-01', telefono='222', direccion='Calle 2')
+        return FichaMedica.objects.create(paciente=paciente, estado=estado)
+
+    def activos(self, dimension, **filtros):
+        fila = ResumenOcupacion.objects.filter(dimension=dimension, **filtros).first()
+        return fila.activos if fila else 0
+
+    def snapshot(self):
+        return {f.clave: f.activos for f in ResumenOcupacion.objects.filter(activos__gt=0)}
+
+    def test_atenciones_actualizan_el_resumen(self):
+        ficha = self.crear_ficha('11111111-1')
+        atencion = AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=self.doctor, area=self.urgencia)
+        self.assertEqual(self.activos('AREA', area=self.urgencia), 1)
+        self.assertEqual(self.activos('MEDICO', medico=self.doctor), 1)
+
+        atencion.area = self.uci
+        atencion.save()
+        self.assertEqual(self.activos('AREA', area=self.urgencia), 0)
+        self.assertEqual(self.activos('AREA', area=self.uci), 1)
+
+        atencion.fecha_salida = timezone.now()
+        atencion.save()
+        self.assertEqual(self.activos('AREA', area=self.uci), 0)
+        self.assertEqual(self.activos('MEDICO', medico=self.doctor), 0)
+
+    def test_estado_de_ficha(self):
+        ficha = self.crear_ficha('22222222-2')
+        # Sin atención abierta la ficha no es un paciente activo
+        self.assertEqual(self.activos('ESTADO', estado='EN_TRATAMIENTO'), 0)
+        atencion = AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=self.doctor,
+                                                 area=self.urgencia)
+        self.assertEqual(self.activos('ESTADO', centro_salud=self.hospital, estado='EN_TRATAMIENTO'), 1)
+        ficha.estado = 'PRE_OPERATORIO'
+        ficha.save()
+        self.assertEqual(self.activos('ESTADO', estado='EN_TRATAMIENTO'), 0)
+        self.assertEqual(self.activos('ESTADO', centro_salud=self.hospital, estado='PRE_OPERATORIO'), 1)
+        atencion.fecha_salida = timezone.now()
+        atencion.save()
+        self.assertEqual(self.activos('ESTADO', estado='PRE_OPERATORIO'), 0)
+        atencion.fecha_salida = None
+        atencion.save()
+        ficha.paciente.delete()
+        self.assertEqual(self.activos('ESTADO', estado='PRE_OPERATORIO'), 0)
+
+    def test_estado_por_centro(self):
+        cesfam = CentroSalud.objects.create(nombre="CESFAM Norte", tipo="CESFAM")
+        box = Area.objects.create(nombre="Box", centro_salud=cesfam)
+        ficha = self.crear_ficha('66666666-6')
+        atencion = AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=self.doctor, area=box)
+        self.assertEqual(self.activos('ESTADO', centro_salud=cesfam, estado='EN_TRATAMIENTO'), 1)
+        atencion.area = self.uci
+        atencion.save()
+        self.assertEqual(self.activos('ESTADO', centro_salud=cesfam, estado='EN_TRATAMIENTO'), 0)
+        self.assertEqual(self.activos('ESTADO', centro_salud=self.hospital, estado='EN_TRATAMIENTO'), 1)
+
+    def test_recalcular_coincide_con_incremental(self):
+        for i in range(3):
+            ficha = self.crear_ficha(f'3333333{i}-3')
+            AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=self.doctor,
+                                          area=self.uci if i else self.urgencia)
+        incremental = self.snapshot()
+        ocupacion.recalcular()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_alta_cierra_atenciones(self):
+        ficha = self.crear_ficha('44444444-4')
+        AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=self.doctor, area=self.urgencia)
+        self.client.login(username='doctor', password='password')
+        self.client.post(reverse('update_patient_status', kwargs={'pk': ficha.paciente.pk}), {'estado': 'EN_ALTA'})
+        self.assertFalse(AtencionMedica.objects.filter(fecha_salida__isnull=True).exists())
+        self.assertEqual(self.activos('AREA', area=self.urgencia), 0)
+        self.assertFalse(ResumenOcupacion.objects.filter(dimension='ESTADO', activos__gt=0).exists())
+
+    def test_dashboard_lee_el_resumen(self):
+        for i in range(3):
+            ficha = self.crear_ficha(f'5555555{i}-5')
+            AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=self.doctor, area=self.urgencia)
+        client = Client()
+        client.login(username='director', password='password')
+        response = client.get(reverse('director_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_activos'], 3)
+        self.assertEqual([f.activos for f in response.context['resumen_areas']], [3])
+        self.assertEqual([(f.estado, f.activos) for f in response.context['resumen_estados']],
+                         [('EN_TRATAMIENTO', 3)])
+
+    def test_dashboard_solo_estados_del_centro(self):
+        cesfam = CentroSalud.objects.create(nombre="CESFAM Norte", tipo="CESFAM")
+        box = Area.objects.create(nombre="Box", centro_salud=cesfam)
+        AtencionMedica.objects.create(ficha_medica=self.crear_ficha('77777777-7', 'PRE_OPERATORIO'),
+                                      medico_responsable=self.doctor, area=box)
+        AtencionMedica.objects.create(ficha_medica=self.crear_ficha('88888888-8'),
+                                      medico_responsable=self.doctor, area=self.urgencia)
+        self.crear_ficha('99999999-9', 'EN_ALTA')
+        self.client.login(username='director', password='password')
+        response = self.client.get(reverse('director_dashboard'))
+        self.assertEqual([(f.estado, f.activos) for f in response.context['resumen_estados']],
+                         [('EN_TRATAMIENTO', 1)])
@@ -0,0 +1,78 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from centrosalud.models.models import Area, AreaCategory, CentroSalud, Paciente
+from centrosalud.opciones import opciones_admision
+from login.models.models import PerfilUsuario
+
+
+class OpcionesAdmisionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.hospital = CentroSalud.objects.create(nombre="Hospital Regional", tipo="HOSPITAL")
+        self.categoria = AreaCategory.objects.create(nombre="Areas de Hospital", tipo="HOSPITAL")
+        categoria_cesfam = AreaCategory.objects.create(nombre="Areas de CESFAM", tipo="CESFAM")
+        self.urgencias = Area.objects.create(nombre="Urgencias", centro_salud=self.hospital, categoria=self.categoria)
+        self.dental = Area.objects.create(nombre="Dental", centro_salud=self.hospital, categoria=categoria_cesfam)
+
+        self.medico = User.objects.create(username='medico')
+        PerfilUsuario.objects.create(user=self.medico, tipo='MEDICO', centro_salud=self.hospital)
+        self.ingreso = User.objects.create(username='ingreso')
+        PerfilUsuario.objects.create(user=self.ingreso, tipo='INGRESO', centro_salud=self.hospital)
+        self.client.force_login(self.ingreso)
+        self.url = reverse('create_patient_with_rut', kwargs={'rut': '12345678-5'})
+
+    def test_opciones_por_tipo_de_centro(self):
+        opciones = opciones_admision('HOSPITAL')
+        self.assertEqual(opciones['areas']['choices'], [(str(self.urgencias.pk), 'Urgencias')])
+        self.assertEqual(opciones['medicos']['ids'], {str(self.medico.pk)})
+        self.assertIn(f'<option value="{self.urgencias.pk}">Urgencias</option>', opciones['areas']['html'])
+        self.assertEqual(len(opciones_admision()['areas']['ids']), 2)
+
+    def test_sin_consultas_de_opciones_en_requests_repetidos(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, f'<option value="{self.urgencias.pk}">Urgencias</option>', html=True)
+        self.assertNotContains(response, 'Dental')
+        # Sesión, usuario y verificación del RUT
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+
+    def test_invalidacion_por_senales(self):
+        self.client.get(self.url)
+        uci = Area.objects.create(nombre="UCI", centro_salud=self.hospital, categoria=self.categoria)
+        self.assertContains(self.client.get(self.url), 'UCI')
+
+        self.categoria.tipo = 'CESFAM'
+        self.categoria.save()
+        self.assertNotContains(self.client.get(self.url), 'UCI')
+
+        otro = User.objects.create(username='otro_medico')
+        PerfilUsuario.objects.create(user=otro, tipo='MEDICO')
+        self.assertContains(self.client.get(self.url), 'otro_medico')
+        self.assertIn(str(uci.pk), opciones_admision()['areas']['ids'])
+
+    def test_post_valida_contra_la_cache(self):
+        datos = {
+            'nombre': 'Juan', 'apellido1': 'Perez', 'fecha_nacimiento': '1990-01-01', 'telefono': '1234',
+            'direccion': 'Calle 1', 'medico_responsable': self.medico.pk, 'motivo_consulta': 'Dolor',
+        }
+        response = self.client.post(self.url, {**datos, 'area': self.dental.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors['area'])
+
+        response = self.client.post(self.url, {**datos, 'area': self.urgencias.pk})
+        self.assertRedirects(response, reverse('admission_dashboard'), fetch_redirect_response=False)
+        atencion = Paciente.objects.get(rut='12345678-5').ficha_medica.atenciones.get()
+        self.assertEqual((atencion.area_id, atencion.medico_responsable_id), (self.urgencias.pk, self.medico.pk))
+
+    def test_registrar_ingreso(self):
+        paciente = Paciente.objects.create(nombre='Ana', apellido1='Gomez', rut='11111111-1',
+                                           fecha_nacimiento='1980-01-01', telefono='1', direccion='x')
+        url = reverse('register_admission', kwargs={'pk': paciente.pk})
+        self.assertContains(self.client.get(url), f'<option value="{self.medico.pk}">medico</option>', html=True)
+        response = self.client.post(url, {'area': self.urgencias.pk, 'medico_responsable': self.medico.pk,
+                                          'motivo_consulta': 'Control'})
+        self.assertRedirects(response, reverse('admission_dashboard'), fetch_redirect_response=False)
+        self.assertEqual(paciente.ficha_medica.atenciones.get().area, self.urgencias)
@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from centrosalud.models.models import (
+    Area, AtencionExamen, AtencionMedica, CentroSalud, ExamenMedico, FichaMedica, Paciente,
+)
+from login.models.models import PerfilUsuario
+
+
+class PatientDetailTimelineTests(TestCase):
+    def setUp(self):
+        hospital = CentroSalud.objects.create(nombre="Hospital Regional", tipo="HOSPITAL")
+        self.area = Area.objects.create(nombre="Urgencias", centro_salud=hospital)
+        self.examen = ExamenMedico.objects.create(nombre_examen="Hemograma")
+        self.medicos = []
+        for i in range(3):
+            medico = User.objects.create(username=f'medico{i}')
+            PerfilUsuario.objects.create(user=medico, tipo='MEDICO', rut=f'1111111{i}-1', centro_salud=hospital)
+            self.medicos.append(medico)
+        self.paciente = Paciente.objects.create(nombre='Ana', apellido1='Gomez', rut='98765432-1',
+                                                fecha_nacimiento='1985-05-05', telefono='111', direccion='Avenida 1')
+        self.ficha = FichaMedica.objects.create(paciente=self.paciente)
+        self.client.force_login(self.medicos[0])
+        self.url = reverse('patient_detail', kwargs={'pk': self.paciente.pk})
+
+    def crear_atenciones(self, cantidad, inicio=0):
+        base = timezone.now() - timedelta(days=365)
+        for i in range(inicio, inicio + cantidad):
+            atencion = AtencionMedica.objects.create(
+                ficha_medica=self.ficha, medico_responsable=self.medicos[i % 3], area=self.area,
+                fecha_entrada=base + timedelta(days=i), diagnostico=f'Diagnostico {i}')
+            AtencionExamen.objects.create(atencion_medica=atencion, examen_medico=self.examen)
+
+    def test_consultas_constantes(self):
+        self.crear_atenciones(2)
+        self.client.get(self.url)
+        with self.assertNumQueries(5):
+            self.client.get(self.url)
+        self.crear_atenciones(40, inicio=2)
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Hemograma', count=20)
+        self.assertContains(response, '11111112-1')
+
+    def test_carga_el_historial_por_paginas(self):
+        self.crear_atenciones(45)
+        response = self.client.get(self.url)
+        atenciones = response.context['atenciones']
+        self.assertEqual(len(atenciones), 20)
+        self.assertEqual(atenciones[0].diagnostico, 'Diagnostico 44')
+        self.assertContains(response, 'Cargar atenciones anteriores')
+
+        pagina = response.context['pagina_atenciones']
+        url = reverse('patient_timeline', kwargs={'pk': self.paciente.pk})
+        fragmento = self.client.get(url, {'after': pagina.next_cursor})
+        self.assertEqual([a.diagnostico for a in fragmento.context['atenciones']][:2],
+                         ['Diagnostico 24', 'Diagnostico 23'])
+        self.assertNotContains(fragmento, '<html')
+
+        ultima = self.client.get(url, {'after': fragmento.context['pagina_atenciones'].next_cursor})
+        self.assertEqual(len(ultima.context['atenciones']), 5)
+        self.assertContains(ultima, 'Diagnostico 0')
+        self.assertNotContains(ultima, 'Cargar atenciones anteriores')
+
+    def test_sin_atenciones(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, 'No hay atenciones registradas')
+        self.assertNotContains(response, 'Cargar atenciones anteriores')
@@ -0,0 +1,70 @@
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from centrosalud.models.models import CentroSalud, Area, Paciente, FichaMedica, AtencionMedica
+from login.models.models import PerfilUsuario
+
+
+class DoctorPatientListTests(TestCase):
+    def setUp(self):
+        self.hospital = CentroSalud.objects.create(nombre="Hospital Regional", tipo="HOSPITAL")
+        self.cesfam = CentroSalud.objects.create(nombre="CESFAM La Florida", tipo="CESFAM")
+        self.area_hospital = Area.objects.create(nombre="Urgencias", centro_salud=self.hospital)
+        self.area_cesfam = Area.objects.create(nombre="Odontologia", centro_salud=self.cesfam)
+
+        self.doctor_user = User.objects.create_user(username='doctor', password='password')
+        PerfilUsuario.objects.create(user=self.doctor_user, tipo='MEDICO', centro_salud=self.hospital)
+        self.client = Client()
+        self.client.login(username='doctor', password='password')
+
+    def crear_pacientes(self, cantidad, area, inicio=0):
+        for i in range(inicio, inicio + cantidad):
+            paciente = Paciente.objects.create(
+                nombre=f'Paciente{i}', apellido1='Prueba', rut=f'{10000000 + i}-0',
+                fecha_nacimiento='1990-01-01', telefono='111', direccion='Calle 1'
+            )
+            ficha = FichaMedica.objects.create(paciente=paciente)
+            AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=self.doctor_user, area=area)
+
+    def test_filtra_por_centro_del_doctor(self):
+        self.crear_pacientes(2, self.area_hospital)
+        self.crear_pacientes(2, self.area_cesfam, inicio=10)
+
+        response = self.client.get(reverse('doctor_patient_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Paciente0')
+        self.assertContains(response, 'Paciente1')
+        self.assertNotContains(response, 'Paciente10')
+        self.assertNotContains(response, 'Paciente11')
+
+    def test_cantidad_de_consultas_no_depende_de_las_filas(self):
+        self.crear_pacientes(3, self.area_hospital)
+        # Sesión, usuario y pacientes; el perfil sale de la caché desde el segundo request
+        self.client.get(reverse('doctor_patient_list'))
+        with self.assertNumQueries(3):
+            self.client.get(reverse('doctor_patient_list'))
+
+        self.crear_pacientes(20, self.area_hospital, inicio=3)
+        with self.assertNumQueries(3):
+            self.client.get(reverse('doctor_patient_list'))
+
+    def test_paginacion_por_cursor(self):
+        self.crear_pacientes(55, self.area_hospital)
+
+        response = self.client.get(reverse('doctor_patient_list'))
+        pagina = response.context['page_obj']
+        self.assertEqual(len(pagina), 50)
+        self.assertTrue(pagina.has_next())
+
+        response = self.client.get(reverse('doctor_patient_list'), {'after': pagina.next_cursor})
+        siguiente = response.context['page_obj']
+        self.assertEqual(len(siguiente), 5)
+        self.assertFalse(siguiente.has_next())
+        ids = [p.pk for p in pagina] + [p.pk for p in siguiente]
+        self.assertEqual(len(set(ids)), 55)
+
+    def test_cursor_invalido_muestra_primera_pagina(self):
+        self.crear_pacientes(2, self.area_hospital)
+        response = self.client.get(reverse('doctor_patient_list'), {'after': 'no-es-un-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['pacientes']), 2)
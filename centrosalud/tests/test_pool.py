@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from ev4 import pool
+
+
+def base_postgresql():
+    return {'ENGINE': 'django.db.backends.postgresql', 'NAME': 'saludmaule', 'CONN_MAX_AGE': 60}
+
+
+class ConfigurarPoolTests(SimpleTestCase):
+    def test_postgresql_con_psycopg_pool(self):
+        databases = {'default': base_postgresql(), 'otra': base_postgresql()}
+        with mock.patch('ev4.pool.find_spec', return_value=object()):
+            pool.configurar_pool(databases, {'default': {'min_size': 2, 'max_size': 10}})
+        self.assertEqual(databases['default']['OPTIONS']['pool'], {'min_size': 2, 'max_size': 10})
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], 0)
+        self.assertTrue(databases['default']['CONN_HEALTH_CHECKS'])
+        # Solo los alias configurados
+        self.assertNotIn('OPTIONS', databases['otra'])
+
+    def test_sin_psycopg_pool_usa_conexiones_persistentes(self):
+        databases = {'default': base_postgresql(), 'local': {'ENGINE': 'django.db.backends.sqlite3'}}
+        with mock.patch('ev4.pool.find_spec', return_value=None):
+            pool.configurar_pool(databases, {'default': {'max_size': 10, 'max_idle': 120}, 'local': {}})
+        self.assertNotIn('OPTIONS', databases['default'])
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], 120)
+        self.assertEqual(databases['local']['CONN_MAX_AGE'], pool.MAX_IDLE)
+        self.assertTrue(databases['local']['CONN_HEALTH_CHECKS'])
+
+
+class MetricasTests(SimpleTestCase):
+    def test_pool(self):
+        stats = {'pool_min': 2, 'pool_max': 10, 'pool_size': 4, 'pool_available': 1, 'requests_waiting': 3,
+                 'requests_num': 8, 'requests_queued': 2, 'requests_wait_ms': 20, 'connections_num': 4,
+                 'connections_ms': 30, 'returns_bad': 1}
+        conexion = SimpleNamespace(pool=mock.Mock(get_stats=mock.Mock(return_value=stats)))
+        with mock.patch('ev4.pool.connections', {'default': conexion}):
+            datos = pool.metricas('default')
+        self.assertEqual((datos['en_uso'], datos['disponibles'], datos['esperando']), (3, 1, 3))
+        self.assertEqual(datos['checkout_promedio_ms'], 2.5)
+        self.assertEqual(datos['conexion_nueva_promedio_ms'], 7.5)
+        self.assertEqual((datos['checkout_errores'], datos['conexiones_descartadas']), (0, 1))
+
+    def test_sin_pool(self):
+        datos = pool.metricas('default')
+        self.assertFalse(datos['pool'])
+        self.assertIn('conn_max_age', datos)
+
+
+class MetricasPoolViewTests(TestCase):
+    def test_solo_staff(self):
+        self.client.force_login(User.objects.create(username='medico'))
+        self.assertEqual(self.client.get(reverse('metricas_pool')).status_code, 403)
+
+        self.client.force_login(User.objects.create(username='admin', is_staff=True))
+        datos = self.client.get(reverse('metricas_pool')).json()
+        self.assertIn('default', [base['alias'] for base in datos['bases']])
@@ -0,0 +1,121 @@
+import time
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from centrosalud.models.models import CentroSalud, FichaMedica, Paciente
+from ev4.routers import EstadoLectura, ReplicaMiddleware, ReplicaRouter, estado_lectura
+from login.models.models import PerfilUsuario
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_fuera_de_un_request_lee_de_la_primaria(self):
+        self.assertIsNone(self.router.db_for_read(Paciente))
+
+    def test_vista_marcada(self):
+        estado = EstadoLectura()
+        token = estado_lectura.set(estado)
+        try:
+            self.assertIsNone(self.router.db_for_read(Paciente))
+            estado.replica = True
+            self.assertEqual(self.router.db_for_read(Paciente), 'replica')
+            # Usuarios, sesiones y perfiles siempre desde la primaria
+            self.assertIsNone(self.router.db_for_read(User))
+            self.assertIsNone(self.router.db_for_read(PerfilUsuario))
+            # Después de escribir, el resto del request lee de la primaria
+            self.assertEqual(self.router.db_for_write(FichaMedica), 'default')
+            self.assertIsNone(self.router.db_for_read(Paciente))
+        finally:
+            estado_lectura.reset(token)
+
+
+def crear_medico_y_paciente():
+    centro = CentroSalud.objects.create(nombre="Hospital Regional", tipo="HOSPITAL")
+    medico = User.objects.create(username='medico')
+    PerfilUsuario.objects.create(user=medico, tipo='MEDICO', centro_salud=centro)
+    paciente = Paciente.objects.create(nombre='Ana', apellido1='Rojas', rut='11111111-1',
+                                       fecha_nacimiento='1990-01-01', telefono='222', direccion='Calle 1')
+    FichaMedica.objects.create(paciente=paciente)
+    return medico, paciente
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaMiddlewareTests(TestCase):
+    # La réplica "elegida" es la misma base: aquí solo importa si el router la eligió
+    def setUp(self):
+        medico, self.paciente = crear_medico_y_paciente()
+        self.client.force_login(medico)
+        parche = mock.patch('ev4.routers.random.choice', return_value='default')
+        self.elegir = parche.start()
+        self.addCleanup(parche.stop)
+
+    def leyo_de_replica(self, nombre, **kwargs):
+        self.elegir.reset_mock()
+        response = self.client.get(reverse(nombre, kwargs=kwargs or None))
+        self.assertEqual(response.status_code, 200)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return self.elegir.called
+
+    def escribir(self):
+        response = self.client.post(reverse('update_ficha', kwargs={'pk': self.paciente.pk}), {'alergias': 'Polen'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_solo_las_vistas_marcadas(self):
+        self.assertTrue(self.leyo_de_replica('doctor_patient_list'))
+        self.assertTrue(self.leyo_de_replica('patient_detail', pk=self.paciente.pk))
+        self.assertFalse(self.leyo_de_replica('update_ficha', pk=self.paciente.pk))
+
+    def test_respuesta_en_streaming(self):
+        # El CSV se genera después de salir del middleware y aun así lee de la réplica
+        director = User.objects.create(username='director')
+        PerfilUsuario.objects.create(user=director, tipo='DIRECTOR')
+        self.client.force_login(director)
+        self.assertTrue(self.leyo_de_replica('director_exportar_atenciones'))
+
+    def test_escribir_fija_la_sesion_a_la_primaria(self):
+        self.escribir()
+        self.assertGreater(self.client.session[ReplicaMiddleware.CLAVE_SESION], time.time())
+        self.assertFalse(self.leyo_de_replica('doctor_patient_list'))
+
+    @override_settings(REPLICA_VENTANA_PRIMARIA=0)
+    def test_la_fijacion_vence(self):
+        self.escribir()
+        self.assertTrue(self.leyo_de_replica('doctor_patient_list'))
+
+    def test_sin_replicas_no_hace_nada(self):
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.escribir()
+            self.assertFalse(self.leyo_de_replica('doctor_patient_list'))
+        self.assertNotIn(ReplicaMiddleware.CLAVE_SESION, self.client.session)
+
+
+@skipUnless('replica' in settings.DATABASES, "Requiere un alias 'replica' en DATABASES (ver ev4/settings_test.py)")
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaSQLiteTests(TransactionTestCase):
+    # Dos conexiones reales: 'replica' es un espejo de prueba de 'default'. El runner
+    # revisa los alias aunque la clase se salte: sin 'replica' no se puede declarar
+    databases = {'default', 'replica'} if 'replica' in settings.DATABASES else {'default'}
+
+    def test_lecturas_van_a_la_replica_hasta_que_la_sesion_escribe(self):
+        medico, paciente = crear_medico_y_paciente()
+        self.client.force_login(medico)
+        url = reverse('patient_detail', kwargs={'pk': paciente.pk})
+
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.assertContains(self.client.get(url), 'Rojas')
+        self.assertTrue(replica.captured_queries)
+
+        self.client.post(reverse('update_ficha', kwargs={'pk': paciente.pk}), {'alergias': 'Polen'})
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.assertContains(self.client.get(url), 'Polen')
+        self.assertEqual(replica.captured_queries, [])
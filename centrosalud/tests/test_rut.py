@@ -0,0 +1,72 @@
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from centrosalud.models.models import CentroSalud, Paciente, FichaMedica
+from centrosalud.rut import calcular_dv, formatear_rut, normalizar_rut
+from login.models.models import PerfilUsuario
+
+
+class RutTests(TestCase):
+    def test_formatos_equivalentes(self):
+        for valor in ("12.345.678-5", "12345678-5", "123456785", " 12345678 5 "):
+            self.assertEqual(normalizar_rut(valor), 12345678)
+        self.assertEqual(normalizar_rut("20.000.003-k"), 20000003)
+
+    def test_digito_verificador(self):
+        self.assertEqual(calcular_dv(11111111), '1')
+        self.assertEqual(calcular_dv(20000003), 'K')
+        self.assertEqual(formatear_rut(12345678), '12345678-5')
+        with self.assertRaises(ValidationError):
+            normalizar_rut("12345678-9")
+        with self.assertRaises(ValidationError):
+            normalizar_rut("abc")
+
+    def test_dv_invalido_queda_sin_rut_numero(self):
+        paciente = Paciente.objects.create(nombre='Ana', apellido1='Soto', rut='12345678-9',
+                                           fecha_nacimiento='1990-01-01', telefono='1', direccion='x')
+        self.assertIsNone(paciente.rut_numero)
+        self.assertFalse(Paciente.objects.por_rut('12345678-9').exists())
+
+
+class AdmissionRutLookupTests(TestCase):
+    def setUp(self):
+        hospital = CentroSalud.objects.create(nombre="Hospital Regional", tipo="HOSPITAL")
+        self.admission_user = User.objects.create_user(username='admission', password='password')
+        PerfilUsuario.objects.create(user=self.admission_user, tipo='INGRESO', centro_salud=hospital)
+        self.paciente = Paciente.objects.create(
+            nombre='Juan', apellido1='Perez', rut='12345678-5',
+            fecha_nacimiento='1990-01-01', telefono='123', direccion='Calle 1'
+        )
+        FichaMedica.objects.create(paciente=self.paciente, estado='EN_ALTA')
+        self.client = Client()
+        self.client.login(username='admission', password='password')
+
+    def test_busqueda_encuentra_cualquier_formato(self):
+        self.assertEqual(self.paciente.rut_numero, 12345678)
+        for valor in ("12.345.678-5", "123456785"):
+            response = self.client.post(reverse('search_patient'), {'rut': valor})
+            self.assertRedirects(response, reverse('register_admission', kwargs={'pk': self.paciente.pk}),
+                                 fetch_redirect_response=False)
+
+    def test_rut_nuevo_redirige_a_creacion_canonica(self):
+        response = self.client.post(reverse('search_patient'), {'rut': '11.111.111-1'})
+        self.assertRedirects(response, reverse('create_patient_with_rut', kwargs={'rut': '11111111-1'}),
+                             fetch_redirect_response=False)
+
+    def test_dv_invalido_no_busca(self):
+        response = self.client.post(reverse('search_patient'), {'rut': '12.345.678-9'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors)
+
+    def test_creacion_no_duplica_rut_existente(self):
+        response = self.client.get(reverse('create_patient_with_rut', kwargs={'rut': '123456785'}))
+        self.assertRedirects(response, reverse('register_admission', kwargs={'pk': self.paciente.pk}),
+                             fetch_redirect_response=False)
+        self.assertEqual(Paciente.objects.count(), 1)
+
+    def test_busqueda_admin_por_rut(self):
+        User.objects.create_superuser(username='admin', password='password')
+        self.client.login(username='admin', password='password')
+        response = self.client.get(reverse('admin:centrosalud_paciente_changelist'), {'q': '12.345.678-5'})
+        self.assertContains(response, '12345678-5')
@@ -1,6 +1,6 @@
 from django.test import TestCase, Client
 from django.contrib.auth.models import User
-from centrosalud.models.models import CentroSalud, Area, Paciente, FichaMedica, AtencionMedica
+from centrosalud.models.models import CentroSalud, Area, AreaCategory, Paciente, FichaMedica, AtencionMedica
 from login.models.models import PerfilUsuario
 from django.urls import reverse
 
@@ -8,7 +8,8 @@ class WorkflowTests(TestCase):
     def setUp(self):
         # Setup Institutions
         self.hospital = CentroSalud.objects.create(nombre="Hospital Regional", tipo="HOSPITAL")
-        self.area_urgencia = Area.objects.create(nombre="Urgencias", centro_salud=self.hospital)
+        categoria = AreaCategory.objects.create(nombre="Areas de Hospital", tipo="HOSPITAL")
+        self.area_urgencia = Area.objects.create(nombre="Urgencias", centro_salud=self.hospital, categoria=categoria)
         
         # Setup Users
         self.doctor_user = User.objects.create_user(username='doctor', password='password')
@@ -25,29 +26,37 @@ class WorkflowTests(TestCase):
     def test_admission_workflow(self):
         self.client.login(username='admission', password='password')
         
-        # 1. Create Patient
-        response = self.client.post(reverse('create_patient'), {
+        # 1. Search Patient (not registered yet)
+        response = self.client.post(reverse('search_patient'), {'rut': '12.345.678-5'})
+        self.assertRedirects(response, reverse('create_patient_with_rut', kwargs={'rut': '12345678-5'}))
+
+        # 2. Create Patient with admission
+        response = self.client.post(reverse('create_patient_with_rut', kwargs={'rut': '12345678-5'}), {
             'nombre': 'Juan',
             'apellido1': 'Perez',
-            'rut': '12345678-9',
             'fecha_nacimiento': '1990-01-01',
             'telefono': '12345678',
-            'direccion': 'Calle Falsa 123'
+            'direccion': 'Calle Falsa 123',
+            'area': self.area_urgencia.id,
+            'medico_responsable': self.doctor_user.id,
+            'motivo_consulta': 'Dolor de cabeza',
         })
         self.assertEqual(response.status_code, 302) # Redirects on success
-        self.assertTrue(Paciente.objects.filter(rut='12345678-9').exists())
-        paciente = Paciente.objects.get(rut='12345678-9')
+        self.assertTrue(Paciente.objects.filter(rut='12345678-5').exists())
+        paciente = Paciente.objects.get(rut='12345678-5')
         self.assertTrue(hasattr(paciente, 'ficha_medica'))
+        self.assertTrue(AtencionMedica.objects.filter(ficha_medica=paciente.ficha_medica).exists())
+        self.assertEqual(paciente.ficha_medica.estado, 'EN_TRATAMIENTO')
 
-        # 2. Register Admission
-        response = self.client.post(reverse('create_admission'), {
-            'ficha_medica': paciente.ficha_medica.id,
+        # 3. Register a new admission after discharge
+        FichaMedica.objects.filter(pk=paciente.ficha_medica.pk).update(estado='EN_ALTA')
+        response = self.client.post(reverse('register_admission', kwargs={'pk': paciente.pk}), {
             'area': self.area_urgencia.id,
-            'motivo_consulta': 'Dolor de cabeza',
+            'motivo_consulta': 'Control',
             'medico_responsable': self.doctor_user.id
         })
         self.assertEqual(response.status_code, 302)
-        self.assertTrue(AtencionMedica.objects.filter(ficha_medica=paciente.ficha_medica).exists())
+        self.assertEqual(AtencionMedica.objects.filter(ficha_medica=paciente.ficha_medica).count(), 2)
         paciente.ficha_medica.refresh_from_db()
         self.assertEqual(paciente.ficha_medica.estado, 'EN_TRATAMIENTO')
 
@@ -55,6 +64,7 @@ class WorkflowTests(TestCase):
         # Setup patient and admission
         paciente = Paciente.objects.create(nombre='Ana', apellido1='Gomez', rut='98765432-1', fecha_nacimiento='1985-05-05', telefono='111', direccion='Avenida 1')
         ficha = FichaMedica.objects.create(paciente=paciente)
+        atencion = AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=self.doctor_user, area=self.area_urgencia)
         
         self.client.login(username='doctor', password='password')
         
@@ -67,14 +77,15 @@ class WorkflowTests(TestCase):
         response = self.client.get(reverse('patient_detail', kwargs={'pk': paciente.pk}))
         self.assertEqual(response.status_code, 200)
 
-        # 3. Create Atencion
-        response = self.client.post(reverse('create_atencion', kwargs={'pk': paciente.pk}), {
-            'motivo_consulta': 'Control',
+        # 3. Update Atencion
+        response = self.client.post(reverse('update_atencion', kwargs={'pk': atencion.pk}), {
             'diagnostico': 'Todo bien',
+            'tratamiento': 'Reposo',
             'area': self.area_urgencia.id
         })
         self.assertEqual(response.status_code, 302)
-        self.assertEqual(AtencionMedica.objects.count(), 1)
+        atencion.refresh_from_db()
+        self.assertEqual(atencion.diagnostico, 'Todo bien')
 
         # 4. Update Status
         response = self.client.post(reverse('update_patient_status', kwargs={'pk': paciente.pk}), {
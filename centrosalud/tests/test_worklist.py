@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from centrosalud.models.models import Area, AtencionMedica, CentroSalud, FichaMedica, Paciente
+from login.models.models import PerfilUsuario
+
+
+class MisPacientesActivosTests(TestCase):
+    def setUp(self):
+        hospital = CentroSalud.objects.create(nombre="Hospital Regional", tipo="HOSPITAL")
+        self.area = Area.objects.create(nombre="Urgencias", centro_salud=hospital)
+        self.doctor = User.objects.create(username='doctor')
+        PerfilUsuario.objects.create(user=self.doctor, tipo='MEDICO', centro_salud=hospital)
+        self.otro_doctor = User.objects.create(username='otro')
+        PerfilUsuario.objects.create(user=self.otro_doctor, tipo='MEDICO', centro_salud=hospital)
+        self.client.force_login(self.doctor)
+        self.inicio = timezone.now() - timedelta(days=30)
+
+    def crear_atenciones(self, cantidad, medico, cerrada=False, inicio=0):
+        for i in range(inicio, inicio + cantidad):
+            paciente = Paciente.objects.create(nombre=f'Paciente{i}', apellido1='Prueba', rut=f'{10000000 + i}-0',
+                                               fecha_nacimiento='1990-01-01', telefono='1', direccion='x')
+            ficha = FichaMedica.objects.create(paciente=paciente)
+            entrada = self.inicio + timedelta(hours=i)
+            AtencionMedica.objects.create(ficha_medica=ficha, medico_responsable=medico, area=self.area,
+                                          fecha_entrada=entrada,
+                                          fecha_salida=entrada + timedelta(hours=1) if cerrada else None)
+
+    def test_solo_atenciones_abiertas_del_medico(self):
+        self.crear_atenciones(2, self.doctor)
+        self.crear_atenciones(2, self.doctor, cerrada=True, inicio=10)
+        self.crear_atenciones(2, self.otro_doctor, inicio=20)
+
+        response = self.client.get(reverse('doctor_worklist'))
+        self.assertEqual(response.status_code, 200)
+        # Las más recientes primero
+        self.assertEqual([a.ficha_medica.paciente.nombre for a in response.context['atenciones']],
+                         ['Paciente1', 'Paciente0'])
+        self.assertContains(response, 'Urgencias')
+
+    def test_una_consulta_sin_importar_la_cantidad(self):
+        self.crear_atenciones(3, self.doctor)
+        self.client.get(reverse('doctor_worklist'))
+        with self.assertNumQueries(3):
+            self.client.get(reverse('doctor_worklist'))
+        self.crear_atenciones(20, self.doctor, inicio=3)
+        with self.assertNumQueries(3):
+            self.client.get(reverse('doctor_worklist'))
+
+    def test_json_paginado(self):
+        self.crear_atenciones(55, self.doctor)
+        datos = self.client.get(reverse('doctor_worklist_json')).json()
+        self.assertEqual(len(datos['resultados']), 50)
+        primero = datos['resultados'][0]
+        self.assertEqual(primero['paciente']['nombre'], 'Paciente54 Prueba')
+        self.assertEqual((primero['estado'], primero['area']), ('EN_TRATAMIENTO', 'Urgencias'))
+
+        resto = self.client.get(reverse('doctor_worklist_json'), {'after': datos['siguiente']}).json()
+        self.assertEqual(len(resto['resultados']), 5)
+        self.assertIsNone(resto['siguiente'])
+        self.assertEqual(resto['resultados'][-1]['paciente']['nombre'], 'Paciente0 Prueba')
+
+    def test_usa_el_indice_parcial(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("El plan de consulta depende del motor")
+        plan = AtencionMedica.objects.activas_de(self.doctor).order_by('-fecha_entrada', '-pk')[:50].explain()
+        self.assertIn('atencion_activa_medico_idx', plan)
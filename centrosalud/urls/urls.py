@@ -1,24 +1,38 @@
 
 from django.urls import path
-from centrosalud.views.views import DashboardView
+from centrosalud.views.views import DashboardView, MetricasPoolView
 from centrosalud.views import doctor_views, director_views, admission_views
 
 urlpatterns = [
     path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('metricas/pool.json', MetricasPoolView.as_view(), name='metricas_pool'),
     
     # Doctor URLs
     path('doctor/patients/', doctor_views.DoctorPatientListView.as_view(), name='doctor_patient_list'),
+    path('doctor/patients/async/', doctor_views.DoctorPatientListAsyncView.as_view(), name='doctor_patient_list_async'),
+    path('doctor/worklist/', doctor_views.MisPacientesActivosView.as_view(), name='doctor_worklist'),
+    path('doctor/worklist.json', doctor_views.MisPacientesActivosJsonView.as_view(), name='doctor_worklist_json'),
     path('doctor/patient/<int:pk>/', doctor_views.PatientDetailView.as_view(), name='patient_detail'),
+    path('doctor/patient/<int:pk>/async/', doctor_views.PatientDetailAsyncView.as_view(), name='patient_detail_async'),
+    path('doctor/patient/<int:pk>/atenciones/', doctor_views.PatientTimelineView.as_view(), name='patient_timeline'),
     path('doctor/atencion/<int:pk>/update/', doctor_views.UpdateAtencionMedicaView.as_view(), name='update_atencion'),
     path('doctor/patient/<int:pk>/update-status/', doctor_views.UpdatePatientStatusView.as_view(), name='update_patient_status'),
     path('doctor/patient/<int:pk>/update-ficha/', doctor_views.UpdateFichaMedicaView.as_view(), name='update_ficha'),
+    path('doctor/search/', doctor_views.BusquedaClinicaView.as_view(), name='clinical_search'),
 
     # Director URLs
     path('director/dashboard/', director_views.DirectorDashboardView.as_view(), name='director_dashboard'),
+    path('director/dashboard/async/', director_views.DirectorDashboardAsyncView.as_view(), name='director_dashboard_async'),
+    path('director/estadias/', director_views.EstadiasView.as_view(), name='director_estadias'),
+    path('director/estadias.json', director_views.EstadiasJsonView.as_view(), name='director_estadias_json'),
+    path('director/atenciones.csv', director_views.ExportarAtencionesView.as_view(), name='director_exportar_atenciones'),
+    path('director/censo.json', director_views.CensoDiarioJsonView.as_view(), name='director_censo_json'),
 
     # Admission URLs
     path('admission/dashboard/', admission_views.AdmissionDashboardView.as_view(), name='admission_dashboard'),
     path('admission/search/', admission_views.SearchOrCreatePatientView.as_view(), name='search_patient'),
     path('admission/create/<str:rut>/', admission_views.CreatePatientWithAdmissionView.as_view(), name='create_patient_with_rut'),
     path('admission/register/<int:pk>/', admission_views.RegisterAdmissionView.as_view(), name='register_admission'),
+    path('admission/batch/', admission_views.BatchAdmissionView.as_view(), name='batch_admission'),
+    path('admission/batch.json', admission_views.BatchAdmissionJsonView.as_view(), name='batch_admission_json'),
 ]
@@ -1,38 +1,63 @@
+import json
+import re
+import uuid
+from collections import Counter
+
+from django.views import View
 from django.views.generic import CreateView, TemplateView, FormView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy
 from django.shortcuts import redirect, get_object_or_404
+from django.db import IntegrityError
+from django.http import Http404, JsonResponse
+from django.utils.functional import cached_property
 from django.contrib import messages
 from centrosalud.models.models import Paciente, FichaMedica, AtencionMedica, Area
 from django.contrib.auth.models import User
 from django import forms
+from django.core.exceptions import ValidationError
+from centrosalud import admision
+from centrosalud.opciones import OpcionCacheadaField, opciones_admision
+from centrosalud.rut import formatear_rut, normalizar_rut
+from login.perfil_cache import perfil_de, rol_de
 
 class AdmissionRequiredMixin(UserPassesTestMixin):
     def test_func(self):
-        return self.request.user.perfil.tipo == 'INGRESO'
+        return rol_de(self.request.user) == 'INGRESO'
 
 class AdmissionDashboardView(LoginRequiredMixin, AdmissionRequiredMixin, TemplateView):
     template_name = 'centrosalud/admission/dashboard.html'
 
 class PatientSearchForm(forms.Form):
-    rut = forms.CharField(max_length=12, label="RUT del Paciente", help_text="Ej: 12345678-9")
+    rut = forms.CharField(max_length=12, label="RUT del Paciente", help_text="Ej: 12345678-5 o 12.345.678-5")
+
+    def clean_rut(self):
+        # Se devuelve el formato canónico para que todas las variantes apunten al mismo paciente
+        return formatear_rut(normalizar_rut(self.cleaned_data['rut']))
+
+def tipo_centro_de(user):
+    # Sin centro asignado (None) se ofrecen todas las áreas
+    perfil = perfil_de(user) if user else None
+    return perfil.centro_tipo if perfil else None
+
+def clave_idempotencia(request):
+    # El formulario reenvía la clave con que se mostró; None si falta o no es válida
+    clave = request.POST.get('clave_idempotencia', '')
+    return clave if re.fullmatch(r'[0-9a-f]{32}', clave) else None
 
 class PatientAdmissionForm(forms.ModelForm):
-    area = forms.ModelChoiceField(queryset=Area.objects.none(), label="Área de Ingreso")
-    medico_responsable = forms.ModelChoiceField(queryset=User.objects.filter(perfil__tipo='MEDICO'), label="Médico Responsable")
+    area = OpcionCacheadaField(Area, label="Área de Ingreso")
+    medico_responsable = OpcionCacheadaField(User, label="Médico Responsable")
     motivo_consulta = forms.CharField(widget=forms.Textarea, label="Motivo de Consulta")
     
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
         
-        if user and hasattr(user, 'perfil') and user.perfil.centro_salud:
-            # Filtrar áreas según el tipo de centro del usuario
-            tipo_centro = user.perfil.centro_salud.tipo
-            self.fields['area'].queryset = Area.objects.filter(categoria__tipo=tipo_centro)
-        else:
-            # Si no tiene centro asignado, mostrar todas
-            self.fields['area'].queryset = Area.objects.all()
+        # Áreas según el tipo de centro del usuario y médicos, desde la caché de opciones
+        opciones = opciones_admision(tipo_centro_de(user))
+        self.fields['area'].usar(opciones['areas'])
+        self.fields['medico_responsable'].usar(opciones['medicos'])
     
     class Meta:
         model = Paciente
@@ -45,7 +70,7 @@ class SearchOrCreatePatientView(LoginRequiredMixin, AdmissionRequiredMixin, Form
     def form_valid(self, form):
         rut = form.cleaned_data['rut']
         try:
-            paciente = Paciente.objects.get(rut=rut)
+            paciente = Paciente.objects.por_rut(rut).select_related('ficha_medica').get()
             
             # Verificar si el paciente tiene una ficha médica
             if hasattr(paciente, 'ficha_medica'):
@@ -77,42 +102,63 @@ class CreatePatientWithAdmissionView(LoginRequiredMixin, AdmissionRequiredMixin,
         kwargs['user'] = self.request.user  # Pasar el usuario al formulario
         return kwargs
     
+    def _verificar_rut(self):
+        try:
+            self.rut = formatear_rut(normalizar_rut(self.kwargs.get('rut')))
+        except ValidationError as error:
+            messages.error(self.request, error.messages[0])
+            return redirect('search_patient')
+        existente = Paciente.objects.por_rut(self.rut).values_list('pk', flat=True).first()
+        if existente:
+            if self.request.method == 'POST':
+                # Reenvío de un formulario que ya creó al paciente
+                previa = admision.ingreso_previo(clave_idempotencia(self.request),
+                                                 Paciente.objects.filter(pk=existente))
+                if previa is not None:
+                    return self._ingresado(previa)
+            # El RUT ya está registrado (quizás escrito en otro formato)
+            return redirect('register_admission', pk=existente)
+        return None
+
+    def get(self, request, *args, **kwargs):
+        return self._verificar_rut() or super().get(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        return self._verificar_rut() or super().post(request, *args, **kwargs)
+
     def get_initial(self):
         initial = super().get_initial()
-        rut = self.kwargs.get('rut')
-        if rut:
-            initial['rut'] = rut
+        initial['rut'] = self.rut
         return initial
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['rut'] = self.kwargs.get('rut', '')
+        context['rut'] = self.rut
+        context['clave_idempotencia'] = clave_idempotencia(self.request) or uuid.uuid4().hex
         return context
     
     def form_valid(self, form):
-        rut = self.kwargs.get('rut')
-        # Crear paciente
-        paciente = Paciente.objects.create(
-            nombre=form.cleaned_data['nombre'],
-            apellido1=form.cleaned_data['apellido1'],
-            apellido2=form.cleaned_data.get('apellido2', ''),
-            rut=rut,
-            fecha_nacimiento=form.cleaned_data['fecha_nacimiento'],
-            telefono=form.cleaned_data['telefono'],
-            direccion=form.cleaned_data['direccion']
-        )
-        
-        # Crear ficha médica
-        ficha = FichaMedica.objects.create(paciente=paciente, estado='EN_TRATAMIENTO')
-        
-        # Crear atención médica
-        AtencionMedica.objects.create(
-            ficha_medica=ficha,
-            medico_responsable=form.cleaned_data['medico_responsable'],
-            area=form.cleaned_data['area'],
-            motivo_consulta=form.cleaned_data['motivo_consulta']
-        )
-        
+        datos = {
+            'nombre': form.cleaned_data['nombre'],
+            'apellido1': form.cleaned_data['apellido1'],
+            'apellido2': form.cleaned_data.get('apellido2', ''),
+            'rut': self.rut,
+            'fecha_nacimiento': form.cleaned_data['fecha_nacimiento'],
+            'telefono': form.cleaned_data['telefono'],
+            'direccion': form.cleaned_data['direccion'],
+        }
+        # Paciente, ficha y atención en una sola transacción
+        try:
+            atencion, _ = admision.crear_paciente_con_ingreso(
+                datos, form.cleaned_data['area'], form.cleaned_data['medico_responsable'],
+                form.cleaned_data['motivo_consulta'], self.request.user, clave_idempotencia(self.request))
+        except admision.IngresoRechazado as error:
+            messages.error(self.request, str(error))
+            return redirect('search_patient')
+        return self._ingresado(atencion)
+
+    def _ingresado(self, atencion):
+        paciente = atencion.ficha_medica.paciente
         messages.success(self.request, f'Paciente {paciente.nombre} {paciente.apellido1} ingresado exitosamente.')
         return redirect('admission_dashboard')
 
@@ -124,20 +170,22 @@ class RegisterAdmissionView(LoginRequiredMixin, AdmissionRequiredMixin, CreateVi
     
     def get_form(self, form_class=None):
         form = super().get_form(form_class)
-        # Filtrar solo médicos
-        form.fields['medico_responsable'].queryset = User.objects.filter(perfil__tipo='MEDICO')
-        
-        # Filtrar áreas según el tipo de centro del usuario
-        if hasattr(self.request.user, 'perfil') and self.request.user.perfil.centro_salud:
-            tipo_centro = self.request.user.perfil.centro_salud.tipo
-            form.fields['area'].queryset = Area.objects.filter(categoria__tipo=tipo_centro)
-        
+        # Solo médicos, y áreas según el tipo de centro del usuario, desde la caché de opciones
+        opciones = opciones_admision(tipo_centro_de(self.request.user))
+        form.fields['area'] = OpcionCacheadaField(Area, opciones['areas'], label=form.fields['area'].label)
+        form.fields['medico_responsable'] = OpcionCacheadaField(
+            User, opciones['medicos'], label=form.fields['medico_responsable'].label)
         return form
     
+    @cached_property
+    def paciente(self):
+        return get_object_or_404(Paciente.objects.select_related('ficha_medica'), pk=self.kwargs['pk'])
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        paciente = get_object_or_404(Paciente, pk=self.kwargs['pk'])
+        paciente = self.paciente
         context['paciente'] = paciente
+        context['clave_idempotencia'] = clave_idempotencia(self.request) or uuid.uuid4().hex
         
         # Verificar estado del paciente
         if hasattr(paciente, 'ficha_medica'):
@@ -150,24 +198,116 @@ class RegisterAdmissionView(LoginRequiredMixin, AdmissionRequiredMixin, CreateVi
         return context
     
     def form_valid(self, form):
-        paciente = get_object_or_404(Paciente, pk=self.kwargs['pk'])
-        ficha, created = FichaMedica.objects.get_or_create(paciente=paciente)
-        
-        # Validar que el paciente esté en alta antes de crear nuevo ingreso
-        if not created and ficha.estado != 'EN_ALTA':
-            estado_display = dict(FichaMedica.ESTADOS_PACIENTE)[ficha.estado]
-            messages.error(
-                self.request,
-                f'No se puede registrar un nuevo ingreso. El paciente {paciente.nombre} {paciente.apellido1} '
-                f'tiene un registro activo en estado: {estado_display}. '
-                f'Debe estar en "En Alta" para permitir un nuevo ingreso.'
-            )
+        # Bloquea la ficha, valida que esté en alta y abre la atención en una sola transacción
+        try:
+            atencion, _ = admision.registrar_ingreso(
+                self.kwargs['pk'], form.cleaned_data['area'], form.cleaned_data['medico_responsable'],
+                form.cleaned_data['motivo_consulta'], self.request.user, clave_idempotencia(self.request))
+        except Paciente.DoesNotExist:
+            raise Http404("Paciente no encontrado")
+        except admision.IngresoRechazado as error:
+            messages.error(self.request, str(error))
             return redirect('admission_dashboard')
-        
-        # Actualizar estado a en tratamiento
-        ficha.estado = 'EN_TRATAMIENTO'
-        ficha.save()
-        
-        form.instance.ficha_medica = ficha
+
+        paciente = atencion.ficha_medica.paciente
         messages.success(self.request, f'Ingreso registrado para {paciente.nombre} {paciente.apellido1}.')
-        return super().form_valid(form)
+        return redirect(self.success_url)
+
+
+# --- Ingreso masivo (eventos con víctimas múltiples) ---
+
+CONCURRENCIA_LOTE = ("Otro ingreso registró a alguno de estos pacientes al mismo tiempo. "
+                     "Reenvíe el lote: los ya ingresados aparecerán como repetidos.")
+
+class BatchAdmissionForm(forms.Form):
+    area = OpcionCacheadaField(Area, label="Área de Ingreso")
+    medico_responsable = OpcionCacheadaField(User, label="Médico Responsable")
+    motivo_consulta = forms.CharField(widget=forms.Textarea, label="Motivo de Consulta")
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+        opciones = opciones_admision(tipo_centro_de(user))
+        self.fields['area'].usar(opciones['areas'])
+        self.fields['medico_responsable'].usar(opciones['medicos'])
+
+class BatchAdmissionTextForm(BatchAdmissionForm):
+    COLUMNAS = ('rut', 'nombre', 'apellido1', 'fecha_nacimiento')
+    pacientes = forms.CharField(
+        widget=forms.Textarea, label="Pacientes",
+        help_text="Uno por línea: RUT; nombre; apellido; fecha de nacimiento. "
+                  "Para pacientes ya registrados basta el RUT.")
+
+    def clean_pacientes(self):
+        filas = [dict(zip(self.COLUMNAS, (valor.strip() for valor in linea.split(';'))))
+                 for linea in self.cleaned_data['pacientes'].splitlines() if linea.strip()]
+        if len(filas) > admision.MAX_FILAS_LOTE:
+            raise ValidationError(f"Máximo {admision.MAX_FILAS_LOTE} pacientes por lote.")
+        return filas
+
+def ejecutar_lote(request, form, filas, clave):
+    datos = form.cleaned_data
+    resultados = admision.ingresar_lote(filas, datos['area'], datos['medico_responsable'],
+                                        datos['motivo_consulta'], request.user, clave)
+    return resultados, Counter(resultado['resultado'] for resultado in resultados)
+
+class BatchAdmissionView(LoginRequiredMixin, AdmissionRequiredMixin, FormView):
+    template_name = 'centrosalud/admission/batch_admission.html'
+    form_class = BatchAdmissionTextForm
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.setdefault('clave_idempotencia', clave_idempotencia(self.request) or uuid.uuid4().hex)
+        context['max_filas'] = admision.MAX_FILAS_LOTE
+        return context
+
+    def form_valid(self, form):
+        try:
+            resultados, totales = ejecutar_lote(self.request, form, form.cleaned_data['pacientes'],
+                                                clave_idempotencia(self.request))
+        except IntegrityError:
+            messages.error(self.request, CONCURRENCIA_LOTE)
+            return self.form_invalid(form)
+        messages.success(self.request, f"{totales['INGRESADO'] + totales['REPETIDO']} de {len(resultados)} "
+                                       f"pacientes ingresados.")
+        # Formulario y clave nuevos para el siguiente lote
+        return self.render_to_response(self.get_context_data(
+            form=self.form_class(user=self.request.user), resultados=resultados,
+            clave_idempotencia=uuid.uuid4().hex))
+
+class BatchAdmissionJsonView(LoginRequiredMixin, AdmissionRequiredMixin, View):
+    """
+    POST con JSON {"area", "medico_responsable", "motivo_consulta", "pacientes": [{"rut", "nombre",
+    "apellido1", "fecha_nacimiento", ...}], "clave_idempotencia"}: un resultado por paciente.
+    """
+
+    def post(self, request):
+        try:
+            datos = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': "JSON inválido."}, status=400)
+        filas = datos.get('pacientes') if isinstance(datos, dict) else None
+        if not isinstance(filas, list) or not filas or not all(isinstance(fila, dict) for fila in filas):
+            return JsonResponse({'error': "'pacientes' debe ser una lista de objetos."}, status=400)
+        if len(filas) > admision.MAX_FILAS_LOTE:
+            return JsonResponse({'error': f"Máximo {admision.MAX_FILAS_LOTE} pacientes por lote."}, status=400)
+        clave = datos.get('clave_idempotencia') or None
+        if clave is not None and not re.fullmatch(r'[\w-]{1,40}', str(clave)):
+            return JsonResponse({'error': "'clave_idempotencia' admite hasta 40 letras, números, - o _."},
+                                status=400)
+        form = BatchAdmissionForm(datos, user=request.user)
+        if not form.is_valid():
+            return JsonResponse({'errores': form.errors}, status=400)
+        try:
+            resultados, totales = ejecutar_lote(request, form, filas, clave)
+        except IntegrityError:
+            return JsonResponse({'error': CONCURRENCIA_LOTE}, status=409)
+        return JsonResponse({
+            'ingresados': totales['INGRESADO'], 'repetidos': totales['REPETIDO'],
+            'rechazados': totales['RECHAZADO'], 'resultados': resultados,
+        })
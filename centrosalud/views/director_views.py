@@ -1,18 +1,181 @@
-from django.views.generic import ListView
+from datetime import date, datetime, time, timedelta
+from functools import partial
+
+from django.http import JsonResponse, StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from django.views import View
+from django.views.generic import ListView, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from centrosalud.models.models import AtencionMedica
+from centrosalud import censo, estadias, exportacion
+from centrosalud.asincrono import VistaAsincrona, reunir
+from centrosalud.models.models import AtencionMedica, ResumenOcupacion
+from login.perfil_cache import perfil_de, rol_de
 
 class DirectorRequiredMixin(UserPassesTestMixin):
     def test_func(self):
-        return self.request.user.perfil.tipo == 'DIRECTOR'
+        return rol_de(self.request.user) == 'DIRECTOR'
 
 class DirectorDashboardView(LoginRequiredMixin, DirectorRequiredMixin, ListView):
+    lectura_replica = True  # solo lee: puede ir a una réplica (ev4/routers.py)
     model = AtencionMedica
     template_name = 'centrosalud/director/dashboard.html'
     context_object_name = 'atenciones'
+    ultimas_atenciones = 25
 
     def get_queryset(self):
-        # Show active attentions (where patient is currently being treated)
         # Requirement: "Como director quiero saber que doctor atiende a cada paciente"
-        # We can filter by active status in FichaMedica or just show latest attentions
-        return AtencionMedica.objects.select_related('ficha_medica__paciente', 'medico_responsable').order_by('-fecha_entrada')
+        return atenciones_activas(perfil_de(self.request.user).centro_salud_id, self.ultimas_atenciones)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        centro_id = perfil_de(self.request.user).centro_salud_id
+        context.update(resumenes(centro_id))
+        context['por_centro'] = bool(centro_id)
+        context['total_activos'] = sum(fila.activos for fila in context['resumen_medicos'])
+        return context
+
+
+def atenciones_activas(centro_id, cantidad):
+    # Solo las atenciones activas más recientes; los totales vienen del resumen pre-agregado
+    queryset = AtencionMedica.objects.filter(fecha_salida__isnull=True)
+    if centro_id:
+        queryset = queryset.filter(area__centro_salud_id=centro_id)
+    return (queryset.select_related('ficha_medica__paciente', 'medico_responsable', 'area')
+            .order_by('-fecha_entrada')[:cantidad])
+
+
+def resumenes(centro_id):
+    resumen = ResumenOcupacion.objects.filter(activos__gt=0)
+    por_centro = resumen.filter(centro_salud_id=centro_id) if centro_id else resumen
+    return {
+        'resumen_areas': por_centro.filter(dimension='AREA').select_related('area').order_by('-activos'),
+        'resumen_medicos': por_centro.filter(dimension='MEDICO').select_related('medico').order_by('-activos'),
+        # Fichas con una atención abierta, por estado; sin centro asignado, una fila por centro
+        'resumen_estados': por_centro.filter(dimension='ESTADO').select_related('centro_salud')
+                                     .order_by('estado', 'centro_salud__nombre'),
+    }
+
+
+class DirectorDashboardAsyncView(VistaAsincrona):
+    """DirectorDashboardView async: las cuatro consultas del dashboard se ejecutan a la vez"""
+    lectura_replica = True
+    rol = 'DIRECTOR'
+
+    async def get(self, request):
+        centro_id = self.perfil.centro_salud_id
+        consultas = {'atenciones': atenciones_activas(centro_id, DirectorDashboardView.ultimas_atenciones),
+                     **resumenes(centro_id)}
+        filas = await reunir(*(partial(list, queryset) for queryset in consultas.values()))
+        context = dict(zip(consultas, filas), view=self, por_centro=bool(centro_id))
+        context['total_activos'] = sum(fila.activos for fila in context['resumen_medicos'])
+        return TemplateResponse(request, DirectorDashboardView.template_name, context)
+
+
+def _fecha(valor):
+    try:
+        return date.fromisoformat(valor) if valor else None
+    except ValueError:
+        return None
+
+
+class PeriodoMixin:
+    """Período ?desde=&hasta= (AAAA-MM-DD); por defecto los últimos ``dias_por_defecto`` días"""
+    dias_por_defecto = 30
+    dias_maximos = 366
+
+    def get_periodo(self):
+        """(desde, hasta), o None si el rango no es válido"""
+        hasta = _fecha(self.request.GET.get('hasta')) or timezone.localdate()
+        desde = _fecha(self.request.GET.get('desde')) or hasta - timedelta(days=self.dias_por_defecto - 1)
+        if desde > hasta or (hasta - desde).days >= self.dias_maximos:
+            return None
+        return desde, hasta
+
+    def periodo_invalido(self):
+        return JsonResponse({'error': f"Rango inválido (máximo {self.dias_maximos} días)."}, status=400)
+
+
+class CensoDiarioJsonView(LoginRequiredMixin, DirectorRequiredMixin, PeriodoMixin, View):
+    """Pacientes por estado en cada día del período"""
+    lectura_replica = True
+
+    def get(self, request):
+        periodo = self.get_periodo()
+        if periodo is None:
+            return self.periodo_invalido()
+        desde, hasta = periodo
+
+        filtros = {}
+        centro_id = perfil_de(request.user).centro_salud_id
+        if centro_id:
+            filtros['centro_salud_id'] = centro_id
+        if request.GET.get('area', '').isdigit():
+            filtros['area_id'] = int(request.GET['area'])
+        dias = [{'fecha': fecha, **conteo} for fecha, conteo in censo.serie(desde, hasta, **filtros)]
+        return JsonResponse({'desde': desde, 'hasta': hasta, 'dias': dias})
+
+
+class EstadiasView(LoginRequiredMixin, DirectorRequiredMixin, PeriodoMixin, TemplateView):
+    """Reporte de tiempo de estadía por área y médico de las altas del período"""
+    lectura_replica = True
+    template_name = 'centrosalud/director/estadias.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        periodo = self.get_periodo()
+        if periodo is None:
+            context['error'] = f"Rango inválido (máximo {self.dias_maximos} días); se muestra el período por defecto."
+            hasta = timezone.localdate()
+            periodo = (hasta - timedelta(days=self.dias_por_defecto - 1), hasta)
+        context['reporte'] = estadias.reporte(*periodo, perfil_de(self.request.user).centro_salud_id)
+        return context
+
+
+class EstadiasJsonView(LoginRequiredMixin, DirectorRequiredMixin, PeriodoMixin, View):
+    """El mismo reporte de estadías en JSON (horas)"""
+    lectura_replica = True
+
+    def get(self, request):
+        periodo = self.get_periodo()
+        if periodo is None:
+            return self.periodo_invalido()
+        return JsonResponse(estadias.reporte(*periodo, perfil_de(request.user).centro_salud_id))
+
+
+class ExportarAtencionesView(LoginRequiredMixin, DirectorRequiredMixin, PeriodoMixin, View):
+    """
+    CSV de las atenciones con entrada en el período, en streaming.
+    Filtros: ?desde=&hasta=, ?area=<id>, ?centro=<id> (solo directores sin centro asignado), ?gzip=1.
+    """
+    lectura_replica = True
+    dias_maximos = 10 * 366
+
+    def get(self, request):
+        periodo = self.get_periodo()
+        if periodo is None:
+            return self.periodo_invalido()
+        desde, hasta = periodo
+        inicio = timezone.make_aware(datetime.combine(desde, time.min))
+        fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+        # Rango y orden por fecha_entrada: recorre el índice atencion_fecha_entrada_idx
+        atenciones = (AtencionMedica.objects.filter(fecha_entrada__gte=inicio, fecha_entrada__lt=fin)
+                      .order_by('fecha_entrada', 'pk'))
+
+        centro_id = perfil_de(request.user).centro_salud_id
+        if not centro_id and request.GET.get('centro', '').isdigit():
+            centro_id = int(request.GET['centro'])
+        if centro_id:
+            atenciones = atenciones.filter(area__centro_salud_id=centro_id)
+        if request.GET.get('area', '').isdigit():
+            atenciones = atenciones.filter(area_id=int(request.GET['area']))
+
+        nombre = f"atenciones_{desde.isoformat()}_{hasta.isoformat()}.csv"
+        contenido = exportacion.lineas_csv(atenciones)
+        if request.GET.get('gzip') == '1':
+            response = StreamingHttpResponse(exportacion.comprimir(contenido), content_type='application/gzip')
+            nombre += '.gz'
+        else:
+            response = StreamingHttpResponse(contenido, content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+        return response
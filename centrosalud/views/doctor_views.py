@@ -1,47 +1,182 @@
-from django.views.generic import ListView, DetailView, UpdateView, CreateView
+from django.views.generic import ListView, DetailView, UpdateView, CreateView, TemplateView, View
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect
-from django.urls import reverse_lazy
-from centrosalud.models.models import Paciente, FichaMedica, AtencionMedica, Area
+from django.urls import reverse, reverse_lazy
+from django.db.models import Exists, OuterRef, Prefetch
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from centrosalud.models.models import Paciente, FichaMedica, AtencionMedica, AtencionExamen, Area
 from login.models.models import PerfilUsuario
+from login.perfil_cache import perfil_de, rol_de
+from centrosalud.pagination import KeysetPaginationMixin, akeyset_paginate, keyset_paginate
+from centrosalud import busqueda
+from centrosalud.asincrono import VistaAsincrona, reunir
 
 class DoctorRequiredMixin(UserPassesTestMixin):
     def test_func(self):
-        return self.request.user.perfil.tipo == 'MEDICO'
+        return rol_de(self.request.user) == 'MEDICO'
 
-class DoctorPatientListView(LoginRequiredMixin, DoctorRequiredMixin, ListView):
+class DoctorPatientListView(LoginRequiredMixin, DoctorRequiredMixin, KeysetPaginationMixin, ListView):
+    lectura_replica = True  # solo lee: puede ir a una réplica (ev4/routers.py)
     model = Paciente
     template_name = 'centrosalud/doctor/patient_list.html'
     context_object_name = 'pacientes'
+    paginate_by = 50
+    keyset_ordering = ('pk',)
 
     def get_queryset(self):
-        # Filter patients by the doctor's hospital/center if needed
-        # For now, showing all patients as per requirement "Como doctor quiero ver todos los pacientes del hospital"
-        # Assuming the doctor sees patients in their assigned center
-        user_profile = self.request.user.perfil
-        if user_profile.centro_salud:
-             # Logic to filter by center could be added here if Paciente had a direct link to CentroSalud
-             # or via FichaMedica -> AtencionMedica -> Area -> CentroSalud
-             pass
-        # Solo mostrar pacientes que tienen ficha médica
-        return Paciente.objects.filter(ficha_medica__isnull=False)
+        return pacientes_del_centro(perfil_de(self.request.user).centro_salud_id)
+
+def pacientes_del_centro(centro_salud_id):
+    # Solo mostrar pacientes que tienen ficha médica; el estado de la ficha
+    # se trae en el mismo JOIN para no consultar por cada fila.
+    queryset = Paciente.objects.filter(ficha_medica__isnull=False).select_related('ficha_medica')
+
+    # El doctor ve los pacientes atendidos en su centro:
+    # FichaMedica -> AtencionMedica -> Area -> CentroSalud
+    if centro_salud_id:
+        atenciones_centro = AtencionMedica.objects.filter(
+            ficha_medica_id=OuterRef('ficha_medica__id'),
+            area__centro_salud_id=centro_salud_id,
+        )
+        queryset = queryset.filter(Exists(atenciones_centro))
+    return queryset
+
+class DoctorPatientListAsyncView(VistaAsincrona):
+    """DoctorPatientListView con el ORM async"""
+    lectura_replica = True
+    rol = 'MEDICO'
+
+    async def get(self, request):
+        pagina = await akeyset_paginate(pacientes_del_centro(self.perfil.centro_salud_id),
+                                        DoctorPatientListView.keyset_ordering, request.GET.get('after'),
+                                        DoctorPatientListView.paginate_by)
+        return TemplateResponse(request, DoctorPatientListView.template_name, {
+            'pacientes': pagina.object_list,
+            'page_obj': pagina,
+            'is_paginated': pagina.has_next() or pagina.has_previous(),
+            'view': self,
+        })
+
+class MisPacientesActivosView(LoginRequiredMixin, DoctorRequiredMixin, KeysetPaginationMixin, ListView):
+    """Lista de trabajo: pacientes con una atención abierta a cargo del médico"""
+    lectura_replica = True
+    template_name = 'centrosalud/doctor/worklist.html'
+    context_object_name = 'atenciones'
+    keyset_ordering = ('-fecha_entrada', '-pk')
+
+    def get_queryset(self):
+        return AtencionMedica.objects.activas_de(self.request.user)
+
+class MisPacientesActivosJsonView(LoginRequiredMixin, DoctorRequiredMixin, View):
+    """La misma lista de trabajo en JSON, paginada con ?after=<cursor>"""
+    lectura_replica = True
+    page_size = 50
+
+    def get(self, request):
+        pagina = keyset_paginate(AtencionMedica.objects.activas_de(request.user),
+                                 MisPacientesActivosView.keyset_ordering, request.GET.get('after'), self.page_size)
+        resultados = []
+        for atencion in pagina:
+            paciente = atencion.ficha_medica.paciente
+            resultados.append({
+                'atencion': atencion.pk,
+                'paciente': {'id': paciente.pk, 'nombre': f"{paciente.nombre} {paciente.apellido1}", 'rut': paciente.rut},
+                'estado': atencion.ficha_medica.estado,
+                'area': atencion.area.nombre if atencion.area else None,
+                'fecha_entrada': atencion.fecha_entrada,
+                'motivo_consulta': atencion.motivo_consulta,
+                'url': reverse('patient_detail', kwargs={'pk': paciente.pk}),
+            })
+        return JsonResponse({'resultados': resultados, 'siguiente': pagina.next_cursor})
+
+def linea_de_tiempo(atenciones, cursor=None, cantidad=20):
+    """
+    Página de atenciones, de la más reciente a la más antigua, con médico, perfil,
+    área y exámenes cargados: siempre 2 consultas, sin importar cuántas filas haya.
+    """
+    examenes = AtencionExamen.objects.select_related('examen_medico').order_by('fecha_solicitud')
+    atenciones = (atenciones.select_related('medico_responsable__perfil', 'area')
+                  .prefetch_related(Prefetch('atencionexamen_set', queryset=examenes, to_attr='examenes')))
+    return keyset_paginate(atenciones, ('-fecha_entrada', '-pk'), cursor, cantidad)
 
 class PatientDetailView(LoginRequiredMixin, DoctorRequiredMixin, DetailView):
+    lectura_replica = True
     model = Paciente
     template_name = 'centrosalud/doctor/patient_detail.html'
     context_object_name = 'paciente'
+    atenciones_por_pagina = 20
+
+    def get_queryset(self):
+        return Paciente.objects.select_related('ficha_medica')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Verificar si el paciente tiene ficha médica
         if hasattr(self.object, 'ficha_medica'):
             context['ficha'] = self.object.ficha_medica
-            context['atenciones'] = self.object.ficha_medica.atenciones.all().order_by('-fecha_entrada')
+            # Solo las más recientes; las anteriores se piden a PatientTimelineView
+            pagina = linea_de_tiempo(self.object.ficha_medica.atenciones.all(), cantidad=self.atenciones_por_pagina)
+            context['pagina_atenciones'] = pagina
+            context['atenciones'] = pagina.object_list
         else:
             context['ficha'] = None
             context['atenciones'] = []
         return context
 
+class PatientDetailAsyncView(VistaAsincrona):
+    """
+    PatientDetailView async: paciente con ficha, atenciones y exámenes salen
+    de tres consultas independientes que se ejecutan a la vez.
+    """
+    lectura_replica = True
+    rol = 'MEDICO'
+
+    async def get(self, request, pk):
+        cantidad = PatientDetailView.atenciones_por_pagina
+        atenciones = AtencionMedica.objects.filter(ficha_medica__paciente_id=pk)
+        # Los exámenes de la misma página de atenciones, sin esperar a que llegue
+        ultimas = atenciones.order_by('-fecha_entrada', '-pk').values('pk')[:cantidad]
+        paciente, pagina, examenes = await reunir(
+            lambda: Paciente.objects.select_related('ficha_medica').filter(pk=pk).first(),
+            lambda: keyset_paginate(atenciones.select_related('medico_responsable__perfil', 'area'),
+                                    ('-fecha_entrada', '-pk'), None, cantidad),
+            lambda: list(AtencionExamen.objects.filter(atencion_medica__in=ultimas)
+                         .select_related('examen_medico').order_by('fecha_solicitud')),
+        )
+        if paciente is None:
+            raise Http404
+        por_atencion = {}
+        for examen in examenes:
+            por_atencion.setdefault(examen.atencion_medica_id, []).append(examen)
+        for atencion in pagina:
+            atencion.examenes = por_atencion.get(atencion.pk, [])
+
+        ficha = getattr(paciente, 'ficha_medica', None)
+        return TemplateResponse(request, PatientDetailView.template_name, {
+            'paciente': paciente,
+            'object': paciente,
+            'ficha': ficha,
+            'pagina_atenciones': pagina if ficha else None,
+            'atenciones': pagina.object_list if ficha else [],
+            'view': self,
+        })
+
+class PatientTimelineView(LoginRequiredMixin, DoctorRequiredMixin, TemplateView):
+    """Fragmento HTML con las siguientes atenciones del historial (?after=<cursor>)"""
+    lectura_replica = True
+    template_name = 'centrosalud/doctor/_timeline_atenciones.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        atenciones = AtencionMedica.objects.filter(ficha_medica__paciente_id=self.kwargs['pk'])
+        pagina = linea_de_tiempo(atenciones, self.request.GET.get('after'), PatientDetailView.atenciones_por_pagina)
+        context['paciente_id'] = self.kwargs['pk']
+        context['pagina_atenciones'] = pagina
+        context['atenciones'] = pagina.object_list
+        return context
+
 class UpdateAtencionMedicaView(LoginRequiredMixin, DoctorRequiredMixin, UpdateView):
     model = AtencionMedica
     fields = ['diagnostico', 'tratamiento', 'area']
@@ -61,6 +196,16 @@ class UpdatePatientStatusView(LoginRequiredMixin, DoctorRequiredMixin, UpdateVie
         paciente = get_object_or_404(Paciente, pk=self.kwargs['pk'])
         return paciente.ficha_medica
 
+    def form_valid(self, form):
+        form.instance._modificado_por = self.request.user  # queda en la TransicionEstado
+        response = super().form_valid(form)
+        # Al dar de alta se cierran las atenciones abiertas del paciente
+        if self.object.estado == 'EN_ALTA':
+            for atencion in self.object.atenciones.filter(fecha_salida__isnull=True):
+                atencion.fecha_salida = timezone.now()
+                atencion.save(update_fields=['fecha_salida'])
+        return response
+
     def get_success_url(self):
         return reverse_lazy('patient_detail', kwargs={'pk': self.kwargs['pk']})
 
@@ -78,3 +223,16 @@ class UpdateFichaMedicaView(LoginRequiredMixin, DoctorRequiredMixin, UpdateView)
     
     def get_success_url(self):
         return reverse_lazy('patient_detail', kwargs={'pk': self.kwargs['pk']})
+
+
+class BusquedaClinicaView(LoginRequiredMixin, DoctorRequiredMixin, TemplateView):
+    """Búsqueda full-text en fichas y atenciones, ordenada por relevancia"""
+    template_name = 'centrosalud/doctor/search.html'
+    limite = 50
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        texto = self.request.GET.get('q', '').strip()
+        context['q'] = texto
+        context['resultados'] = busqueda.buscar(texto, self.limite) if texto else []
+        return context
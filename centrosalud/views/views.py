@@ -1,8 +1,11 @@
+from django.http import JsonResponse
+from django.views import View
 from django.views.generic import TemplateView
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 
 from django.shortcuts import redirect
-from login.models.models import PerfilUsuario
+from ev4 import pool
+from login.perfil_cache import rol_de
 
 class DashboardView(LoginRequiredMixin, TemplateView):
     template_name = "dashboard/dashboard.html"
@@ -11,16 +14,14 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         if not request.user.is_authenticated:
             return super().dispatch(request, *args, **kwargs)
 
-        try:
-            perfil = request.user.perfil
-            if perfil.tipo == 'MEDICO':
-                return redirect('doctor_patient_list')
-            elif perfil.tipo == 'DIRECTOR':
-                return redirect('director_dashboard')
-            elif perfil.tipo == 'INGRESO':
-                return redirect('admission_dashboard')
-        except PerfilUsuario.DoesNotExist:
-            pass # Fallback to default dashboard if no profile
+        # Sin perfil (None) se muestra el dashboard por defecto
+        rol = rol_de(request.user)
+        if rol == 'MEDICO':
+            return redirect('doctor_patient_list')
+        elif rol == 'DIRECTOR':
+            return redirect('director_dashboard')
+        elif rol == 'INGRESO':
+            return redirect('admission_dashboard')
 
         return super().dispatch(request, *args, **kwargs)
 
@@ -28,4 +29,14 @@ class DashboardView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['usuario'] = self.request.user
-        return context
\ No newline at end of file
+        return context
+
+
+class MetricasPoolView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Estado del pool de conexiones de este worker, para dimensionar workers contra la base"""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request):
+        return JsonResponse(pool.metricas_por_alias())
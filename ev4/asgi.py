@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Las vistas async (doctor_patient_list_async, patient_detail_async,
+director_dashboard_async) rinden con un servidor ASGI, p. ej.
+``uvicorn ev4.asgi:application``; ``manage.py benchmark_asgi`` las compara
+con sus versiones síncronas bajo WSGI.
 """
 
 import os
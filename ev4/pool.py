@@ -0,0 +1,78 @@
+"""
+Pool de conexiones por alias de base de datos.
+
+settings.POOL_CONEXIONES indica, por alias, las opciones del pool
+(``min_size``, ``max_size``, ``timeout``, ``max_idle``... las de
+``psycopg_pool.ConnectionPool``). ``configurar_pool`` las aplica a DATABASES:
+
+- PostgreSQL con psycopg_pool instalado: pool nativo de Django
+  (``OPTIONS['pool']``). Con CONN_HEALTH_CHECKS cada conexión se revisa al
+  sacarla del pool y una caída se reemplaza antes de usarla.
+- Sin psycopg_pool u otro motor: conexiones persistentes por hilo
+  (CONN_MAX_AGE = ``max_idle``), también revisadas al inicio de cada request.
+
+``metricas`` entrega el estado del pool de este proceso: cada worker tiene el
+suyo, así que el total de conexiones es ``max_size`` por worker.
+"""
+import os
+from importlib.util import find_spec
+
+from django.conf import settings
+from django.db import connections
+
+MOTOR_POSTGRESQL = 'django.db.backends.postgresql'
+MAX_IDLE = 600  # segundos; el mismo valor por defecto de psycopg_pool
+
+
+def configurar_pool(databases, pools):
+    """Aplica ``pools`` ({alias: opciones}) a ``databases``; devuelve ``databases``."""
+    con_psycopg_pool = find_spec('psycopg_pool') is not None
+    for alias, opciones in pools.items():
+        base = databases[alias]
+        base['CONN_HEALTH_CHECKS'] = True
+        if base['ENGINE'] == MOTOR_POSTGRESQL and con_psycopg_pool:
+            # El pool de Django no admite conexiones persistentes
+            base['CONN_MAX_AGE'] = 0
+            base.setdefault('OPTIONS', {})['pool'] = dict(opciones)
+        else:
+            base['CONN_MAX_AGE'] = opciones.get('max_idle', MAX_IDLE)
+    return databases
+
+
+def _promedio(total, n):
+    return round(total / n, 2) if n else 0.0
+
+
+def metricas(alias):
+    """Estado del pool de ``alias`` en este proceso."""
+    conexion = connections[alias]
+    pool = getattr(conexion, 'pool', None)  # solo el backend de PostgreSQL lo tiene
+    if pool is None:
+        return {
+            'alias': alias,
+            'pool': False,
+            'conn_max_age': conexion.settings_dict['CONN_MAX_AGE'],
+            'conn_health_checks': conexion.settings_dict['CONN_HEALTH_CHECKS'],
+        }
+    # get_stats() omite los contadores en cero
+    stats = pool.get_stats()
+    return {
+        'alias': alias,
+        'pool': True,
+        'min': stats.get('pool_min', 0),
+        'max': stats.get('pool_max', 0),
+        'abiertas': stats.get('pool_size', 0),
+        'en_uso': stats.get('pool_size', 0) - stats.get('pool_available', 0),
+        'disponibles': stats.get('pool_available', 0),
+        'esperando': stats.get('requests_waiting', 0),
+        'checkouts': stats.get('requests_num', 0),
+        'checkouts_en_cola': stats.get('requests_queued', 0),
+        'checkout_promedio_ms': _promedio(stats.get('requests_wait_ms', 0), stats.get('requests_num', 0)),
+        'checkout_errores': stats.get('requests_errors', 0),
+        'conexion_nueva_promedio_ms': _promedio(stats.get('connections_ms', 0), stats.get('connections_num', 0)),
+        'conexiones_descartadas': stats.get('returns_bad', 0) + stats.get('connections_lost', 0),
+    }
+
+
+def metricas_por_alias():
+    return {'pid': os.getpid(), 'bases': [metricas(alias) for alias in settings.DATABASES]}
@@ -0,0 +1,92 @@
+"""
+Router de réplicas de lectura.
+
+Las lecturas de los modelos de centrosalud van a una réplica
+(settings.DATABASE_REPLICAS) solo dentro de un request a una vista marcada con
+``lectura_replica = True``. Todo lo demás usa 'default': escrituras, sesiones,
+usuarios y perfiles (un login recién hecho no puede depender del atraso de la
+réplica), comandos y shell. El estado de cada request vive en una ContextVar
+que maneja ReplicaMiddleware.
+
+Si un request escribe, la sesión queda fijada a la primaria durante
+settings.REPLICA_VENTANA_PRIMARIA segundos, para que el usuario vea sus
+propios cambios aunque la réplica venga atrasada.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+APPS_REPLICADAS = {'centrosalud'}
+
+
+class EstadoLectura:
+    def __init__(self):
+        self.replica = False  # la vista permite leer de una réplica
+        self.escribio = False  # el request ya escribió: desde ahí lee de la primaria
+
+
+estado_lectura = ContextVar('estado_lectura', default=None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        estado = estado_lectura.get()
+        if (estado is None or not estado.replica or estado.escribio
+                or model._meta.app_label not in APPS_REPLICADAS or not settings.DATABASE_REPLICAS):
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        estado = estado_lectura.get()
+        if estado is not None and model._meta.app_label in APPS_REPLICADAS:
+            estado.escribio = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primaria y réplicas tienen los mismos datos
+        return True
+
+
+class ReplicaMiddleware:
+    """Va después de SessionMiddleware: lee y guarda la fijación en la sesión."""
+    CLAVE_SESION = 'primaria_hasta'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        estado = EstadoLectura()
+        token = estado_lectura.set(estado)
+        try:
+            response = self.get_response(request)
+        finally:
+            estado_lectura.reset(token)
+        if estado.escribio:
+            request.session[self.CLAVE_SESION] = time.time() + settings.REPLICA_VENTANA_PRIMARIA
+        elif estado.replica and response.streaming:
+            # El cuerpo se genera después de salir del middleware: cada trozo con el mismo estado
+            response.streaming_content = _con_estado(response.streaming_content, estado)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        estado = estado_lectura.get()
+        vista = getattr(view_func, 'view_class', view_func)
+        if estado is not None and getattr(vista, 'lectura_replica', False):
+            estado.replica = request.session.get(self.CLAVE_SESION, 0) < time.time()
+
+
+def _con_estado(contenido, estado):
+    iterador = iter(contenido)
+    while True:
+        token = estado_lectura.set(estado)
+        try:
+            trozo = next(iterador)
+        except StopIteration:
+            return
+        finally:
+            estado_lectura.reset(token)
+        yield trozo
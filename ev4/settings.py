@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 
+from ev4.pool import configurar_pool
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,10 +45,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'centrosalud.middleware.InstrumentacionSQLMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'ev4.routers.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -63,6 +67,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'login.context_processors.perfil',
             ],
         },
     },
@@ -91,6 +96,35 @@ DATABASES = {
     }
 }
 
+# Pool de conexiones por alias (ver ev4/pool.py). Con psycopg[pool] instalado usa el
+# pool de Django; si no, conexiones persistentes. Cada worker abre hasta max_size:
+# workers * max_size debe quedar bajo max_connections de PostgreSQL.
+POOL_CONEXIONES = {
+    'default': {'min_size': 2, 'max_size': 10, 'timeout': 5},
+}
+configurar_pool(DATABASES, POOL_CONEXIONES)
+
+# Réplicas de lectura (ver ev4/routers.py): alias de DATABASES que reciben las
+# lecturas de las vistas con ``lectura_replica = True``. Vacío: todo va a 'default'.
+# Para probar en local con dos SQLite, una copia de db.sqlite3 hace de réplica atrasada:
+#   DATABASES['replica'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'replica.sqlite3',
+#                           'TEST': {'MIRROR': 'default'}}
+#   DATABASE_REPLICAS = ['replica']
+# ev4/settings_test.py declara ese alias para la suite de pruebas.
+DATABASE_REPLICAS = []
+# Después de escribir, la sesión lee de la primaria durante estos segundos
+REPLICA_VENTANA_PRIMARIA = 10
+DATABASE_ROUTERS = ['ev4.routers.ReplicaRouter']
+
+# Caché. Los perfiles resueltos (login/perfil_cache.py) se invalidan por señales,
+# así que con varios procesos en producción debe ser compartida (Redis, Memcached).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -143,11 +177,38 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
 
+# Instrumentación SQL por request (centrosalud.middleware): header Server-Timing
+# y una línea JSON en el logger 'centrosalud.sql'. En producción, muestrear.
+INSTRUMENTACION_SQL = {
+    'ACTIVA': False,
+    'MUESTREO': 1.0,
+    'UMBRAL_REPETIDAS': 5,
+}
+
 # Configuración para email de recuperación.
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 EMAIL_HOST = 'localhost'
 EMAIL_PORT = 1025
 DEFAULT_FROM_EMAIL = 'noreply@saludmaule.cl'
+
+# Límite de intentos de login y recuperación de contraseña (login/ratelimit.py):
+# (capacidad, segundos para recargar la cubeta) por IP y por cuenta. Detrás de un
+# proxy (nginx), PROXIES = 1 para tomar la IP del cliente de X-Forwarded-For.
+LIMITES_ACCESO = {
+    'PROXIES': 0,
+    'LOGIN_IP': (20, 60),
+    'LOGIN_CUENTA': (5, 300),
+    'RECUPERAR_IP': (5, 300),
+    'RECUPERAR_CUENTA': (3, 3600),
+}
+
+# Cola de tareas (login/tareas.py). Los correos los envía `manage.py procesar_tareas`,
+# por lotes y con una sola conexión SMTP; si el servidor falla se reintenta con espera
+# exponencial (30 s, 60 s, ... hasta 1 h) y tras MAX_INTENTOS la tarea queda FALLIDA.
+TAREAS = {
+    'LOTE': 50,
+    'MAX_INTENTOS': 5,
+}
 # fitixec135@agenra.com
 
 # Para producción (Gmail ejemplo - comentado por ahora):
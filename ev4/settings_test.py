@@ -0,0 +1,17 @@
+"""
+Settings para la suite de pruebas: python manage.py test --settings=ev4.settings_test
+
+Dos SQLite en vez de PostgreSQL, y el alias 'replica' como espejo de prueba de
+'default' para que ReplicaSQLiteTests corra con dos conexiones reales. Las
+réplicas siguen apagadas (DATABASE_REPLICAS vacío): solo las pruebas de
+centrosalud/tests/test_replicas.py las activan con override_settings.
+"""
+from ev4.settings import *  # noqa: F401,F403
+from ev4.settings import BASE_DIR
+
+DATABASES = {
+    'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'db.sqlite3'},
+    'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'replica.sqlite3',
+                'TEST': {'MIRROR': 'default'}},
+}
+DATABASE_REPLICAS = []
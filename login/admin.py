@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Tarea
+
+
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    list_display = ("tipo", "estado", "intentos", "disponible_desde", "creada", "terminada")
+    list_filter = ("estado", "tipo")
+    readonly_fields = ("creada", "terminada", "ultimo_error")
@@ -0,0 +1,8 @@
+from login.perfil_cache import perfil_de
+
+
+def perfil(request):
+    """``perfil_usuario`` en todas las plantillas, desde la caché de perfiles."""
+    if not hasattr(request, 'user'):
+        return {}
+    return {'perfil_usuario': perfil_de(request.user)}
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from login import tareas
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de la cola de tareas (login/tareas.py): procesa lotes de tareas pendientes, con reintentos. "
+        "Por defecto no termina; se pueden correr varios en paralelo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true',
+                            help="Procesa lo disponible y termina (p. ej. desde cron)")
+        parser.add_argument('--lote', type=int, help="Tareas por lote (por defecto TAREAS['LOTE'])")
+        parser.add_argument('--pausa', type=float, default=2.0,
+                            help="Segundos de espera cuando la cola está vacía")
+
+    def handle(self, *args, **options):
+        totales = [0, 0, 0]
+        try:
+            while True:
+                hechas, reintentos, fallidas = tareas.procesar(options['lote'])
+                for i, n in enumerate((hechas, reintentos, fallidas)):
+                    totales[i] += n
+                if hechas or reintentos or fallidas:
+                    self.stdout.write(f"{hechas} hechas, {reintentos} para reintentar, {fallidas} fallidas")
+                    continue
+                if options['una_vez']:
+                    break
+                # Como un request: no dejar conexiones caídas o vencidas entre vueltas
+                close_old_connections()
+                time.sleep(options['pausa'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f"Total: {totales[0]} hechas, {totales[1]} para reintentar, {totales[2]} fallidas."))
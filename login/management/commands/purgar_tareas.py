@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from login.models import Tarea
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las tareas terminadas (HECHA o FALLIDA), que guardan en sus datos el enlace de recuperación, "
+        "en lotes acotados para no bloquear la tabla. Las pendientes no se tocan. Pensado para correr "
+        "periódicamente (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help="Filas borradas por transacción")
+        parser.add_argument('--pausa', type=float, default=0.0, help="Segundos entre lotes")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            ids = list(Tarea.objects.filter(estado__in=('HECHA', 'FALLIDA'))
+                       .values_list('pk', flat=True)[:options['lote']])
+            if not ids:
+                break
+            total += Tarea.objects.filter(pk__in=ids).delete()[0]
+            if len(ids) < options['lote']:
+                break
+            time.sleep(options['pausa'])
+        self.stdout.write(self.style.SUCCESS(f"{total} tareas terminadas purgadas."))
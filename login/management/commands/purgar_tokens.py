@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from login.models import PasswordResetToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra los tokens de recuperación usados o vencidos, en lotes acotados para no bloquear la tabla "
+        "ni generar una sola transacción enorme. Pensado para correr periódicamente (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help="Filas borradas por transacción")
+        parser.add_argument('--pausa', type=float, default=0.0, help="Segundos entre lotes")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            ids = list(PasswordResetToken.objects.caducados()
+                       .values_list('pk', flat=True)[:options['lote']])
+            if not ids:
+                break
+            total += PasswordResetToken.objects.filter(pk__in=ids).delete()[0]
+            if len(ids) < options['lote']:
+                break
+            time.sleep(options['pausa'])
+        self.stdout.write(self.style.SUCCESS(f"{total} tokens purgados."))
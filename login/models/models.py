@@ -1,25 +1,46 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from centrosalud.models import CentroSalud
 from django.utils import timezone
 import uuid
 from datetime import timedelta
 
+class PasswordResetTokenQuerySet(models.QuerySet):
+    # Vigencia en SQL (índice token_uso_creacion_idx), no con is_valid() fila a fila
+    def vigentes(self):
+        return self.filter(used=False, created_at__gt=timezone.now() - PasswordResetToken.VIGENCIA)
+
+    def caducados(self):
+        return self.filter(models.Q(used=True) | models.Q(created_at__lte=timezone.now() - PasswordResetToken.VIGENCIA))
+
+    def emitir(self, user):
+        """Token nuevo para ``user``; los anteriores sin usar dejan de servir."""
+        with transaction.atomic():
+            self.filter(user=user, used=False).update(used=True)
+            return self.create(user=user)
+
+
 class PasswordResetToken(models.Model):
+    VIGENCIA = timedelta(hours=1)
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     used = models.BooleanField(default=False)
+
+    objects = PasswordResetTokenQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Token de Recuperación"
         verbose_name_plural = "Tokens de Recuperación"
-        
+        indexes = [
+            models.Index(fields=['used', 'created_at'], name='token_uso_creacion_idx'),
+        ]
         
     
     def is_valid(self):
         """Verifica si el token es válido (menos de 1 hora y no usado)"""
-        expiration_time = self.created_at + timedelta(hours=1)
+        expiration_time = self.created_at + self.VIGENCIA
         return not self.used and timezone.now() < expiration_time
     
     def __str__(self):
@@ -48,6 +69,35 @@ class PerfilUsuario(models.Model):
  
 
 
+class Tarea(models.Model):
+    """
+    Trabajo en segundo plano (correo, etc.) que ejecuta ``manage.py procesar_tareas``.
+    Mientras un worker la procesa sigue PENDIENTE con ``disponible_desde`` en el
+    futuro: si el worker muere, otro la toma cuando vence ese plazo. Ver login/tareas.py.
+    """
+    ESTADOS = [
+        ('PENDIENTE', 'Pendiente'),
+        ('HECHA', 'Hecha'),
+        ('FALLIDA', 'Fallida'),
+    ]
+    tipo = models.CharField(max_length=50)
+    datos = models.JSONField(default=dict)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default='PENDIENTE')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=5)
+    disponible_desde = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    creada = models.DateTimeField(auto_now_add=True)
+    terminada = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        verbose_name = "Tarea"
+        verbose_name_plural = "Tareas"
+        indexes = [
+            # Lo único que busca el worker: pendientes ya disponibles, las más antiguas primero
+            models.Index(fields=['disponible_desde'], condition=models.Q(estado='PENDIENTE'),
+                         name='tarea_pendiente_idx'),
+        ]
 
-
+    def __str__(self):
+        return f"{self.tipo} #{self.pk} ({self.estado})"
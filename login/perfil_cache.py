@@ -0,0 +1,66 @@
+"""
+Rol y centro de salud del usuario, resueltos una vez y guardados en caché.
+
+Las vistas y plantillas preguntan por el tipo de usuario y su centro en cada
+request; en vez de leer ``user.perfil`` (y ``perfil.centro_salud``) desde la
+base, se guarda un resumen en la caché de Django con clave por usuario y una
+versión global. Guardar o borrar un PerfilUsuario borra su entrada; cambiar un
+CentroSalud sube la versión global (ver login/signals.py).
+"""
+from django.core.cache import cache
+
+from login.models.models import PerfilUsuario
+
+CLAVE_VERSION = 'perfil:version'
+DURACION = 60 * 60
+
+
+class PerfilResuelto:
+    def __init__(self, tipo, centro_salud_id=None, centro_nombre=None, centro_tipo=None):
+        self.tipo = tipo
+        self.centro_salud_id = centro_salud_id
+        self.centro_nombre = centro_nombre
+        self.centro_tipo = centro_tipo
+
+    def __repr__(self):
+        return f"<PerfilResuelto {self.tipo} centro={self.centro_salud_id}>"
+
+
+def _clave(user_id):
+    version = cache.get_or_set(CLAVE_VERSION, 1, None)
+    return f'perfil:{version}:{user_id}'
+
+
+def perfil_de(user):
+    """PerfilResuelto del usuario, o None si es anónimo o no tiene perfil."""
+    if not user.is_authenticated:
+        return None
+    # Dentro del mismo request el resultado queda en el propio objeto user
+    if hasattr(user, '_perfil_resuelto'):
+        return user._perfil_resuelto
+
+    clave = _clave(user.pk)
+    datos = cache.get(clave)
+    if datos is None:
+        fila = (PerfilUsuario.objects.filter(user_id=user.pk)
+                .values_list('tipo', 'centro_salud_id', 'centro_salud__nombre', 'centro_salud__tipo').first())
+        datos = fila or ()  # la tupla vacía marca "sin perfil" y también se guarda
+        cache.set(clave, datos, DURACION)
+    user._perfil_resuelto = PerfilResuelto(*datos) if datos else None
+    return user._perfil_resuelto
+
+
+def rol_de(user):
+    perfil = perfil_de(user)
+    return perfil.tipo if perfil else None
+
+
+def invalidar(user_id):
+    cache.delete(_clave(user_id))
+
+
+def invalidar_todos():
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, 2, None)
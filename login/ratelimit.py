@@ -0,0 +1,92 @@
+"""
+Límite de intentos (token bucket) para login y recuperación de contraseña.
+
+Cada regla es una cubeta de ``capacidad`` fichas que se recarga entera en
+``periodo`` segundos; cada intento gasta una ficha y sin fichas el request se
+rechaza con 429 antes de tocar la base o calcular un hash. Hay cubetas por IP
+(ráfagas desde un origen) y por cuenta (credential stuffing repartido entre
+muchas IP). El estado vive en la caché de Django: con varios procesos debe ser
+compartida (ver CACHES en settings). get/set no es atómico, así que bajo mucha
+concurrencia puede pasar algún intento de más; el límite sigue acotado.
+
+Los rechazos se cuentan por regla (``contadores``).
+"""
+import hashlib
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger('login.ratelimit')
+
+DEFAULTS = {
+    'ACTIVO': True,
+    'PROXIES': 0,  # proxies de confianza delante de Django: la IP real sale de X-Forwarded-For
+    # regla: (capacidad, segundos para recargar la cubeta completa)
+    'LOGIN_IP': (20, 60),
+    'LOGIN_CUENTA': (5, 300),
+    'RECUPERAR_IP': (5, 300),
+    'RECUPERAR_CUENTA': (3, 3600),
+}
+REGLAS = ('LOGIN_IP', 'LOGIN_CUENTA', 'RECUPERAR_IP', 'RECUPERAR_CUENTA')
+
+
+def configuracion():
+    return {**DEFAULTS, **getattr(settings, 'LIMITES_ACCESO', {})}
+
+
+def ip_de(request):
+    proxies = configuracion()['PROXIES']
+    if proxies:
+        reenviadas = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        # Cada proxy agrega la IP de quien le habló: las últimas `proxies` entradas son confiables
+        if len(reenviadas) >= proxies:
+            return reenviadas[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _clave_contador(regla):
+    return f'limite:rechazos:{regla}'
+
+
+def _gastar(regla, clave, config):
+    """Gasta una ficha de la cubeta; devuelve 0 o los segundos hasta que haya una."""
+    capacidad, periodo = config[regla]
+    tasa = capacidad / periodo
+    llave = f'limite:{regla}:' + hashlib.sha256(clave.encode()).hexdigest()[:32]
+    ahora = time.time()
+    fichas, ultimo = cache.get(llave, (capacidad, ahora))
+    fichas = min(capacidad, fichas + (ahora - ultimo) * tasa)
+    if fichas < 1:
+        return math.ceil((1 - fichas) / tasa)
+    cache.set(llave, (fichas - 1, ahora), periodo)
+    return 0
+
+
+def consumir(*reglas):
+    """
+    ``reglas`` son pares (regla, clave), p. ej. ('LOGIN_IP', ip). Se revisan en
+    orden y se detiene en la primera sin fichas. Devuelve 0 si el intento pasa o
+    los segundos que hay que esperar.
+    """
+    config = configuracion()
+    if not config['ACTIVO']:
+        return 0
+    for regla, clave in reglas:
+        if not clave:
+            continue
+        espera = _gastar(regla, clave, config)
+        if espera:
+            cache.add(_clave_contador(regla), 0, None)
+            cache.incr(_clave_contador(regla))
+            logger.warning("Límite %s alcanzado (reintentar en %s s)", regla, espera)
+            return espera
+    return 0
+
+
+def contadores():
+    """Rechazos por regla desde que se creó la caché."""
+    guardados = cache.get_many([_clave_contador(regla) for regla in REGLAS])
+    return {regla: guardados.get(_clave_contador(regla), 0) for regla in REGLAS}
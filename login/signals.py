@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from centrosalud.models.models import CentroSalud
+from login import perfil_cache
+from login.models.models import PerfilUsuario
+
+
+@receiver([post_save, post_delete], sender=PerfilUsuario)
+def perfil_invalidar(sender, instance, **kwargs):
+    perfil_cache.invalidar(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=CentroSalud)
+def centro_invalidar(sender, instance, **kwargs):
+    # El nombre y el tipo del centro van dentro de cada perfil en caché
+    perfil_cache.invalidar_todos()
@@ -0,0 +1,155 @@
+"""
+Cola de tareas en la base de datos.
+
+Los requests no esperan efectos lentos (SMTP y similares): ``encolar`` guarda
+una Tarea dentro de la transacción de quien la llama (la recuperación de
+contraseña la guarda en un ``atomic()`` junto al token) y ``manage.py
+procesar_tareas`` las ejecuta. Un worker reclama un lote con ``select_for_update(skip_locked)``
+(en PostgreSQL varios workers no se pisan), lo deja bloqueado hasta
+``disponible_desde = ahora + BLOQUEO`` y lo entrega al manejador de su tipo.
+Si falla se reintenta con espera exponencial; después de ``max_intentos``
+queda FALLIDA con el último error. Las terminadas (HECHA o FALLIDA) las borra
+``manage.py purgar_tareas``: sus datos pueden llevar un enlace de recuperación.
+
+Los manejadores se registran con ``@registrar(tipo)``. Con ``por_lotes=True``
+reciben todas las tareas del lote juntas y devuelven un error (o None) por
+cada una: así los correos salen por una sola conexión SMTP.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from login.models import Tarea
+
+logger = logging.getLogger('login.tareas')
+
+DEFAULTS = {
+    'LOTE': 50,             # tareas reclamadas por vuelta
+    'BLOQUEO': 300,         # segundos que una tarea reclamada queda fuera del alcance de otros workers
+    'ESPERA_BASE': 30,      # primer reintento; luego se duplica
+    'ESPERA_MAXIMA': 3600,
+    'MAX_INTENTOS': 5,
+}
+
+_manejadores = {}
+
+
+def configuracion():
+    return {**DEFAULTS, **getattr(settings, 'TAREAS', {})}
+
+
+def registrar(tipo, por_lotes=False):
+    def decorador(funcion):
+        _manejadores[tipo] = (funcion, por_lotes)
+        return funcion
+    return decorador
+
+
+def encolar(tipo, datos, max_intentos=None):
+    if tipo not in _manejadores:
+        raise ValueError(f"Tipo de tarea desconocido: {tipo}")
+    return Tarea.objects.create(tipo=tipo, datos=datos,
+                                max_intentos=max_intentos or configuracion()['MAX_INTENTOS'])
+
+
+def espera(intentos):
+    """Segundos hasta el siguiente intento, después de ``intentos`` fallidos."""
+    config = configuracion()
+    return min(config['ESPERA_BASE'] * 2 ** (intentos - 1), config['ESPERA_MAXIMA'])
+
+
+def reclamar(limite=None):
+    """Toma hasta ``limite`` tareas disponibles y las bloquea para este worker."""
+    config = configuracion()
+    ahora = timezone.now()
+    with transaction.atomic():
+        tareas = list(Tarea.objects.select_for_update(skip_locked=True)
+                      .filter(estado='PENDIENTE', disponible_desde__lte=ahora)
+                      .order_by('disponible_desde')[:limite or config['LOTE']])
+        for tarea in tareas:
+            tarea.intentos += 1
+            tarea.disponible_desde = ahora + timedelta(seconds=config['BLOQUEO'])
+        Tarea.objects.bulk_update(tareas, ['intentos', 'disponible_desde'])
+    return tareas
+
+
+def _ejecutar(tipo, tareas):
+    funcion, por_lotes = _manejadores[tipo]
+    if por_lotes:
+        try:
+            return funcion(tareas)
+        except Exception as error:
+            return [error] * len(tareas)
+    errores = []
+    for tarea in tareas:
+        try:
+            funcion(tarea.datos)
+            errores.append(None)
+        except Exception as error:
+            errores.append(error)
+    return errores
+
+
+def procesar(limite=None):
+    """Procesa un lote. Devuelve (hechas, reintentos, fallidas)."""
+    por_tipo = {}
+    for tarea in reclamar(limite):
+        por_tipo.setdefault(tarea.tipo, []).append(tarea)
+
+    hechas, reintentos, fallidas = [], [], []
+    ahora = timezone.now()
+    for tipo, tareas in por_tipo.items():
+        if tipo not in _manejadores:
+            errores = [ValueError(f"Tipo de tarea desconocido: {tipo}")] * len(tareas)
+        else:
+            errores = _ejecutar(tipo, tareas)
+        for tarea, error in zip(tareas, errores):
+            if error is None:
+                tarea.estado, tarea.terminada = 'HECHA', ahora
+                hechas.append(tarea)
+                continue
+            tarea.ultimo_error = f"{type(error).__name__}: {error}"
+            if tarea.intentos >= tarea.max_intentos:
+                tarea.estado, tarea.terminada = 'FALLIDA', ahora
+                fallidas.append(tarea)
+                logger.error("Tarea %s falló definitivamente: %s", tarea, tarea.ultimo_error)
+            else:
+                tarea.disponible_desde = ahora + timedelta(seconds=espera(tarea.intentos))
+                reintentos.append(tarea)
+                logger.warning("Tarea %s falló (intento %s): %s", tarea, tarea.intentos, tarea.ultimo_error)
+
+    Tarea.objects.bulk_update(hechas + reintentos + fallidas,
+                              ['estado', 'terminada', 'ultimo_error', 'disponible_desde'])
+    return len(hechas), len(reintentos), len(fallidas)
+
+
+# Correo
+
+def encolar_correo(asunto, cuerpo, destinatarios, remitente=None):
+    return encolar('correo', {
+        'asunto': asunto,
+        'cuerpo': cuerpo,
+        'destinatarios': list(destinatarios),
+        'remitente': remitente or settings.DEFAULT_FROM_EMAIL,
+    })
+
+
+@registrar('correo', por_lotes=True)
+def enviar_correos(tareas):
+    """Envía el lote por una sola conexión; un correo rechazado no detiene a los demás."""
+    errores = []
+    with get_connection(fail_silently=False) as conexion:
+        for tarea in tareas:
+            datos = tarea.datos
+            mensaje = EmailMessage(datos['asunto'], datos['cuerpo'], datos['remitente'], datos['destinatarios'],
+                                   connection=conexion)
+            try:
+                mensaje.send()
+                errores.append(None)
+            except Exception as error:
+                errores.append(error)
+    return errores
@@ -1,3 +1,378 @@
-from django.test import TestCase
+import smtplib
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser, Permission, User
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from centrosalud.models import CentroSalud
+from login import ratelimit, tareas
+from login.models import PasswordResetToken, PerfilUsuario, Tarea
+from login.perfil_cache import perfil_de, rol_de
+
+
+class ListaUsuariosTests(TestCase):
+    def setUp(self):
+        self.centro = CentroSalud.objects.create(nombre="Hospital Regional", tipo="HOSPITAL")
+        self.otro_centro = CentroSalud.objects.create(nombre="CESFAM Norte", tipo="CESFAM")
+        self.admin = User.objects.create_user(username='admin', password='password')
+        self.admin.user_permissions.add(Permission.objects.get(codename='change_perfilusuario'))
+        medicos = User.objects.bulk_create([User(username=f'medico{i:02d}') for i in range(60)])
+        PerfilUsuario.objects.bulk_create([
+            PerfilUsuario(user=usuario, tipo='MEDICO', centro_salud=self.centro if i % 2 else self.otro_centro)
+            for i, usuario in enumerate(medicos)
+        ])
+        self.client.login(username='admin', password='password')
+
+    def test_consultas_constantes_y_paginacion(self):
+        with self.assertNumQueries(7):  # 5 y los permisos del usuario y de sus grupos
+            response = self.client.get(reverse('lista_usuarios'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['usuarios']), 50)
+        self.assertTrue(response.context['page_obj'].has_next())
+        # Sin formularios por fila: ni un <select> de centros por usuario
+        self.assertNotContains(response, 'name="centro_salud"')
+
+        siguiente = self.client.get(reverse('lista_usuarios'), {'after': response.context['page_obj'].next_cursor})
+        self.assertEqual(len(siguiente.context['usuarios']), 11)
+        # Los usuarios sin perfil se listan igual, sin crearles uno
+        self.assertContains(siguiente, 'admin')
+        self.assertFalse(PerfilUsuario.objects.filter(user=self.admin).exists())
+
+    def test_filtros(self):
+        response = self.client.get(reverse('lista_usuarios'), {'q': 'medico1', 'centro': self.centro.pk})
+        nombres = [u.username for u in response.context['usuarios']]
+        self.assertEqual(nombres, ['medico11', 'medico13', 'medico15', 'medico17', 'medico19'])
+        self.assertIn('centro=', response.context['filtros'])
+
+        response = self.client.get(reverse('lista_usuarios'), {'tipo': 'DIRECTOR'})
+        self.assertEqual(list(response.context['usuarios']), [])
+
+    def test_formulario_a_pedido(self):
+        medico = User.objects.get(username='medico01')
+        response = self.client.get(reverse('formulario_usuario', kwargs={'pk': medico.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'name="centro_salud"')
+        self.assertContains(response, reverse('editar_usuario', kwargs={'pk': medico.pk}))
+        self.assertNotContains(response, '<html')
+
+        response = self.client.post(reverse('formulario_usuario', kwargs={'pk': medico.pk}), {'tipo': 'DIRECTOR'})
+        self.assertEqual(response.status_code, 405)
+
+    def test_gestion_requiere_permiso(self):
+        medico = User.objects.get(username='medico01')
+        urls = [reverse('lista_usuarios'), reverse('editar_usuario', kwargs={'pk': medico.pk}),
+                reverse('formulario_usuario', kwargs={'pk': medico.pk})]
+        User.objects.create_user(username='sin_permiso', password='password')
+        self.client.login(username='sin_permiso', password='password')
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 403)
+        # Sin permiso tampoco se puede cambiar un rol
+        response = self.client.post(urls[1], {'tipo': 'DIRECTOR', 'rut': '', 'centro_salud': self.centro.pk})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(PerfilUsuario.objects.get(user=medico).tipo, 'MEDICO')
+
+    def test_gestion_requiere_sesion(self):
+        medico = User.objects.get(username='medico01')
+        self.client.logout()
+        for url in [reverse('lista_usuarios'), reverse('editar_usuario', kwargs={'pk': medico.pk}),
+                    reverse('formulario_usuario', kwargs={'pk': medico.pk})]:
+            with self.subTest(url=url):
+                self.assertRedirects(self.client.get(url), f"{reverse('login')}?next={url}",
+                                     fetch_redirect_response=False)
+        response = self.client.post(reverse('editar_usuario', kwargs={'pk': medico.pk}), {'tipo': 'DIRECTOR'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(PerfilUsuario.objects.get(user=medico).tipo, 'MEDICO')
+
+    def test_formulario_no_crea_perfil(self):
+        response = self.client.get(reverse('formulario_usuario', kwargs={'pk': self.admin.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(PerfilUsuario.objects.filter(user=self.admin).exists())
+        # Se crea al guardar
+        self.client.post(reverse('editar_usuario', kwargs={'pk': self.admin.pk}),
+                         {'tipo': 'DIRECTOR', 'rut': '', 'centro_salud': self.centro.pk})
+        self.assertEqual(PerfilUsuario.objects.get(user=self.admin).tipo, 'DIRECTOR')
+
+    def test_editar_usuario(self):
+        medico = User.objects.get(username='medico01')
+        response = self.client.post(reverse('editar_usuario', kwargs={'pk': medico.pk}),
+                                    {'tipo': 'DIRECTOR', 'rut': '', 'centro_salud': self.otro_centro.pk})
+        self.assertRedirects(response, reverse('lista_usuarios'), fetch_redirect_response=False)
+        medico.perfil.refresh_from_db()
+        self.assertEqual(medico.perfil.tipo, 'DIRECTOR')
+        self.assertEqual(medico.perfil.centro_salud, self.otro_centro)
+
+
+class PerfilCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.centro = CentroSalud.objects.create(nombre="Hospital Regional", tipo="HOSPITAL")
+        self.usuario = User.objects.create(username='medico')
+        self.perfil = PerfilUsuario.objects.create(user=self.usuario, tipo='MEDICO', centro_salud=self.centro)
+
+    def resolver(self):
+        # Un objeto User nuevo por llamada, como en cada request
+        return perfil_de(User.objects.get(pk=self.usuario.pk))
+
+    def test_una_consulta_y_luego_cache(self):
+        usuario = User.objects.get(pk=self.usuario.pk)
+        with self.assertNumQueries(1):
+            perfil = perfil_de(usuario)
+            perfil_de(usuario)
+        self.assertEqual((perfil.tipo, perfil.centro_salud_id, perfil.centro_tipo),
+                         ('MEDICO', self.centro.pk, 'HOSPITAL'))
+        usuario = User.objects.get(pk=self.usuario.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(rol_de(usuario), 'MEDICO')
+
+    def test_invalidacion_al_guardar_perfil_y_centro(self):
+        self.resolver()
+        self.perfil.tipo = 'DIRECTOR'
+        self.perfil.save()
+        self.assertEqual(self.resolver().tipo, 'DIRECTOR')
+
+        self.centro.nombre = "Hospital de Talca"
+        self.centro.save()
+        self.assertEqual(self.resolver().centro_nombre, "Hospital de Talca")
+
+        self.perfil.delete()
+        self.assertIsNone(self.resolver())
+        PerfilUsuario.objects.create(user=self.usuario, tipo='INGRESO')
+        self.assertEqual(self.resolver().tipo, 'INGRESO')
+
+    def test_sin_perfil_y_anonimo(self):
+        sin_perfil = User.objects.create(username='sinperfil')
+        self.assertIsNone(perfil_de(sin_perfil))
+        self.assertIsNone(rol_de(AnonymousUser()))
+
+        self.client.force_login(sin_perfil)
+        response = self.client.get(reverse('doctor_patient_list'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_dashboard_redirige_sin_consultar_perfil(self):
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('dashboard'))
+        # Sesión y usuario; el perfil ya está en caché
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('dashboard'))
+        self.assertRedirects(response, reverse('doctor_patient_list'), fetch_redirect_response=False)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class ColaTareasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user(username='ana', email='ana@example.com', password='password')
+
+    def test_recuperar_contrasena_solo_encola(self):
+        response = self.client.post(reverse('password_reset'), {'email': 'ana@example.com'})
+        self.assertRedirects(response, reverse('password_reset_done'))
+        self.assertEqual(mail.outbox, [])
+        tarea = Tarea.objects.get()
+        self.assertEqual((tarea.tipo, tarea.datos['destinatarios']), ('correo', ['ana@example.com']))
+
+        call_command('procesar_tareas', '--una-vez', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        token = PasswordResetToken.objects.get(user=self.usuario)
+        self.assertIn(str(token.token), mail.outbox[0].body)
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), ('HECHA', 1))
+
+    def test_lote_por_una_sola_conexion(self):
+        for i in range(3):
+            tareas.encolar_correo(f'Aviso {i}', 'Cuerpo', [f'persona{i}@example.com'])
+        with mock.patch('login.tareas.get_connection', wraps=get_connection) as conexion:
+            self.assertEqual(tareas.procesar(), (3, 0, 0))
+        self.assertEqual(conexion.call_count, 1)
+        self.assertEqual([m.subject for m in mail.outbox], ['Aviso 0', 'Aviso 1', 'Aviso 2'])
+
+    def test_reintentos_con_espera_exponencial(self):
+        tarea = tareas.encolar_correo('Aviso', 'Cuerpo', ['ana@example.com'])
+        tarea.max_intentos = 3
+        tarea.save()
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=ConnectionRefusedError('SMTP caído')), self.assertLogs('login.tareas') as logs:
+            self.assertEqual(tareas.procesar(), (0, 1, 0))
+            tarea.refresh_from_db()
+            self.assertEqual((tarea.estado, tarea.intentos), ('PENDIENTE', 1))
+            self.assertIn('SMTP caído', tarea.ultimo_error)
+            self.assertAlmostEqual((tarea.disponible_desde - timezone.now()).total_seconds(), 30, delta=5)
+            # Aún no vence la espera
+            self.assertEqual(tareas.procesar(), (0, 0, 0))
+
+            Tarea.objects.update(disponible_desde=timezone.now())
+            tareas.procesar()
+            tarea.refresh_from_db()
+            self.assertAlmostEqual((tarea.disponible_desde - timezone.now()).total_seconds(), 60, delta=5)
+
+            Tarea.objects.update(disponible_desde=timezone.now())
+            self.assertEqual(tareas.procesar(), (0, 0, 1))
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), ('FALLIDA', 3))
+        self.assertEqual(logs.records[-1].levelname, 'ERROR')
+        self.assertEqual(mail.outbox, [])
+
+    def test_un_correo_rechazado_no_detiene_el_lote(self):
+        tareas.encolar_correo('Uno', 'Cuerpo', ['uno@example.com'])
+        tareas.encolar_correo('Dos', 'Cuerpo', ['dos@example.com'])
+        enviar = EmailMessage.send
+
+        def rechazar_uno(mensaje, *args, **kwargs):
+            if mensaje.subject == 'Uno':
+                raise smtplib.SMTPRecipientsRefused({'uno@example.com': (550, b'No existe')})
+            return enviar(mensaje, *args, **kwargs)
+
+        with mock.patch.object(EmailMessage, 'send', rechazar_uno), self.assertLogs('login.tareas', 'WARNING'):
+            self.assertEqual(tareas.procesar(), (1, 1, 0))
+        self.assertEqual([m.subject for m in mail.outbox], ['Dos'])
+
+    def test_tarea_reclamada_no_se_entrega_dos_veces(self):
+        tareas.encolar_correo('Aviso', 'Cuerpo', ['ana@example.com'])
+        self.assertEqual(len(tareas.reclamar()), 1)
+        # Hasta que venza el bloqueo (p. ej. si el worker murió) nadie más la toma
+        self.assertEqual(tareas.reclamar(), [])
+
+
+class PasswordResetTokenTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='ana', email='ana@example.com', password='password')
+
+    def crear(self, hace_minutos=0, used=False):
+        token = PasswordResetToken.objects.create(user=self.usuario, used=used)
+        PasswordResetToken.objects.filter(pk=token.pk).update(
+            created_at=timezone.now() - timedelta(minutes=hace_minutos))
+        return token
+
+    def test_vigentes_y_caducados_en_sql(self):
+        vigente = self.crear(hace_minutos=10)
+        usado = self.crear(used=True)
+        vencido = self.crear(hace_minutos=61)
+        self.assertEqual(list(PasswordResetToken.objects.vigentes()), [vigente])
+        self.assertEqual(set(PasswordResetToken.objects.caducados()), {usado, vencido})
+
+    def test_emitir_invalida_los_anteriores(self):
+        anterior = PasswordResetToken.objects.emitir(self.usuario)
+        nuevo = PasswordResetToken.objects.emitir(self.usuario)
+        anterior.refresh_from_db()
+        self.assertTrue(anterior.used)
+        self.assertEqual(list(PasswordResetToken.objects.vigentes()), [nuevo])
+
+        response = self.client.get(reverse('password_reset_confirm', kwargs={'token': anterior.token}))
+        self.assertRedirects(response, reverse('login'))
+        response = self.client.get(reverse('password_reset_confirm', kwargs={'token': nuevo.token}))
+        self.assertEqual(response.status_code, 200)
+
+    def test_token_y_correo_en_la_misma_transaccion(self):
+        cache.clear()
+        with mock.patch('login.tareas.encolar_correo', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            self.client.post(reverse('password_reset'), {'email': 'ana@example.com'})
+        self.assertFalse(PasswordResetToken.objects.exists())
+
+    def test_enlace_vencido_o_purgado(self):
+        vencido = self.crear(hace_minutos=61)
+        url = reverse('password_reset_confirm', kwargs={'token': vencido.token})
+        self.assertRedirects(self.client.get(url), reverse('login'))
+        vencido.delete()
+        self.assertRedirects(self.client.get(url), reverse('login'))
+
+    def test_purgar_en_lotes(self):
+        for _ in range(5):
+            self.crear(hace_minutos=120)
+        self.crear(used=True)
+        vigente = self.crear()
+        salida = StringIO()
+        # 3 lotes de 2 (SELECT + DELETE) y la búsqueda que ya no encuentra nada
+        with self.assertNumQueries(3 * 2 + 1):
+            call_command('purgar_tokens', '--lote', '2', stdout=salida)
+        self.assertIn('6 tokens purgados', salida.getvalue())
+        self.assertEqual(list(PasswordResetToken.objects.all()), [vigente])
+
+    def test_purgar_tokens_no_toca_tareas(self):
+        Tarea.objects.create(tipo='correo', estado='HECHA', datos={'cuerpo': 'https://ejemplo/reset/x'})
+        call_command('purgar_tokens', stdout=StringIO())
+        self.assertTrue(Tarea.objects.exists())
+
+    def test_purgar_tareas_terminadas(self):
+        for estado in ('HECHA', 'FALLIDA', 'PENDIENTE', 'HECHA', 'FALLIDA'):
+            Tarea.objects.create(tipo='correo', estado=estado, datos={'cuerpo': 'https://ejemplo/reset/x'})
+        vigente = self.crear()
+        salida = StringIO()
+        # 2 lotes de 2 (SELECT + DELETE) y la búsqueda que ya no encuentra nada
+        with self.assertNumQueries(2 * 2 + 1):
+            call_command('purgar_tareas', '--lote', '2', stdout=salida)
+        self.assertIn('4 tareas terminadas purgadas', salida.getvalue())
+        self.assertEqual(list(Tarea.objects.values_list('estado', flat=True)), ['PENDIENTE'])
+        self.assertEqual(list(PasswordResetToken.objects.all()), [vigente])
+
+
+@override_settings(LIMITES_ACCESO={'LOGIN_IP': (5, 60), 'LOGIN_CUENTA': (3, 300),
+                                   'RECUPERAR_IP': (5, 300), 'RECUPERAR_CUENTA': (2, 3600)})
+class LimiteIntentosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user(username='ana', email='ana@example.com', password='password')
+
+    def intentar_login(self, username='ana', ip='10.0.0.1'):
+        return self.client.post(reverse('login'), {'username': username, 'password': 'incorrecta'},
+                                REMOTE_ADDR=ip)
+
+    def test_login_por_cuenta(self):
+        for _ in range(3):
+            self.assertEqual(self.intentar_login(ip=f'10.0.0.{_}').status_code, 200)
+        # Cuarto intento contra la misma cuenta, aunque venga de otra IP: ni consulta ni hash
+        with mock.patch('django.contrib.auth.hashers.PBKDF2PasswordHasher.encode') as hash_, \
+                self.assertNumQueries(0), self.assertLogs('login.ratelimit', 'WARNING'):
+            response = self.intentar_login(username='ANA', ip='10.0.0.9')
+        hash_.assert_not_called()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertContains(response, 'Demasiados intentos', status_code=429)
+        # Otra cuenta desde una IP nueva sigue pudiendo entrar
+        self.assertEqual(self.intentar_login(username='otro', ip='10.0.0.20').status_code, 200)
+
+    def test_login_por_ip(self):
+        for i in range(5):
+            self.intentar_login(username=f'usuario{i}')
+        with self.assertLogs('login.ratelimit', 'WARNING'):
+            self.assertEqual(self.intentar_login(username='nuevo').status_code, 429)
+        self.assertEqual(ratelimit.contadores()['LOGIN_IP'], 1)
+
+    def test_la_cubeta_se_recarga(self):
+        with mock.patch('login.ratelimit.time.time', return_value=1000.0):
+            for _ in range(3):
+                self.intentar_login()
+            with self.assertLogs('login.ratelimit', 'WARNING'):
+                self.assertEqual(self.intentar_login().status_code, 429)
+        # LOGIN_CUENTA recarga 3 fichas en 300 s: una cada 100 s
+        with mock.patch('login.ratelimit.time.time', return_value=1100.0):
+            self.assertEqual(self.intentar_login().status_code, 200)
+
+    def test_recuperar_contrasena(self):
+        for _ in range(2):
+            self.client.post(reverse('password_reset'), {'email': 'ana@example.com'})
+        with self.assertNumQueries(0), self.assertLogs('login.ratelimit', 'WARNING'):
+            response = self.client.post(reverse('password_reset'), {'email': 'Ana@example.com'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(PasswordResetToken.objects.count(), 2)
+        self.assertEqual(Tarea.objects.count(), 2)
+
+    @override_settings(LIMITES_ACCESO={'PROXIES': 1})
+    def test_ip_detras_de_un_proxy(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='1.1.1.1, 2.2.2.2')
+        self.assertEqual(ratelimit.ip_de(request), '2.2.2.2')
+
+    def test_contadores_solo_staff(self):
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get(reverse('metricas_limites')).status_code, 403)
+        self.usuario.is_staff = True
+        self.usuario.save()
+        datos = self.client.get(reverse('metricas_limites')).json()
+        self.assertEqual(datos['rechazos'], {regla: 0 for regla in ratelimit.REGLAS})
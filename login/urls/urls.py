@@ -1,14 +1,15 @@
 from django.urls import path
-from django.contrib.auth.views import LoginView, LogoutView
+from django.contrib.auth.views import LogoutView
 from django.views.generic import TemplateView
 from login.views import views
 from login.forms import CustomLoginForm
-from login.views.usuarios import ListaUsuariosView, EditarPerfilUsuarioView
+from login.views.usuarios import ListaUsuariosView, EditarPerfilUsuarioView, FormularioUsuarioView
 
 urlpatterns = [
-    path('', LoginView.as_view(template_name='login/index.html', authentication_form=CustomLoginForm), name='login'),
+    path('', views.LoginLimitadoView.as_view(template_name='login/index.html', authentication_form=CustomLoginForm), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('home/', views.home, name='home'),
+    path('metricas/limites.json', views.MetricasLimitesView.as_view(), name='metricas_limites'),
     
     # Rutas de recovery password
     path('password-reset/', views.PasswordResetRequestView.as_view(), name='password_reset'),
@@ -20,5 +21,6 @@ urlpatterns = [
 
     path('usuarios/', ListaUsuariosView.as_view(), name='lista_usuarios'),
     path('usuarios/<int:pk>/editar/', EditarPerfilUsuarioView.as_view(), name='editar_usuario'),
+    path('usuarios/<int:pk>/formulario/', FormularioUsuarioView.as_view(), name='formulario_usuario'),
 
 ]
@@ -1,31 +1,53 @@
+from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.views.generic import ListView, UpdateView
 from django.contrib.auth.models import User
+from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
+from centrosalud.models import CentroSalud
+from centrosalud.pagination import KeysetPaginationMixin
 from login.models import PerfilUsuario
 from login.forms import PerfilUsuarioForm
 
+# Gestión de usuarios: ver perfiles (RUT) y cambiar roles exige el permiso de edición de perfiles
+class GestionUsuariosMixin(LoginRequiredMixin, PermissionRequiredMixin):
+    permission_required = 'login.change_perfilusuario'
+
+
 # LISTA DE USUARIOS DEL SISTEMA (admin del dashboard)
-class ListaUsuariosView(ListView):
+class ListaUsuariosView(GestionUsuariosMixin, KeysetPaginationMixin, ListView):
     model = User
     template_name = "usuarios/lista_usuarios.html"
     context_object_name = "usuarios"
 
+    def get_queryset(self):
+        # Perfil y centro en el mismo JOIN; el formulario de edición se carga aparte, a pedido
+        queryset = User.objects.select_related('perfil__centro_salud')
+        q = self.request.GET.get('q', '').strip()
+        if q:
+            queryset = queryset.filter(Q(username__icontains=q) | Q(first_name__icontains=q) |
+                                       Q(last_name__icontains=q) | Q(perfil__rut__icontains=q))
+        tipo = self.request.GET.get('tipo')
+        if tipo:
+            queryset = queryset.filter(perfil__tipo=tipo)
+        centro = self.request.GET.get('centro')
+        if centro and centro.isdigit():
+            queryset = queryset.filter(perfil__centro_salud_id=centro)
+        return queryset
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-
-        forms = {}
-        for u in context["usuarios"]:
-            perfil, _ = PerfilUsuario.objects.get_or_create(user=u)
-            forms[u.id] = PerfilUsuarioForm(instance=perfil)
-
-        context["forms"] = forms
+        filtros = self.request.GET.copy()
+        filtros.pop(self.cursor_kwarg, None)
+        context["filtros"] = filtros.urlencode()
+        context["tipos"] = PerfilUsuario.TIPOS_USUARIO
+        context["centros"] = CentroSalud.objects.order_by('nombre').values_list('id', 'nombre')
         return context
 
 
 
 # EDITAR PERFIL DE USUARIO
-class EditarPerfilUsuarioView(UpdateView):
+class EditarPerfilUsuarioView(GestionUsuariosMixin, UpdateView):
     model = PerfilUsuario
     form_class = PerfilUsuarioForm
     template_name = "usuarios/editar_usuario.html"
@@ -34,7 +56,9 @@ class EditarPerfilUsuarioView(UpdateView):
     def get_object(self):
         user_id = self.kwargs["pk"]
         usuario = get_object_or_404(User, pk=user_id)
-        perfil, creado = PerfilUsuario.objects.get_or_create(user=usuario)
+        # Sin perfil se edita uno nuevo: solo se guarda al enviar el formulario, nunca en un GET
+        perfil = PerfilUsuario.objects.filter(user=usuario).first() or PerfilUsuario(user=usuario)
+        perfil.user = usuario  # la plantilla lo usa; evita volver a consultarlo
         return perfil
 
     def get_context_data(self, **kwargs):
@@ -42,6 +66,8 @@ class EditarPerfilUsuarioView(UpdateView):
         context["usuario"] = self.object.user
         return context
 
-    
-
 
+# FORMULARIO DE EDICIÓN COMO FRAGMENTO HTML (se carga en el modal de la lista)
+class FormularioUsuarioView(EditarPerfilUsuarioView):
+    template_name = "usuarios/_formulario_usuario.html"
+    http_method_names = ['get']
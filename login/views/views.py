@@ -1,13 +1,16 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib.auth.views import LoginView
+from django.http import JsonResponse
 from django.views import View
 from django.contrib import messages
-from django.core.mail import send_mail
 from django.urls import reverse
+from django.db import transaction
 from django.contrib.auth.models import User
-from django.conf import settings
 from login.forms import PasswordResetRequestForm, PasswordResetConfirmForm
 from login.models import PasswordResetToken
+from login import ratelimit, tareas
 
 
 @login_required
@@ -21,6 +24,39 @@ def home(request):
     })
 
 
+def demasiados_intentos(request, espera, responder):
+    """Respuesta 429 con la página del formulario (``responder()``) y Retry-After"""
+    messages.error(request, f'Demasiados intentos. Intenta nuevamente en {espera} segundos.')
+    response = responder()
+    response.status_code = 429
+    response['Retry-After'] = str(espera)
+    return response
+
+
+class LoginLimitadoView(LoginView):
+    """LoginView con límite de intentos por IP y por cuenta, revisado antes de calcular el hash"""
+
+    def post(self, request, *args, **kwargs):
+        espera = ratelimit.consumir(('LOGIN_IP', ratelimit.ip_de(request)),
+                                    ('LOGIN_CUENTA', request.POST.get('username', '').strip().lower()))
+        if espera:
+            # Formulario sin datos: validarlo calcularía el hash que se quiere evitar
+            formulario = self.get_form_class()(request)
+            return demasiados_intentos(request, espera,
+                                       lambda: self.render_to_response(self.get_context_data(form=formulario)))
+        return super().post(request, *args, **kwargs)
+
+
+class MetricasLimitesView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Cuántas veces se rechazó un intento, por regla"""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request):
+        return JsonResponse({'rechazos': ratelimit.contadores()})
+
+
 class PasswordResetRequestView(View):
     """Vista para solicitar recuperación de contraseña"""
     template_name = 'login/password_reset_request.html'
@@ -33,6 +69,12 @@ class PasswordResetRequestView(View):
         })
     
     def post(self, request):
+        # Antes de validar: cada intento que pasa crea un token y encola un correo
+        espera = ratelimit.consumir(('RECUPERAR_IP', ratelimit.ip_de(request)),
+                                    ('RECUPERAR_CUENTA', request.POST.get('email', '').strip().lower()))
+        if espera:
+            return demasiados_intentos(request, espera, lambda: self.get(request))
+
         form = PasswordResetRequestForm(request.POST)
         
         if form.is_valid():
@@ -47,17 +89,19 @@ class PasswordResetRequestView(View):
                     'title': 'Recuperar Contraseña'
                 })
             
-            # Crear token único
-            token = PasswordResetToken.objects.create(user=user)
-            
-            # Generar URL de recuperación
-            reset_url = request.build_absolute_uri(
-                reverse('password_reset_confirm', kwargs={'token': str(token.token)})
-            )
-            
-            # Enviar email
-            subject = 'Recuperación de Contraseña - Sistema Salud Maule'
-            message = f'''
+            # Token y tarea en la misma transacción: no queda un token sin correo ni un correo sin token
+            with transaction.atomic():
+                # Crear token único (invalida los enlaces enviados antes)
+                token = PasswordResetToken.objects.emitir(user)
+
+                # Generar URL de recuperación
+                reset_url = request.build_absolute_uri(
+                    reverse('password_reset_confirm', kwargs={'token': str(token.token)})
+                )
+
+                # El correo sale desde procesar_tareas: el request no espera al servidor SMTP
+                subject = 'Recuperación de Contraseña - Sistema Salud Maule'
+                message = f'''
 Hola {user.first_name or user.username},
 
 Has solicitado recuperar tu contraseña en el Sistema de Gestión de Pacientes.
@@ -72,14 +116,8 @@ Si no solicitaste este cambio, ignora este mensaje.
 ---
 Sistema de Salud Región del Maule
             '''
-            
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [email],
-                fail_silently=False,
-            )
+
+                tareas.encolar_correo(subject, message, [email])
             
             messages.success(request, 'Se ha enviado un correo con instrucciones para recuperar tu contraseña.')
             return redirect('password_reset_done')
@@ -96,9 +134,9 @@ class PasswordResetConfirmView(View):
     
     def get(self, request, token):
         # Validar token
-        token_obj = get_object_or_404(PasswordResetToken, token=token)
+        token_obj = PasswordResetToken.objects.vigentes().filter(token=token).first()
         
-        if not token_obj.is_valid():
+        if token_obj is None:
             messages.error(request, 'El enlace ha expirado o ya fue utilizado.')
             return redirect('login')
         
@@ -110,9 +148,9 @@ class PasswordResetConfirmView(View):
         })
     
     def post(self, request, token):
-        token_obj = get_object_or_404(PasswordResetToken, token=token)
+        token_obj = PasswordResetToken.objects.vigentes().filter(token=token).first()
         
-        if not token_obj.is_valid():
+        if token_obj is None:
             messages.error(request, 'El enlace ha expirado o ya fue utilizado.')
             return redirect('login')
         